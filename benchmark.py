@@ -0,0 +1,214 @@
+import contextlib
+import importlib
+import io
+import json
+import sys
+import time
+from typing import Dict, List
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import CpModel
+
+import test_suite
+from constants import CP_SAT_NUM_WORKERS
+from metadata import Metadata
+from optimiser import SeasonModel, get_teams_to_optimise, maximise_cutoff_plus_one, no_scenario, \
+    calculate_theoretical_maximum_for_team
+from teams import TeamDatabase
+from tournaments.dreamleague_season_24 import DreamLeagueSeason24
+from tournaments.dreamleague_season_25 import DreamLeagueSeason25
+from tournaments.dreamleague_season_26 import DreamLeagueSeason26
+from tournaments.dreamleague_season_29 import DreamLeagueSeason29
+from tournaments.esl_one_bangkok_2024 import EslOneBangkok2024
+from tournaments.esl_one_birmingham_2026 import EslOneBirmingham2026
+from tournaments.esl_one_raleigh_2025 import EslOneRaleigh2025
+
+# A reference run of this benchmark, not of the code before it was added: the season models it times did not exist
+# then.  Rewrite it with --reference when a change is meant to move the numbers
+REFERENCE_FILE = "benchmark_reference.json"
+RESULTS_FILE = "benchmark_results.json"
+
+# Season script and the cutoff it is benchmarked at
+SEASONS: Dict[str, int] = {
+    "ept_s3": 8,
+    "ept_s4": 13,
+}
+
+# Open tournaments, each built on its own against the team database of its season
+TOURNAMENTS = {
+    "ept_s3": {
+        "dreamleague_season_24": lambda metadata: DreamLeagueSeason24(metadata).build(),
+        "esl_one_bangkok_2024": lambda metadata: EslOneBangkok2024(metadata).build(),
+        "dreamleague_season_25": lambda metadata: DreamLeagueSeason25(metadata).build(),
+        "esl_one_raleigh_2025": lambda metadata: EslOneRaleigh2025(metadata).build(),
+        "dreamleague_season_26": lambda metadata: DreamLeagueSeason26(metadata).build(),
+    },
+    "ept_s4": {
+        "esl_one_birmingham_2026": lambda metadata: EslOneBirmingham2026(metadata).build(),
+        "dreamleague_season_29": lambda metadata: DreamLeagueSeason29(metadata).build(),
+        "dreamleague_season_29_with_bracket": lambda metadata: DreamLeagueSeason29(metadata).build_with_bracket(),
+    },
+}
+
+# Synthetic cases in test_suite.py.  They build their own models, so only time and objective are recorded
+TEST_SUITE_CASES: [str] = [
+    "bracket_4U4L2DSL1D",
+    "bracket_8U8L2DSL1D",
+]
+
+# A solve this many times slower than the reference (plus the slack, for very short solves) is a regression
+SOLVE_TIME_FACTOR = 2.0
+SOLVE_TIME_SLACK_SECONDS = 1.0
+
+
+def new_solver() -> cp_model.CpSolver:
+    solver = cp_model.CpSolver()
+    if CP_SAT_NUM_WORKERS > 0:
+        solver.parameters.num_workers = CP_SAT_NUM_WORKERS
+    return solver
+
+
+def get_model_size(model: CpModel) -> Dict[str, int]:
+    proto = model.Proto()
+    return {"variables": len(proto.variables), "constraints": len(proto.constraints)}
+
+
+def benchmark_season(season: str, cutoff: int) -> Dict:
+    # The first phase of optimise_and_write: maximise every team's points outside the cutoff
+    team_database: TeamDatabase = importlib.import_module(season).get_team_database()
+    full_ept_class = importlib.import_module(season).FullEpt
+
+    start_time: float = time.time()
+    season_model: SeasonModel = SeasonModel(full_ept_class, team_database)
+    build_time: float = time.time() - start_time
+
+    start_time = time.time()
+    max_cutoff_plus_one: int = -1
+    for team in get_teams_to_optimise(team_database, season_model.representatives):
+        if max_cutoff_plus_one > calculate_theoretical_maximum_for_team(season_model.phases, team, team_database):
+            continue
+
+        model: CpModel = season_model.new_model([team])
+        maximise_cutoff_plus_one(model, team, team_database, team_database.get_all_teams(), season_model.total_points,
+                                 cutoff, [no_scenario], points_bounds=season_model.points_bounds)
+        solver = new_solver()
+        if solver.Solve(model) == cp_model.OPTIMAL:
+            max_cutoff_plus_one = max(max_cutoff_plus_one, round(solver.objective_value))
+    solve_time: float = time.time() - start_time
+
+    return {
+        "name": f"{season}_top_{cutoff}",
+        "build_time": build_time,
+        **get_model_size(season_model.model),
+        "solve_time": solve_time,
+        "objective": max_cutoff_plus_one,
+    }
+
+
+def benchmark_tournament(name: str, build, team_database: TeamDatabase) -> Dict:
+    model: CpModel = CpModel()
+    metadata: Metadata = Metadata(team_database, model)
+
+    start_time: float = time.time()
+    build(metadata)
+    build_time: float = time.time() - start_time
+
+    start_time = time.time()
+    solver = new_solver()
+    status = solver.Solve(model)
+    solve_time: float = time.time() - start_time
+
+    return {
+        "name": name,
+        "build_time": build_time,
+        **get_model_size(model),
+        "solve_time": solve_time,
+        "objective": solver.StatusName(status),
+    }
+
+
+def benchmark_test_suite_case(name: str) -> Dict:
+    output = io.StringIO()
+    start_time: float = time.time()
+    with contextlib.redirect_stdout(output):
+        getattr(test_suite, name)()
+    solve_time: float = time.time() - start_time
+
+    objectives: [str] = [line.split(": ")[-1] for line in output.getvalue().splitlines()
+                         if line.startswith("Maximum objective value: ")]
+    return {
+        "name": f"test_suite_{name}",
+        "build_time": None,
+        "variables": None,
+        "constraints": None,
+        "solve_time": solve_time,
+        "objective": float(objectives[-1]) if objectives else None,
+    }
+
+
+def run_benchmarks() -> [Dict]:
+    results: [Dict] = []
+    for season, cutoff in SEASONS.items():
+        results.append(benchmark_season(season, cutoff))
+        print(results[-1])
+
+        for name, build in TOURNAMENTS[season].items():
+            results.append(benchmark_tournament(name, build, importlib.import_module(season).get_team_database()))
+            print(results[-1])
+
+    for name in TEST_SUITE_CASES:
+        results.append(benchmark_test_suite_case(name))
+        print(results[-1])
+    return results
+
+
+def compare_with_reference(results: [Dict], reference: [Dict]) -> [str]:
+    # Model size and objectives have to match exactly, solve times only within the factor
+    regressions: [str] = []
+    reference_by_name: Dict[str, Dict] = {result["name"]: result for result in reference}
+    for result in results:
+        name: str = result["name"]
+        if name not in reference_by_name:
+            continue
+        expected: Dict = reference_by_name[name]
+
+        for key in ["variables", "constraints"]:
+            if result[key] is not None and expected[key] is not None and result[key] > expected[key]:
+                regressions.append(f"{name}: {key} went from {expected[key]} to {result[key]}")
+
+        if result["objective"] != expected["objective"]:
+            regressions.append(f"{name}: objective changed from {expected['objective']} to {result['objective']}")
+
+        if result["solve_time"] > expected["solve_time"] * SOLVE_TIME_FACTOR + SOLVE_TIME_SLACK_SECONDS:
+            regressions.append(
+                f"{name}: solve time went from {expected['solve_time']:.2f}s to {result['solve_time']:.2f}s")
+    return regressions
+
+
+def main(arguments: List[str]):
+    # python benchmark.py              writes benchmark_results.json and compares it with benchmark_reference.json
+    # python benchmark.py --reference  writes benchmark_reference.json instead
+    results: [Dict] = run_benchmarks()
+    write_reference: bool = "--reference" in arguments
+    with open(REFERENCE_FILE if write_reference else RESULTS_FILE, "w") as file:
+        json.dump(results, file, indent=2)
+    if write_reference:
+        return
+
+    try:
+        with open(REFERENCE_FILE) as file:
+            reference: [Dict] = json.load(file)
+    except FileNotFoundError:
+        print(f"No reference run in {REFERENCE_FILE}, run with --reference to write one")
+        return
+
+    regressions: [str] = compare_with_reference(results, reference)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
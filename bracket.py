@@ -0,0 +1,393 @@
+from abc import ABC
+from typing import Dict, List, Tuple
+
+from ortools.constraint_solver.pywrapcp import BooleanVar
+from ortools.sat.python.cp_model import CpModel
+
+from constants import BRACKET_ENCODING
+from metadata import Metadata
+from stage import Stage, SingleMatch, Tournament
+from teams import Team, TeamDatabase
+
+
+class Seed:
+    # Teams finishing in these positions of the previous stage start in one of these matches.  If the matches are also
+    # fed from inside the bracket, the seeded teams are only guaranteed a place (exact=False)
+    def __init__(self, positions: [int], matches: [str], exact: bool = True):
+        self.positions = positions
+        self.matches = matches
+        self.exact = exact
+
+
+class Elimination:
+    # Finishing in match_placement (0 = winner, 1 = loser) of the match is a final placement in the tournament
+    def __init__(self, match: str, match_placement: int, placement: int):
+        self.match = match
+        self.match_placement = match_placement
+        self.placement = placement
+
+
+class BracketSpec:
+    def __init__(self,
+                 team_count: int,
+                 matches: [str],
+                 winners: Dict[str, str] = None,
+                 losers: Dict[str, str] = None,
+                 seeds: [Seed] = None,
+                 fixed_seeds: Dict[str, [int]] = None,
+                 eliminations: [Elimination] = None):
+        self.team_count = team_count
+        # In build order
+        self.matches = matches
+        self.winners = winners if winners is not None else {}
+        self.losers = losers if losers is not None else {}
+        # Seeding from the previous stage's positions, or from indices into the bracket's own team list
+        self.seeds = seeds if seeds is not None else []
+        self.fixed_seeds = fixed_seeds if fixed_seeds is not None else {}
+        self.eliminations = eliminations if eliminations is not None else []
+        self.placement_sets: List[Tuple[int, ...]] | None = None
+
+    def get_feeder_counts(self) -> Dict[str, int]:
+        # How many teams each match gets from earlier matches
+        feeder_counts: Dict[str, int] = {match_name: 0 for match_name in self.matches}
+        for edges in [self.winners, self.losers]:
+            for next_match_name in edges.values():
+                feeder_counts[next_match_name] += 1
+        return feeder_counts
+
+    def get_open_slots(self) -> [[str]]:
+        # Per seed, the matches its teams start in, once per place not taken by a team from an earlier match
+        feeder_counts: Dict[str, int] = self.get_feeder_counts()
+        open_slots: [[str]] = []
+        for seed in self.seeds:
+            seed_slots: [str] = [match_name for match_name in seed.matches
+                                 for _ in range(2 - feeder_counts[match_name])]
+            if len(seed_slots) != len(seed.positions):
+                raise ValueError(f"Seed {seed.positions} does not fill {seed.matches}")
+            open_slots.append(seed_slots)
+        return open_slots
+
+    def get_match_order(self) -> [str]:
+        # Every match after the matches feeding it
+        feeder_counts: Dict[str, int] = self.get_feeder_counts()
+
+        match_order: [str] = []
+        ready: [str] = [match_name for match_name in self.matches if feeder_counts[match_name] == 0]
+        while len(ready) > 0:
+            match_name: str = ready.pop(0)
+            match_order.append(match_name)
+            for edges in [self.winners, self.losers]:
+                if match_name in edges:
+                    feeder_counts[edges[match_name]] -= 1
+                    if feeder_counts[edges[match_name]] == 0:
+                        ready.append(edges[match_name])
+        return match_order
+
+    def get_placement_sets(self) -> List[Tuple[int, ...]] | None:
+        # Every reachable assignment of seed groups to final placements: entry i is the seed (index into self.seeds)
+        # of the team finishing in self.eliminations[i].  Teams from the same seed are interchangeable, so playing out
+        # the bracket on seed indices rather than teams keeps this small.  None if the bracket cannot be encoded this way
+        if self.placement_sets is not None:
+            return self.placement_sets
+
+        match_order: [str] = self.get_match_order()
+        if len(self.seeds) == 0 or len(match_order) != len(self.matches):
+            return None
+
+        match_indices: Dict[str, int] = {match_name: i for i, match_name in enumerate(self.matches)}
+        elimination_indices: Dict[Tuple[str, int], int] = {
+            (elimination.match, elimination.match_placement): i for i, elimination in enumerate(self.eliminations)
+        }
+
+        # Seeded teams fill whatever the earlier matches do not
+        feeder_counts: [int] = [0 for _ in self.matches]
+        for edges in [self.winners, self.losers]:
+            for next_match_name in edges.values():
+                feeder_counts[match_indices[next_match_name]] += 1
+
+        entrants: [[int]] = [[] for _ in self.matches]
+        for seed_index, seed in enumerate(self.seeds):
+            open_slots: [int] = [match_indices[match_name] for match_name in seed.matches
+                                 for _ in range(2 - feeder_counts[match_indices[match_name]])]
+            if len(open_slots) != len(seed.positions):
+                return None
+            for match_index in open_slots:
+                entrants[match_index].append(seed_index)
+
+        seeded_team_count: int = sum(len(seed.positions) for seed in self.seeds)
+        if seeded_team_count != len(self.eliminations):
+            return None
+
+        states = {(tuple(tuple(sorted(match_entrants)) for match_entrants in entrants),
+                   tuple(None for _ in self.eliminations))}
+        for match_name in match_order:
+            match_index: int = match_indices[match_name]
+            next_states = set()
+            for match_entrants, placements in states:
+                if len(match_entrants[match_index]) != 2:
+                    return None
+
+                a, b = match_entrants[match_index]
+                for winner, loser in {(a, b), (b, a)}:
+                    new_entrants: [[int]] = [list(e) for e in match_entrants]
+                    new_placements: [int | None] = list(placements)
+                    for seed_index, match_placement, edges in [(winner, 0, self.winners), (loser, 1, self.losers)]:
+                        if match_name in edges:
+                            new_entrants[match_indices[edges[match_name]]].append(seed_index)
+                        elif (match_name, match_placement) in elimination_indices:
+                            new_placements[elimination_indices[(match_name, match_placement)]] = seed_index
+                        else:
+                            return None
+                    next_states.add((tuple(tuple(sorted(e)) for e in new_entrants), tuple(new_placements)))
+            states = next_states
+
+        self.placement_sets = sorted({placements for _, placements in states})
+        return self.placement_sets
+
+
+class Bracket(Stage, ABC):
+    # Compiles a BracketSpec into SingleMatches.  Each match is also an attribute, e.g. self.ubsf_1
+    def __init__(self, name: str, spec: BracketSpec, metadata: Metadata, teams: [Team] = None):
+        super().__init__(name, spec.team_count, metadata)
+        self.spec = spec
+        self.teams = teams
+        self.matches: Dict[str, SingleMatch] = {}
+        self.matches_built = False
+        self.uses_placement_sets = False
+
+        for match_name in spec.matches:
+            match_teams: List[Team] | None = None
+            if match_name in spec.fixed_seeds:
+                match_teams = [teams[i] for i in spec.fixed_seeds[match_name]]
+            match: SingleMatch = SingleMatch(f"{name}_{match_name}", metadata, match_teams)
+            self.matches[match_name] = match
+            setattr(self, match_name, match)
+
+        for match_name, next_match_name in spec.winners.items():
+            self.matches[match_name].bind_winner(self.matches[next_match_name])
+        for match_name, next_match_name in spec.losers.items():
+            self.matches[match_name].bind_loser(self.matches[next_match_name])
+
+        # Seeded from a previous stage means waiting for bind_backward before the matches know who can reach them
+        if len(spec.seeds) == 0:
+            self.build_matches()
+
+    def build_matches(self):
+        if self.matches_built:
+            return
+        self.matches_built = True
+
+        for match_name in self.spec.matches:
+            self.matches[match_name].build()
+
+    def add_constraints(self):
+        # Known match results need the matches, otherwise only the final placements matter
+        self.uses_placement_sets = BRACKET_ENCODING == "placement_set" and \
+                                   self.previous_stage is not None and \
+                                   not any(match.has_known_winner for match in self.matches.values()) and \
+                                   self.spec.get_placement_sets() is not None
+        if self.uses_placement_sets:
+            return
+
+        self.add_seed_constraints()
+        self.build_matches()
+
+    def bind_backward(self, previous_stage: "Stage"):
+        self.previous_stage = previous_stage
+        for seed in self.spec.seeds:
+            for match_name in seed.matches:
+                self.matches[match_name].previous_stage = previous_stage
+
+    def get_seeded(self, team_index: int, seed: Seed):
+        return sum(self.previous_stage.indicators[team_index][p] for p in seed.positions)
+
+    def add_seed_constraints(self):
+        if self.previous_stage is None:
+            return
+
+        team_database: TeamDatabase = self.metadata.team_database
+        model: CpModel = self.metadata.model
+
+        # Teams that cannot come out of the previous stage are zero on both sides
+        seeded_teams: List[Team] | None = self.previous_stage.get_teams_for_next_stage()
+        for team in team_database.get_all_teams() if seeded_teams is None else seeded_teams:
+            team_index: int = team_database.get_team_index(team)
+            for seed in self.spec.seeds:
+                seeded = self.get_seeded(team_index, seed)
+                entered = sum(sum(self.matches[match_name].indicators[team_index]) for match_name in seed.matches)
+                if seed.exact:
+                    model.Add(seeded == entered)
+                else:
+                    model.Add(entered >= seeded)
+
+    def bind_elimination(self, tournament: Tournament):
+        if self.uses_placement_sets:
+            self.bind_placement_sets(tournament)
+            return
+
+        model: CpModel = self.metadata.model
+        team_database: TeamDatabase = self.metadata.team_database
+
+        for team in team_database.get_all_teams():
+            team_index: int = team_database.get_team_index(team)
+            for elimination in self.spec.eliminations:
+                match: SingleMatch = self.matches[elimination.match]
+                model.Add(match.indicators[team_index][elimination.match_placement] ==
+                          tournament.indicators[team_index][elimination.placement])
+
+    def bind_placement_sets(self, tournament: Tournament):
+        model: CpModel = self.metadata.model
+        team_database: TeamDatabase = self.metadata.team_database
+        seeds: [Seed] = self.spec.seeds
+        placements: [int] = [elimination.placement for elimination in self.spec.eliminations]
+
+        # from_seed[i][s]: the team finishing in placements[i] was seeded through seeds[s]
+        from_seed: [[BooleanVar]] = [
+            [model.new_bool_var(f"{self.name}_{placement}_from_seed_{s}") for s in range(len(seeds))]
+            for placement in placements
+        ]
+        for i in range(len(placements)):
+            model.AddExactlyOne(from_seed[i])
+
+        # Every seeded team gets exactly one of the bracket's placements, and nobody else gets one
+        seeded_teams: List[Team] | None = self.previous_stage.get_teams_for_next_stage()
+        for team in team_database.get_all_teams():
+            team_index: int = team_database.get_team_index(team)
+            finishes = sum(tournament.indicators[team_index][placement] for placement in placements)
+            if seeded_teams is not None and team not in seeded_teams:
+                model.Add(finishes == 0)
+                continue
+
+            model.Add(finishes == sum(self.get_seeded(team_index, seed) for seed in seeds))
+            for i, placement in enumerate(placements):
+                for s, seed in enumerate(seeds):
+                    model.Add(tournament.indicators[team_index][placement] + self.get_seeded(team_index, seed) <=
+                              1 + from_seed[i][s])
+
+        allowed: [[int]] = [
+            [1 if placement_set[i] == s else 0 for i in range(len(placements)) for s in range(len(seeds))]
+            for placement_set in self.spec.get_placement_sets()
+        ]
+        model.AddAllowedAssignments([from_seed[i][s] for i in range(len(placements)) for s in range(len(seeds))],
+                                    allowed)
+
+    def is_team_participating(self, team: Team) -> bool:
+        # TODO: Brackets seeded from a previous stage are not used as roots, so teams are unknown
+        if self.teams is None:
+            return True
+        return team in self.teams
+
+    def get_eligible_teams(self) -> List[Team] | None:
+        if self.teams is not None:
+            return self.teams
+
+        return super().get_eligible_teams()
+
+
+DOUBLE_ELIMINATION_8U1Q: BracketSpec = BracketSpec(
+    8,
+    ["ubqf_1", "ubqf_2", "ubqf_3", "ubqf_4", "ubsf_1", "ubsf_2", "ubf", "lbr1_1", "lbr1_2", "lbr2_1", "lbr2_2", "lbsf",
+     "lbf", "gf"],
+    winners={"ubqf_1": "ubsf_1", "ubqf_2": "ubsf_1", "ubqf_3": "ubsf_2", "ubqf_4": "ubsf_2",
+             "ubsf_1": "ubf", "ubsf_2": "ubf", "ubf": "gf",
+             "lbr1_1": "lbr2_1", "lbr1_2": "lbr2_2", "lbr2_1": "lbsf", "lbr2_2": "lbsf", "lbsf": "lbf", "lbf": "gf"},
+    losers={"ubqf_1": "lbr1_1", "ubqf_2": "lbr1_1", "ubqf_3": "lbr1_2", "ubqf_4": "lbr1_2",
+            "ubsf_1": "lbr2_2", "ubsf_2": "lbr2_1", "ubf": "lbf"},
+    fixed_seeds={"ubqf_1": [0, 1], "ubqf_2": [2, 3], "ubqf_3": [4, 5], "ubqf_4": [6, 7]})
+
+DOUBLE_ELIMINATION_2U2L1D: BracketSpec = BracketSpec(
+    4,
+    ["ubf", "lbsf", "lbf", "gf"],
+    winners={"ubf": "gf", "lbsf": "lbf", "lbf": "gf"},
+    losers={"ubf": "lbf"},
+    seeds=[Seed([0, 1], ["ubf"]), Seed([2, 3], ["lbsf"])],
+    eliminations=[Elimination("gf", 0, 0), Elimination("gf", 1, 1), Elimination("lbf", 1, 2),
+                  Elimination("lbsf", 1, 3)])
+
+
+def double_elimination_4u4l2dsl1d(previous_stage_lbr1_1_positions: [int]) -> BracketSpec:
+    # A3=4, B3=5, A4=6, B4=7
+    lbr1_2_positions: [int] = sorted({4, 5, 6, 7} - set(previous_stage_lbr1_1_positions))
+    return BracketSpec(
+        8,
+        ["ubsf_1", "ubsf_2", "ubf", "lbr1_1", "lbr1_2", "lbqf_1", "lbqf_2", "lbsf", "lbf", "gf"],
+        winners={"ubsf_1": "ubf", "ubsf_2": "ubf", "ubf": "gf",
+                 "lbr1_1": "lbqf_1", "lbr1_2": "lbqf_2", "lbqf_1": "lbsf", "lbqf_2": "lbsf", "lbsf": "lbf",
+                 "lbf": "gf"},
+        losers={"ubsf_1": "lbqf_1", "ubsf_2": "lbqf_2", "ubf": "lbf"},
+        seeds=[Seed([0, 3], ["ubsf_1"]), Seed([1, 2], ["ubsf_2"]),
+               Seed(previous_stage_lbr1_1_positions, ["lbr1_1"]), Seed(lbr1_2_positions, ["lbr1_2"])],
+        eliminations=[Elimination("gf", 0, 0), Elimination("gf", 1, 1), Elimination("lbf", 1, 2),
+                      Elimination("lbsf", 1, 3), Elimination("lbqf_1", 1, 4), Elimination("lbqf_2", 1, 5),
+                      Elimination("lbr1_1", 1, 6), Elimination("lbr1_2", 1, 7)])
+
+
+# Nothing feeds lbr3, as in the hand-wired version
+DOUBLE_ELIMINATION_8_2Q_U_4L2DS_1Q: BracketSpec = BracketSpec(
+    8,
+    ["ubr1_1", "ubr1_2", "ubr1_3", "ubr1_4", "ubr2_1", "ubr2_2", "lbr1_1", "lbr1_2", "lbr2_1", "lbr2_2", "lbr2",
+     "lbr3"],
+    winners={"ubr1_1": "ubr2_1", "ubr1_2": "ubr2_1", "ubr1_3": "ubr2_2", "ubr1_4": "ubr2_2",
+             "lbr1_1": "lbr2_1", "lbr1_2": "lbr2_2", "lbr2_1": "lbr2", "lbr2_2": "lbr2"},
+    losers={"ubr1_1": "lbr1_1", "ubr1_2": "lbr1_1", "ubr1_3": "lbr1_2", "ubr1_4": "lbr1_2",
+            "ubr2_1": "lbr2_2", "ubr2_2": "lbr2_1"},
+    fixed_seeds={"ubr1_1": [0, 1], "ubr1_2": [2, 3], "ubr1_3": [4, 5], "ubr1_4": [6, 7]},
+    eliminations=[Elimination("ubr2_1", 0, 0), Elimination("ubr2_2", 0, 1), Elimination("lbr3", 0, 2)])
+
+DOUBLE_ELIMINATION_8U8L2DSL1D: BracketSpec = BracketSpec(
+    12,
+    ["ubqf_1", "ubqf_2", "ubqf_3", "ubqf_4", "ubsf_1", "ubsf_2", "ubf", "lbr1_1", "lbr1_2", "lbr1_3", "lbr1_4",
+     "lbr2_1", "lbr2_2", "lbqf_1", "lbqf_2", "lbsf", "lbf", "gf"],
+    winners={"ubqf_1": "ubsf_1", "ubqf_2": "ubsf_1", "ubqf_3": "ubsf_2", "ubqf_4": "ubsf_2",
+             "ubsf_1": "ubf", "ubsf_2": "ubf", "ubf": "gf",
+             "lbr1_1": "lbr2_1", "lbr1_2": "lbr2_1", "lbr1_3": "lbr2_2", "lbr1_4": "lbr2_2",
+             "lbr2_1": "lbqf_1", "lbr2_2": "lbqf_2", "lbqf_1": "lbsf", "lbqf_2": "lbsf", "lbsf": "lbf", "lbf": "gf"},
+    losers={"ubqf_1": "lbr1_1", "ubqf_2": "lbr1_2", "ubqf_3": "lbr1_3", "ubqf_4": "lbr1_4",
+            "ubsf_1": "lbqf_2", "ubsf_2": "lbqf_1", "ubf": "lbf"},
+    # Lower bracket round 1 also takes the upper bracket quarter-final losers
+    seeds=[Seed(list(range(0, 8)), ["ubqf_1", "ubqf_2", "ubqf_3", "ubqf_4"]),
+           Seed(list(range(8, 12)), ["lbr1_1", "lbr1_2", "lbr1_3", "lbr1_4"], exact=False)],
+    eliminations=[Elimination("gf", 0, 0), Elimination("gf", 1, 1), Elimination("lbf", 1, 2),
+                  Elimination("lbsf", 1, 3), Elimination("lbqf_1", 1, 4), Elimination("lbqf_2", 1, 5),
+                  Elimination("lbr2_1", 1, 6), Elimination("lbr2_2", 1, 7), Elimination("lbr1_1", 1, 8),
+                  Elimination("lbr1_2", 1, 9), Elimination("lbr1_3", 1, 10), Elimination("lbr1_4", 1, 11)])
+
+
+# noinspection PyPep8Naming
+class DoubleElimination_8U1Q(Bracket, ABC):
+    def __init__(self, name: str, teams: [Team], metadata: Metadata):
+        super().__init__(name, DOUBLE_ELIMINATION_8U1Q, metadata, teams)
+
+
+# noinspection PyPep8Naming
+class DoubleElimination_2U2L1D(Bracket, ABC):
+    def __init__(self, name: str, metadata: Metadata):
+        super().__init__(name, DOUBLE_ELIMINATION_2U2L1D, metadata)
+
+
+# ESL One playoffs
+# noinspection PyPep8Naming
+class DoubleElimination_4U4L2DSL1D(Bracket, ABC):
+    def __init__(self, name: str, metadata: Metadata, previous_stage_lbr1_1_positions=None):
+        # For some reason, this is not A3 vs. B4 and B3 vs. A4, but can be A4 vs. B4 (ESL One Bangkok 2024)
+        # This field defines what LBR1 series 1 (in Liquipedia terms) positions should be.
+        # A3=4, B3=5, A4=6, B4=7
+        if previous_stage_lbr1_1_positions is None:
+            previous_stage_lbr1_1_positions = [4, 7]
+        self.previous_stage_lbr1_1_positions = previous_stage_lbr1_1_positions
+
+        super().__init__(name, double_elimination_4u4l2dsl1d(previous_stage_lbr1_1_positions), metadata)
+
+
+# WEU - 8 teams, 3 qualify
+# noinspection PyPep8Naming
+class DoubleElimination_8_2Q_U_4L2DS_1Q(Bracket, ABC):
+    def __init__(self, name: str, teams: [Team], metadata: Metadata):
+        super().__init__(name, DOUBLE_ELIMINATION_8_2Q_U_4L2DS_1Q, metadata, teams)
+
+
+# DL S29
+# noinspection PyPep8Naming
+class DoubleElimination_8U8L2DSL1D(Bracket, ABC):
+    def __init__(self, name: str, metadata: Metadata):
+        super().__init__(name, DOUBLE_ELIMINATION_8U8L2DSL1D, metadata)
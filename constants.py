@@ -19,4 +19,57 @@ DL_S26_TEAMS_PER_REGION: Dict[Region, int] = {
 
 # Print intermediate results
 DEBUG_DL_S26 = False
-DEBUG_DL_S29 = False
\ No newline at end of file
+DEBUG_DL_S29 = False
+
+# Solve the per-team models in this many processes.  1 keeps the sequential loop
+TEAM_SOLVE_PROCESSES = 1
+
+# CP-SAT num_workers for each solve.  0 leaves it to CP-SAT, or splits the machine between TEAM_SOLVE_PROCESSES
+CP_SAT_NUM_WORKERS = 0
+
+# Build the season's tournaments into one CpModel and clone it for every team, instead of rebuilding per team
+BUILD_SEASON_MODEL_ONCE = True
+
+# Minimise the cutoff with one model per team, switching between the teams just outside the cutoff, and hint it with
+# the solution that put them there
+INTEGRATED_MINIMISE_CUTOFF = True
+
+# Hint each team's solve with one of this many past solutions.  0 turns hinting off
+SOLUTION_POOL_SIZE = 4
+
+# SQLite file caching solves by model fingerprint, so an unchanged model is not solved again, e.g. "solve_cache.sqlite".
+# None turns it off
+SOLVE_CACHE_PATH = None
+SOLVE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Keep every team's last result in the solve cache and only solve again if it no longer fits.  Only valid while results
+# are being added (set_winner, team_can_finish_between), not when anything is loosened
+INCREMENTAL_SOLVE = False
+
+# Order the placements of interchangeable teams (same points so far, same remaining events), so CP-SAT does not search
+# every permutation of them, and only solve one of them.  Scenarios have to treat interchangeable teams alike
+BREAK_SYMMETRY = True
+
+# How ranks are derived from total points.  "big_m" encodes every pair with BIG_M, "counting" only encodes the ranks
+# that are constrained, with reified comparisons
+RANK_ENCODING = "big_m"
+
+# How brackets with a previous stage are encoded.  "placement_set" only models which final placements the seeded teams
+# can end up in, "match" models every match (needed to print individual match results)
+BRACKET_ENCODING = "placement_set"
+
+# Monte Carlo qualification probabilities: outcomes sampled in total, and per batch of arrays
+SIMULATION_SAMPLES = 1000000
+SIMULATION_BATCH_SIZE = 100000
+
+# Answer the cutoff questions by walking every outcome of the open events, instead of with CP-SAT, when there are at
+# most this many (estimated from above).  0 turns it off
+ENUMERATION_MAX_OUTCOMES = 1 << 20
+
+# Find the maximum cutoff plus one with a binary search over feasibility checks ("can any team outside the cutoff reach
+# this many points?") on one model holding every team, instead of maximising each team's points in its own model
+THRESHOLD_SEARCH = False
+
+# Restrict every team's total points to the totals its remaining events can add up to (a subset sum over the points
+# tables), instead of everything between its guaranteed minimum and theoretical maximum
+ACHIEVABLE_POINTS_DOMAINS = False
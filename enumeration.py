@@ -0,0 +1,417 @@
+from itertools import permutations, product
+from math import factorial, prod
+from typing import Dict, List, Tuple
+
+import numpy as np
+from ortools.sat.python.cp_model import CpModel
+
+from bracket import Bracket
+from constants import ENUMERATION_MAX_OUTCOMES
+from ept import EptTournament, EptStage
+from optimiser import SeasonModel, no_scenario
+from stage import Stage, Root, GroupStage, PairGroupStage, NO_TEAM
+from symmetry import get_stages
+from teams import Team, TeamDatabase
+
+
+class Outcome:
+    # One way a tournament can finish: its final placements, and the placements of every group stage
+    def __init__(self, final: Tuple[int, ...], stage_placements: Dict[Stage, Tuple[int, ...]]):
+        self.final = final
+        self.stage_placements = stage_placements
+
+
+def get_team_indices(teams: [Team], team_database: TeamDatabase) -> [int]:
+    return [team_database.get_team_index(team) for team in teams]
+
+
+def get_slot_groups(stage: GroupStage | PairGroupStage, entrants: List[int] | None,
+                    team_database: TeamDatabase) -> [Tuple[List[int] | None, List[int]]]:
+    # (teams, placements they share), per group if the groups are known
+    if isinstance(stage, PairGroupStage) and stage.get_group_placements() is not None:
+        return [(get_team_indices(group, team_database), placements)
+                for group, placements in stage.get_group_placements()]
+    return [(entrants, list(range(stage.team_count)))]
+
+
+def count_orderings(slots: [int], ranges: [Tuple[int, int]], unrestricted_count: int) -> int:
+    # Orders of the teams over the slots with the restricted teams inside their ranges, by dynamic programming over
+    # which restricted teams are already placed
+    counts: Dict[int, int] = {0: 1}
+    for k, slot in enumerate(slots):
+        next_counts: Dict[int, int] = {}
+        for mask, count in counts.items():
+            unrestricted_left: int = unrestricted_count - (k - bin(mask).count("1"))
+            if unrestricted_left > 0:
+                next_counts[mask] = next_counts.get(mask, 0) + count * unrestricted_left
+            for i, (lower, upper) in enumerate(ranges):
+                if not mask & (1 << i) and lower <= slot <= upper:
+                    next_counts[mask | (1 << i)] = next_counts.get(mask | (1 << i), 0) + count
+        counts = next_counts
+    return counts.get((1 << len(ranges)) - 1, 0)
+
+
+def estimate_stage_outcome_count(stage: Stage, entrants_known: bool, team_database: TeamDatabase) -> int:
+    # From above: brackets count every seeding and every match result that is not known yet
+    if isinstance(stage, Bracket):
+        seedings: int = 1
+        for seed_slots in stage.spec.get_open_slots():
+            seedings *= factorial(len(seed_slots)) // prod(factorial(seed_slots.count(match_name))
+                                                           for match_name in set(seed_slots))
+        return seedings * 2 ** sum(1 for match in stage.matches.values() if match.winner is None)
+
+    ranges: Dict[int, Tuple[int, int]] = stage.get_team_constraint_ranges()
+    count: int = 1
+    for teams, slots in get_slot_groups(stage, None, team_database):
+        if teams is None or not entrants_known:
+            count *= count_orderings(slots, list(ranges.values()), len(slots) - len(ranges))
+        else:
+            group_ranges: [Tuple[int, int]] = [ranges[team_index] for team_index in teams if team_index in ranges]
+            count *= count_orderings(slots, group_ranges, len(teams) - len(group_ranges))
+    return count
+
+
+def estimate_outcome_count(open_tournaments: [EptTournament], team_database: TeamDatabase) -> int:
+    count: int = 1
+    for ept_tournament in open_tournaments:
+        entrants_known: bool = False
+        for stage in get_stages(ept_tournament.tournament):
+            if isinstance(stage, Root):
+                entrants_known = True
+                continue
+            count *= estimate_stage_outcome_count(stage, entrants_known or stage.get_eligible_teams() is not None,
+                                                  team_database)
+            entrants_known = False
+    return count
+
+
+def enumerate_orderings(teams: [int], slots: [int], ranges: Dict[int, Tuple[int, int]]):
+    # Every order of the teams over the slots, with the restricted teams inside their ranges
+    placements: [int] = []
+
+    def visit(remaining: [int]):
+        k: int = len(placements)
+        if k == len(slots):
+            yield tuple(placements)
+            return
+        # A restricted team whose range has passed can no longer be placed
+        if any(team_index in ranges and ranges[team_index][1] < slots[k] for team_index in remaining):
+            return
+        for team_index in remaining:
+            if team_index in ranges and not ranges[team_index][0] <= slots[k] <= ranges[team_index][1]:
+                continue
+            placements.append(team_index)
+            yield from visit([other for other in remaining if other != team_index])
+            placements.pop()
+
+    if len(teams) == len(slots):
+        yield from visit(teams)
+
+
+def enumerate_group_stage(stage: GroupStage | PairGroupStage, entrants: List[int] | None,
+                          team_database: TeamDatabase) -> [Tuple[int, ...]]:
+    if entrants is None:
+        eligible_teams: List[Team] | None = stage.get_eligible_teams()
+        if eligible_teams is None or len(eligible_teams) != stage.team_count:
+            raise ValueError(f"{stage.name}: the teams taking part are not known")
+        entrants = get_team_indices(eligible_teams, team_database)
+
+    ranges: Dict[int, Tuple[int, int]] = stage.get_team_constraint_ranges()
+    slot_groups = get_slot_groups(stage, entrants, team_database)
+    # Restricted teams that did not make it here
+    if any(all(team_index not in teams for teams, _ in slot_groups) for team_index in ranges):
+        return []
+
+    restricted: [int] = get_team_indices(stage.team_guaranteed_playoff_lb_or_eliminated, team_database)
+    outcomes: [Tuple[int, ...]] = []
+    for orderings in product(*[list(enumerate_orderings(teams, slots, ranges)) for teams, slots in slot_groups]):
+        placements: [int] = [NO_TEAM for _ in range(stage.team_count)]
+        for (_, slots), ordering in zip(slot_groups, orderings):
+            for slot, team_index in zip(slots, ordering):
+                placements[slot] = team_index
+        if sum(1 for team_index in placements[0:2] if team_index in restricted) > 1:
+            continue
+        outcomes.append(tuple(placements))
+    return outcomes
+
+
+def enumerate_bracket(bracket: Bracket, previous_placements: Tuple[int, ...] | None,
+                      team_database: TeamDatabase) -> [Dict[int, int]]:
+    # Final placement -> team for every way the bracket can play out, match by match.  States that end up the same
+    # are merged, as in BracketSpec.get_placement_sets, but on teams rather than seeds so known winners apply
+    spec = bracket.spec
+    match_indices: Dict[str, int] = {match_name: i for i, match_name in enumerate(spec.matches)}
+    entrants: [[int]] = [[] for _ in spec.matches]
+    for match_name, team_indices in spec.fixed_seeds.items():
+        entrants[match_indices[match_name]].extend(
+            get_team_indices([bracket.teams[i] for i in team_indices], team_database))
+
+    if len(spec.seeds) > 0 and previous_placements is None:
+        raise ValueError(f"{bracket.name} is seeded from a previous stage, but has none")
+    states = {tuple(tuple(sorted(match_entrants)) for match_entrants in entrants)}
+    for seed, seed_slots in zip(spec.seeds, spec.get_open_slots()):
+        next_states = set()
+        for seeding in set(permutations([previous_placements[p] for p in seed.positions])):
+            for state in states:
+                new_entrants: [[int]] = [list(match_entrants) for match_entrants in state]
+                for match_name, team_index in zip(seed_slots, seeding):
+                    new_entrants[match_indices[match_name]].append(team_index)
+                next_states.add(tuple(tuple(sorted(match_entrants)) for match_entrants in new_entrants))
+        states = next_states
+
+    eliminations: Dict[Tuple[str, int], int] = {
+        (elimination.match, elimination.match_placement): elimination.placement for elimination in spec.eliminations
+    }
+    states = {(state, ()) for state in states}
+    for match_name in spec.get_match_order():
+        match_index: int = match_indices[match_name]
+        winner: Team | None = bracket.matches[match_name].winner
+        next_states = set()
+        for match_entrants, finishes in states:
+            if len(match_entrants[match_index]) != 2:
+                raise ValueError(f"{bracket.name}: {match_name} does not get exactly two teams")
+
+            a, b = match_entrants[match_index]
+            for winner_index, loser_index in [(a, b), (b, a)]:
+                if winner is not None and team_database.get_team_index(winner) != winner_index:
+                    continue
+                new_entrants: [[int]] = [list(e) for e in match_entrants]
+                new_finishes: [Tuple[int, int]] = list(finishes)
+                for team_index, match_placement, edges in [(winner_index, 0, spec.winners),
+                                                           (loser_index, 1, spec.losers)]:
+                    if match_name in edges:
+                        new_entrants[match_indices[edges[match_name]]].append(team_index)
+                    elif (match_name, match_placement) in eliminations:
+                        new_finishes.append((eliminations[(match_name, match_placement)], team_index))
+                    else:
+                        raise ValueError(f"{bracket.name}: {match_name} sends teams out of the tournament")
+                next_states.add((tuple(tuple(sorted(e)) for e in new_entrants), tuple(sorted(new_finishes))))
+        states = next_states
+
+    return [dict(finishes) for finishes in {finishes for _, finishes in states}]
+
+
+def enumerate_tournament(ept_tournament: EptTournament, team_database: TeamDatabase) -> [Outcome]:
+    tournament = ept_tournament.tournament
+    stages: [Stage] = get_stages(tournament)
+    zero_point_teams: [int] = get_team_indices(tournament.zero_point_teams, team_database)
+    outcomes: [Outcome] = []
+
+    def visit(k: int, entrants: List[int] | None, previous_placements: Tuple[int, ...] | None, final: [int],
+              stage_placements: Dict[Stage, Tuple[int, ...]]):
+        if k == len(stages):
+            if NO_TEAM in final:
+                raise ValueError(f"{tournament.name}: not every placement can be filled")
+            if not any(team_index in zero_point_teams for team_index in final):
+                outcomes.append(Outcome(tuple(final), dict(stage_placements)))
+            return
+
+        stage: Stage = stages[k]
+        if isinstance(stage, Root):
+            visit(k + 1, get_team_indices(stage.teams, team_database), None, final, stage_placements)
+        elif isinstance(stage, Bracket):
+            if stage.next_stage is not None:
+                raise ValueError(f"{stage.name}: only the last stage can be a bracket")
+            for finishes in enumerate_bracket(stage, previous_placements, team_database):
+                new_final: [int] = list(final)
+                for placement, team_index in finishes.items():
+                    new_final[placement] = team_index
+                visit(k + 1, None, None, new_final, stage_placements)
+        elif isinstance(stage, (GroupStage, PairGroupStage)):
+            advancing_team_count: int = stage.get_advancing_team_count()
+            for placements in enumerate_group_stage(stage, entrants, team_database):
+                new_final: [int] = list(final)
+                new_final[advancing_team_count:stage.team_count] = placements[advancing_team_count:]
+                stage_placements[stage] = placements
+                visit(k + 1, list(placements[:advancing_team_count]), placements, new_final, stage_placements)
+                del stage_placements[stage]
+        else:
+            raise ValueError(f"{stage.name}: {type(stage).__name__} cannot be enumerated")
+
+    visit(0, None, None, [NO_TEAM for _ in range(tournament.starting_stage.team_count)], {})
+    return outcomes
+
+
+def get_outcome_points(ept_tournament: EptTournament, outcome: Outcome, team_count: int) -> Tuple[int, ...]:
+    points: [int] = [0 for _ in range(team_count)]
+    for placement, team_index in enumerate(outcome.final):
+        if placement < len(ept_tournament.points):
+            points[team_index] += ept_tournament.points[placement]
+
+    ept_stage: EptStage = ept_tournament.first_ept_stage
+    while ept_stage is not None:
+        if not isinstance(ept_stage, EptStage):
+            raise ValueError(f"{ept_tournament.tournament.name}: {type(ept_stage).__name__} cannot be enumerated")
+        stage_points: [int] = ept_stage.get_points()
+        for placement, team_index in enumerate(outcome.stage_placements[ept_stage.stage]):
+            points[team_index] += stage_points[placement]
+        ept_stage = ept_stage.next_ept_stage
+    return tuple(points)
+
+
+def count_others(totals: np.ndarray, team_index: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Other teams on at least as many points, and on more
+    team_points = totals[:, [team_index]]
+    return (totals >= team_points).sum(axis=1) - 1, (totals > team_points).sum(axis=1)
+
+
+def can_rank(totals: np.ndarray, team_index: int, rank: int) -> np.ndarray:
+    # Ties are free either way, as in ranking.encode_ranks
+    at_least_as_many, more = count_others(totals, team_index)
+    return (more + 1 <= rank) & (rank <= at_least_as_many + 1)
+
+
+class Enumeration:
+    # Every outcome of the season's open tournaments, kept once per distinct points vector.  Answers the questions of
+    # maximise_cutoff_plus_one and minimise_cutoff by walking them, and hands back the season's CpModel with the best
+    # outcome fixed, so displaying the result works as after a CP-SAT solve
+    def __init__(self, season_model: SeasonModel):
+        self.season_model = season_model
+        team_database: TeamDatabase = season_model.team_database
+        team_count: int = len(team_database.get_all_teams())
+        self.tournaments: [EptTournament] = [phase for phase in season_model.phases
+                                             if isinstance(phase, EptTournament)]
+        self.baseline = np.array(season_model.baseline, dtype=np.int64)
+        self.points: [np.ndarray] = []
+        self.outcomes: [[Outcome]] = []
+        for ept_tournament in self.tournaments:
+            distinct_outcomes: Dict[Tuple[int, ...], Outcome] = {}
+            for outcome in enumerate_tournament(ept_tournament, team_database):
+                distinct_outcomes.setdefault(get_outcome_points(ept_tournament, outcome, team_count), outcome)
+            if not distinct_outcomes:
+                raise ValueError(f"{ept_tournament.tournament.name}: no outcome fits the known results")
+            self.points.append(np.array(list(distinct_outcomes), dtype=np.int64))
+            self.outcomes.append(list(distinct_outcomes.values()))
+
+    def get_outcome_count(self) -> int:
+        return prod(len(outcomes) for outcomes in self.outcomes)
+
+    def search(self, team_index: int, maximise: bool, is_feasible,
+               fixed_points: Tuple[int, int] | None = None) -> Tuple[int, Tuple[int, ...]] | None:
+        # Best total for the team over every combination of tournament outcomes, and the outcome index per tournament.
+        # Tournaments are walked depth first with running totals, best rows first, and a branch is cut as soon as it
+        # cannot beat the best so far, or cannot give the team in fixed_points (team index, points) those points
+        sign: int = 1 if maximise else -1
+        remaining_best: [int] = [sum(int((sign * points[:, team_index]).max()) for points in self.points[k:])
+                                 for k in range(len(self.points) + 1)]
+        if fixed_points is not None:
+            fixed_team_index, fixed_team_points = fixed_points
+            remaining_range: [Tuple[int, int]] = [
+                (sum(int(points[:, fixed_team_index].min()) for points in self.points[k:]),
+                 sum(int(points[:, fixed_team_index].max()) for points in self.points[k:]))
+                for k in range(len(self.points) + 1)
+            ]
+        best: [Tuple[int, Tuple[int, ...]]] = []
+
+        def is_cut(totals: np.ndarray, k: int) -> bool:
+            if best and sign * int(totals[team_index]) + remaining_best[k] <= best[0][0]:
+                return True
+            if fixed_points is not None:
+                low, high = remaining_range[k]
+                return not low <= fixed_team_points - int(totals[fixed_team_index]) <= high
+            return False
+
+        def visit(k: int, totals: np.ndarray, chosen: Tuple[int, ...]):
+            if k == len(self.points):
+                candidates = totals[None, :]
+            elif k == len(self.points) - 1:
+                candidates = totals + self.points[k]
+            else:
+                for i in np.argsort(-sign * self.points[k][:, team_index], kind="stable"):
+                    next_totals = totals + self.points[k][i]
+                    if best and sign * int(next_totals[team_index]) + remaining_best[k + 1] <= best[0][0]:
+                        break
+                    if not is_cut(next_totals, k + 1):
+                        visit(k + 1, next_totals, chosen + (int(i),))
+                return
+
+            feasible = is_feasible(candidates)
+            if not feasible.any():
+                return
+            values = np.where(feasible, sign * candidates[:, team_index], np.iinfo(np.int64).min)
+            i: int = int(values.argmax())
+            if not best or values[i] > best[0][0]:
+                best[:] = [(int(values[i]), chosen + ((i,) if k < len(self.points) else ()))]
+
+        if not is_cut(self.baseline, 0):
+            visit(0, self.baseline, ())
+        if not best:
+            return None
+        return sign * best[0][0], best[0][1]
+
+    def maximise_cutoff_plus_one(self, team: Team, cutoff: int) -> Tuple[int, Tuple[int, ...]] | None:
+        team_index: int = self.season_model.team_database.get_team_index(team)
+        return self.search(team_index, True,
+                           lambda totals: count_others(totals, team_index)[0] + 1 > cutoff)
+
+    def minimise_cutoff(self, team: Team, cutoff: int, cutoff_team: Team,
+                        cutoff_points: int) -> Tuple[int, Tuple[int, ...]] | None:
+        team_database: TeamDatabase = self.season_model.team_database
+        team_index: int = team_database.get_team_index(team)
+        cutoff_team_index: int = team_database.get_team_index(cutoff_team)
+        return self.search(team_index, False,
+                           lambda totals: (totals[:, cutoff_team_index] == cutoff_points) &
+                                          can_rank(totals, cutoff_team_index, cutoff + 1) &
+                                          can_rank(totals, team_index, cutoff),
+                           (cutoff_team_index, cutoff_points))
+
+    def new_model(self, chosen: Tuple[int, ...]) -> CpModel:
+        # The season's model with the chosen outcome of every open tournament fixed.  No symmetry breaking, which could
+        # rule the outcome out
+        model: CpModel = self.season_model.new_model()
+        for ept_tournament, outcomes, i in zip(self.tournaments, self.outcomes, chosen):
+            outcome: Outcome = outcomes[i]
+            fix_placements(model, ept_tournament.tournament.indicators, outcome.final)
+            for stage, placements in outcome.stage_placements.items():
+                fix_placements(model, stage.indicators, placements)
+        return model
+
+    def maximise_cutoff_plus_one_model(self, team: Team, cutoff: int) -> CpModel | None:
+        result = self.maximise_cutoff_plus_one(team, cutoff)
+        if result is None:
+            return None
+        model: CpModel = self.new_model(result[1])
+        model.Maximize(self.season_model.total_points[self.season_model.team_database.get_team_index(team)])
+        return model
+
+    def minimise_cutoff_model(self, team: Team, cutoff: int, cutoff_team: Team, cutoff_points: int) -> CpModel | None:
+        result = self.minimise_cutoff(team, cutoff, cutoff_team, cutoff_points)
+        if result is None:
+            return None
+        model: CpModel = self.new_model(result[1])
+        model.Minimize(self.season_model.total_points[self.season_model.team_database.get_team_index(team)])
+        return model
+
+
+def fix_placements(model: CpModel, indicators, placements: Tuple[int, ...]):
+    for placement, team_index in enumerate(placements):
+        model.Add(indicators[team_index][placement] == 1)
+
+
+# The outcomes do not depend on the cutoff, so a sweep only walks them once.  Only the last season model's are kept
+last_enumeration: Enumeration | None = None
+
+
+def get_enumeration(season_model: SeasonModel, scenarios) -> Enumeration | None:
+    # The enumeration if the open events are small enough for it.  Scenarios constrain the CpModel's ranks, so they
+    # need CP-SAT, as do stages the enumeration does not know
+    if ENUMERATION_MAX_OUTCOMES == 0 or any(scenario is not no_scenario for scenario in scenarios):
+        return None
+    global last_enumeration
+    if last_enumeration is not None and last_enumeration.season_model is season_model:
+        return last_enumeration
+
+    open_tournaments: [EptTournament] = [phase for phase in season_model.phases if isinstance(phase, EptTournament)]
+    try:
+        estimated_outcome_count: int = estimate_outcome_count(open_tournaments, season_model.team_database)
+        if estimated_outcome_count > ENUMERATION_MAX_OUTCOMES:
+            print(f"Up to {estimated_outcome_count} outcomes left, solving with CP-SAT")
+            return None
+        enumeration: Enumeration = Enumeration(season_model)
+    except ValueError as error:
+        print(f"Cannot enumerate the outcomes ({error}), solving with CP-SAT")
+        return None
+
+    print(f"{enumeration.get_outcome_count()} distinct outcomes left (up to {estimated_outcome_count}), enumerating")
+    last_enumeration = enumeration
+    return enumeration
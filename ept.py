@@ -3,7 +3,7 @@ from array import array
 from math import floor
 from typing import Dict
 
-from ortools.sat.python.cp_model import IntVar, CpSolver
+from ortools.sat.python.cp_model import IntVar, CpSolver, LinearExpr, LinearExprT
 
 from display_phases import DisplayPhase, HasDisplayPhase, DisplayPhaseType
 from metadata import Metadata
@@ -11,6 +11,19 @@ from stage import GroupStage, Stage, Tournament, PairGroupStage
 from teams import Team, TeamDatabase
 
 
+def build_obtained_points(indicators, points: [int], team_database: TeamDatabase) -> [LinearExprT]:
+    # One affine expression per team, built straight from the indicators.  Placements worth nothing are left out
+    obtained_points: [LinearExprT] = []
+    for team_index in range(len(team_database.get_all_teams())):
+        row = indicators[team_index]
+        terms = [(row[p], points[p]) for p in range(len(points)) if points[p] != 0]
+        if terms:
+            obtained_points.append(LinearExpr.weighted_sum([term[0] for term in terms], [term[1] for term in terms]))
+        else:
+            obtained_points.append(0)
+    return obtained_points
+
+
 class EptStageBase(ABC):
     def __init__(self, team_count: int, points: [int]):
         self.points = [points[p] if p < len(points) else 0 for p in range(team_count)]
@@ -41,20 +54,23 @@ class EptStage(EptStageBase, ABC):
         self.stage = stage
 
         super().__init__(stage.team_count, points)
-        self.build()
 
         self.next_ept_stage = None
-        self.obtained_points: [IntVar] = []
+        self.obtained_points: [LinearExprT] = []
 
-    @abstractmethod
     def build(self):
-        pass
+        # Only once, and only after the stage is bound, so the indicator rows are created with the final eligible teams
+        if self.obtained_points:
+            return
+        self.obtained_points = build_obtained_points(self.stage.indicators, self.get_points(),
+                                                     self.stage.metadata.team_database)
 
     @abstractmethod
-    def get_points(self) -> [IntVar]:
+    def get_points(self) -> [int]:
         pass
 
     def get_obtained_points(self, team_index: int):
+        self.build()
         return self.obtained_points[team_index]
 
     def to_display_phase(self, solver: CpSolver) -> DisplayPhase:
@@ -85,9 +101,12 @@ class SolvedEptStage(EptStageBase, ABC):
         self.name = name
         self.team_database: TeamDatabase = metadata.team_database
         self.positions: Dict[Team, int] = {}
+        # Bumped on every change, so anything derived from the positions knows to recalculate
+        self.version: int = 0
 
     def set_position(self, team_name: str, position: int):
         self.positions[self.team_database.get_team_by_name(team_name)] = position - 1
+        self.version += 1
 
     def build(self):
         pass
@@ -132,21 +151,9 @@ class EptGroupStage(EptStage, ABC):
                  stage: GroupStage,
                  points: [int]):
         super().__init__(stage, points)
-        self.build()
 
-    def build(self):
-        metadata: Metadata = self.stage.metadata
-        team_database = metadata.team_database
-        self.obtained_points: [IntVar] = [metadata.model.new_int_var(0, 99999, f'd_{self.stage.name}_{i}')
-                                          for i in range(len(team_database.get_all_teams()))]
-        for team in team_database.get_all_teams():
-            team_index = team_database.get_team_index(team)
-            self.obtained_points[team_index] = sum(
-                self.stage.indicators[team_index][p] * self.points[p] for p in range(len(self.points)))
-        pass
-
-    def get_points(self) -> [IntVar]:
-        pass
+    def get_points(self) -> [int]:
+        return self.points
 
 
 class EptPairGroupStage(EptStage, ABC):
@@ -154,25 +161,11 @@ class EptPairGroupStage(EptStage, ABC):
                  stage: PairGroupStage,
                  points: [int]):
         super().__init__(stage, points)
-        self.build()
 
-    def build(self):
-        metadata: Metadata = self.stage.metadata
-        team_database = metadata.team_database
-        self.obtained_points: [IntVar] = [metadata.model.new_int_var(0, 99999, f'd_{self.stage.name}_{i}')
-                                          for i in range(len(team_database.get_all_teams()))]
-
-        points_extended = [self.points[floor(p / 2)] if floor(p / 2) < len(self.points) else 0 for p in
-                           range(self.stage.team_count)]
-
-        for team in team_database.get_all_teams():
-            team_index = team_database.get_team_index(team)
-            self.obtained_points[team_index] = sum(
-                self.stage.indicators[team_index][p] * points_extended[p] for p in range(len(points_extended)))
-        pass
-
-    def get_points(self) -> [IntVar]:
-        pass
+    def get_points(self) -> [int]:
+        # Both groups share the points, so each placement pair gets the same amount
+        return [self.points[floor(p / 2)] if floor(p / 2) < len(self.points) else 0 for p in
+                range(self.stage.team_count)]
 
 
 class EptTournamentBase(HasDisplayPhase, ABC):
@@ -243,19 +236,13 @@ class EptTournament(EptTournamentBase, HasDisplayPhase, ABC):
         self.liquipedia_league_icon = liquipedia_league_icon
         self.liquipedia_edate = liquipedia_edate
         self.metadata = metadata
-        self.obtained_points: [IntVar] = []
-        self.build()
+        self.obtained_points: [LinearExprT] = []
 
     def build(self):
-        metadata: Metadata = self.metadata
-        team_database = metadata.team_database
-        self.obtained_points: [IntVar] = [metadata.model.new_int_var(0, 99999, f'd_{self.tournament.name}_{i}')
-                                          for i in range(len(team_database.get_all_teams()))]
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-            self.obtained_points[team_index] = sum(
-                self.tournament.indicators[team_index][p] * self.points[p] for p in range(len(self.points)))
-        pass
+        if self.obtained_points:
+            return
+        self.obtained_points = build_obtained_points(self.tournament.indicators, self.points,
+                                                     self.metadata.team_database)
 
     def to_display_phases(self, solver: CpSolver) -> [DisplayPhase]:
         display_phases: [DisplayPhase] = []
@@ -302,7 +289,8 @@ class EptTournament(EptTournamentBase, HasDisplayPhase, ABC):
 
         return max_points
 
-    def get_obtained_points(self, team_index: int) -> [IntVar]:
+    def get_obtained_points(self, team_index: int) -> LinearExprT:
+        self.build()
         return self.obtained_points[team_index]
 
 
@@ -327,9 +315,12 @@ class SolvedEptTournament(EptTournamentBase, HasDisplayPhase, ABC):
         self.first_ept_stage = first_ept_stage
         self.team_database: TeamDatabase = metadata.team_database
         self.positions: Dict[Team, int] = {}
+        # Bumped on every change, so anything derived from the positions knows to recalculate
+        self.version: int = 0
 
     def set_position(self, team_name: str, position: int):
         self.positions[self.team_database.get_team_by_name(team_name)] = position - 1
+        self.version += 1
 
     def to_display_phases(self, solver: CpSolver) -> [DisplayPhase]:
         display_phases: [DisplayPhase] = []
@@ -1,17 +1,11 @@
-import sys
-import time
-from typing import TextIO
+from ortools.sat.python.cp_model import CpSolver
 
-from ortools.constraint_solver.pywrapcp import BooleanVar
-from ortools.sat.python import cp_model
-from ortools.sat.python.cp_model import CpModel, CpSolver, IntVar
-
-from constants import BIG_M, DEBUG_DL_S29
-from display import Display
+from constants import DEBUG_DL_S29
 from display_phases import HasDisplayPhase
-from ept import EptTournamentBase
+from ledger import BaselineLedger
 from metadata import Metadata
 from stage import SingleMatch
+from sweep import SweepCutoff, optimise_and_write_sweep
 from teams import Team, Region, TeamDatabase
 from tournaments.dreamleague_season_27 import DreamLeagueSeason27Solved
 from tournaments.dreamleague_season_28 import DreamLeagueSeason28Solved
@@ -20,9 +14,19 @@ from tournaments.esl_one_birmingham_2026 import EslOneBirmingham2026Solved
 from transfer_window import TransferWindow
 from utilities import print_indicators
 
+# Keeps this season's results apart from other seasons' in the solve cache
+SEASON = "ept_s4"
+
 
 def main():
+    team_database: TeamDatabase = get_team_database()
+
+    optimise_and_write_sweep(FullEpt, SEASON, [
+        SweepCutoff(13, "Top 13", "scenarios/2025-2026/top-13.txt"),
+    ], team_database, print_debug)
 
+
+def get_team_database() -> TeamDatabase:
     teams: [Team] = [
         Team("Tundra Esports", Region.WEU),
         Team("Team Liquid", Region.WEU),
@@ -65,235 +69,48 @@ def main():
     team_database: TeamDatabase = TeamDatabase()
     for team in teams:
         team_database.add_team(team)
+    return team_database
 
-    top_13_file = open("scenarios/2025-2026/top-13.txt", "w")
-    optimise_and_write(13, "Top 13", top_13_file, team_database)
-
-
-def optimise_and_write(cutoff: int, header: str, file: TextIO, team_database: TeamDatabase, scenarios=None):
-    if scenarios is None:
-        scenarios = [lambda m, r: None]
-    teams: [Team] = team_database.get_all_teams()
-    start_time = get_epoch_time_seconds()
-    min_cutoff_teams: [Team] = []
-    max_objective_value_teams: [Team] = []
-    min_cutoff = sys.maxsize
-    max_cutoff_plus_one = -1
-    max_cutoff_plus_one, max_objective_value_teams = optimise_maximise_cutoff_plus_one(cutoff,
-                                                                                       max_cutoff_plus_one,
-                                                                                       max_objective_value_teams,
-                                                                                       team_database,
-                                                                                       team_database.get_all_teams(),
-                                                                                       scenarios)
-
-    print(
-        f"Found maximum cutoff plus one value as {max_cutoff_plus_one} for teams {[team.name for team in max_objective_value_teams]}.  Now minimising cutoff")
-    # Track pseudo-teams.  All of them are basically the same, so optimising for one is the same as the others.  Skip if done
-    regions_with_pseudo_teams_solved: [Region] = []
-    for team in team_database.get_all_teams():
-        if team.is_pseudo:
-            if team.region in regions_with_pseudo_teams_solved:
-                continue
-            else:
-                regions_with_pseudo_teams_solved.append(team.region)
-
-        for max_objective_value_team in max_objective_value_teams:
-            if team == max_objective_value_team:
-                continue
-
-            model: CpModel = CpModel()
-            metadata: [Metadata] = Metadata(team_database, model)
-            full_ept = FullEpt(metadata)
-            phases: [HasDisplayPhase] = full_ept.get_display_phases()
-
-            print(f"Now optimising for {team.name}")
-            max_possible_points_for_team = calculate_theoretical_maximum_for_team(phases, team, team_database)
-            if max_cutoff_plus_one > max_possible_points_for_team:
-                print(
-                    f"Team {team.name}'s maximum points ({max_possible_points_for_team}) is less than objective value ({max_cutoff_plus_one}).  Skipping")
-                continue
-
-            # Optimise
-            total_points = full_ept.get_total_points(team_database, teams)
-            minimise_cutoff(model, team, team_database, teams, total_points, cutoff, max_objective_value_team,
-                            max_cutoff_plus_one, scenarios)
-
-            solver = cp_model.CpSolver()
-            status = solver.Solve(model)
-            if status != cp_model.OPTIMAL:
-                print(f"Team {team.name} probably cannot finish in position {cutoff}")
-                continue
-
-            # I really don't like doing this, but there is a stupid scenario where one is something like 999.999 and one is 1000.0001
-            new_objective_value = round(solver.objective_value)
-            if new_objective_value < min_cutoff:
-                min_cutoff = solver.objective_value
-                min_cutoff_teams = [team]
-            elif new_objective_value == min_cutoff:
-                min_cutoff_teams.append(team)
-            else:
-                print(
-                    f"Minimum objective value for {team.name} ({solver.objective_value}) is not less than current minimum {min_cutoff}")
-                continue
-
-            display: Display = Display(phases, metadata)
-            file.write(display.print(header, team, cutoff, min_cutoff, solver))
-            print(f"Objective value: {min_cutoff}")
-    print(
-        f"Got cutoff value as {min_cutoff} for team {[team.name for team in min_cutoff_teams]} with corresponding teams {[team.name for team in max_objective_value_teams]} missing out with {max_cutoff_plus_one}")
-    end_time = get_epoch_time_seconds()
-    print(f"Completed in {end_time - start_time}s")
-
-
-def get_epoch_time_seconds():
-    return round(time.time())
-
-
-def optimise_maximise_cutoff_plus_one(cutoff, max_cutoff_plus_one, max_objective_value_teams, team_database, teams,
-                                      scenarios):
-    # Track pseudo-teams.  All of them are basically the same, so optimising for one is the same as the others.  Skip if done
-    regions_with_pseudo_teams_solved: [Region] = []
-    for team in team_database.get_all_teams():
-        if team.is_pseudo:
-            if team.region in regions_with_pseudo_teams_solved:
-                continue
-            else:
-                regions_with_pseudo_teams_solved.append(team.region)
-
-        model: CpModel = CpModel()
-        metadata: [Metadata] = Metadata(team_database, model)
-
-        full_ept = FullEpt(metadata)
-        phases: [HasDisplayPhase] = full_ept.get_display_phases()
-
-        print(f"Now optimising for {team.name}")
-        max_possible_points_for_team = calculate_theoretical_maximum_for_team(phases, team, team_database)
-        if max_cutoff_plus_one > max_possible_points_for_team:
-            print(
-                f"Team {team.name}'s maximum points ({max_possible_points_for_team}) is less than objective value ({max_cutoff_plus_one}).  Skipping")
-            continue
-
-        # Optimise
-        total_points = full_ept.get_total_points(team_database, teams)
-        maximise_cutoff_plus_one(model, team, team_database, teams, total_points, cutoff, scenarios)
-
-        solver = cp_model.CpSolver()
-        status = solver.Solve(model)
-        if status != cp_model.OPTIMAL:
-            print(f"Team {team.name} probably cannot finish in position {cutoff}")
-            continue
-
-        # I really don't like doing this, but there is a stupid scenario where one is something like 999.999 and one is 1000.0001
-        new_objective_value = round(solver.objective_value)
-        if new_objective_value > max_cutoff_plus_one:
-            max_objective_value_teams = [team]
-            max_cutoff_plus_one = new_objective_value
-        elif new_objective_value == max_cutoff_plus_one:
-            max_objective_value_teams.append(team)
-        else:
-            print(
-                f"Maximum objective value for {team.name} ({solver.objective_value}) is not greater than current maximum {max_cutoff_plus_one}")
-            continue
-
-        print(f"Maximum objective value: {max_cutoff_plus_one}")
-
-        if DEBUG_DL_S29:
-            print("DreamLeague Season 29 GS")
-            print_indicators(full_ept.ept_dl_s29_gs.stage.indicators, solver, team_database)
-
-            print("DreamLeague Season 29 playoff")
-            playoff = full_ept.ept_dl_s29.first_ept_stage.stage.next_stage
-
-            print_single_match(playoff.ubqf_1, solver, team_database)
-            print_single_match(playoff.ubqf_2, solver, team_database)
-            print_single_match(playoff.ubqf_3, solver, team_database)
-            print_single_match(playoff.ubqf_4, solver, team_database)
-
-            print_single_match(playoff.ubsf_1, solver, team_database)
-            print_single_match(playoff.ubsf_2, solver, team_database)
-
-            print_single_match(playoff.ubf, solver, team_database)
 
-            print_single_match(playoff.lbr1_1, solver, team_database)
-            print_single_match(playoff.lbr1_2, solver, team_database)
-            print_single_match(playoff.lbr1_3, solver, team_database)
-            print_single_match(playoff.lbr1_4, solver, team_database)
+def print_debug(full_ept: "FullEpt", solver: CpSolver, team_database: TeamDatabase):
+    if not DEBUG_DL_S29:
+        return
 
-            print_single_match(playoff.lbr2_1, solver, team_database)
-            print_single_match(playoff.lbr2_2, solver, team_database)
+    print("DreamLeague Season 29 GS")
+    print_indicators(full_ept.ept_dl_s29_gs.stage.indicators, solver, team_database)
 
-            print_single_match(playoff.lbqf_1, solver, team_database)
-            print_single_match(playoff.lbqf_2, solver, team_database)
+    print("DreamLeague Season 29 playoff")
+    playoff = full_ept.ept_dl_s29.first_ept_stage.stage.next_stage
 
-            print_single_match(playoff.lbsf, solver, team_database)
+    print_single_match(playoff.ubqf_1, solver, team_database)
+    print_single_match(playoff.ubqf_2, solver, team_database)
+    print_single_match(playoff.ubqf_3, solver, team_database)
+    print_single_match(playoff.ubqf_4, solver, team_database)
 
-            print_single_match(playoff.lbf, solver, team_database)
+    print_single_match(playoff.ubsf_1, solver, team_database)
+    print_single_match(playoff.ubsf_2, solver, team_database)
 
-            print_single_match(playoff.gf, solver, team_database)
+    print_single_match(playoff.ubf, solver, team_database)
 
-            print("DreamLeague Season 29")
-            print_indicators(full_ept.ept_dl_s29.tournament.indicators, solver, team_database)
+    print_single_match(playoff.lbr1_1, solver, team_database)
+    print_single_match(playoff.lbr1_2, solver, team_database)
+    print_single_match(playoff.lbr1_3, solver, team_database)
+    print_single_match(playoff.lbr1_4, solver, team_database)
 
-    return max_cutoff_plus_one, max_objective_value_teams
+    print_single_match(playoff.lbr2_1, solver, team_database)
+    print_single_match(playoff.lbr2_2, solver, team_database)
 
+    print_single_match(playoff.lbqf_1, solver, team_database)
+    print_single_match(playoff.lbqf_2, solver, team_database)
 
-def calculate_theoretical_maximum_for_team(phases, team: Team, team_database: TeamDatabase):
-    # Calculate theoretical maximum.  If this is less than the current maximum, don't bother solving
-    max_possible_points_for_team: int = 0
-    for phase in phases:
-        if isinstance(phase, EptTournamentBase):
-            max_possible_points_for_team += phase.get_maximum_points_for_team(team)
-        elif isinstance(phase, TransferWindow):
-            max_possible_points_for_team += phase.get_change(team_database.get_team_index(team))
-    return max_possible_points_for_team
+    print_single_match(playoff.lbsf, solver, team_database)
 
+    print_single_match(playoff.lbf, solver, team_database)
 
-def maximise_cutoff_plus_one(model, team, team_database, teams, total_points, cutoff: int, scenarios):
-    team_count_range = range(len(teams))
-    ranks: [IntVar] = {team: model.NewIntVar(1, len(teams), f'ranks_{team}') for team in team_count_range}
-    aux: [[BooleanVar]] = {(i, j): model.NewBoolVar(f'aux_{i}_{j}') for i in team_count_range for j in
-                           team_count_range}
-    for i in team_count_range:
-        for j in team_count_range:
-            if i == j:
-                model.Add(aux[(i, j)] == 1)
-            else:
-                model.Add(total_points[i] - total_points[j] <= (1 - aux[(i, j)]) * BIG_M)
-                model.Add(total_points[j] - total_points[i] <= aux[(i, j)] * BIG_M)
-        ranks[i] = sum(aux[(i, j)] for j in team_count_range)
-    team_index: int = team_database.get_team_index(team)
-    model.Add(ranks[team_index] > cutoff)
+    print_single_match(playoff.gf, solver, team_database)
 
-    for scenario in scenarios:
-        scenario(model, ranks)
-
-    model.Maximize(total_points[team_index])
-
-
-def minimise_cutoff(model, team, team_database, teams, total_points, cutoff: int, cutoff_team: Team,
-                    cutoff_points: int, scenarios):
-    team_count_range = range(len(teams))
-    ranks: [IntVar] = {team: model.NewIntVar(1, len(teams), f'ranks_{team}') for team in team_count_range}
-    aux: [[BooleanVar]] = {(i, j): model.NewBoolVar(f'aux_{i}_{j}') for i in team_count_range for j in
-                           team_count_range}
-    for i in team_count_range:
-        for j in team_count_range:
-            if i == j:
-                model.Add(aux[(i, j)] == 1)
-            else:
-                model.Add(total_points[i] - total_points[j] <= (1 - aux[(i, j)]) * BIG_M)
-                model.Add(total_points[j] - total_points[i] <= aux[(i, j)] * BIG_M)
-        ranks[i] = sum(aux[(i, j)] for j in team_count_range)
-    team_index: int = team_database.get_team_index(team)
-    cutoff_team_index: int = team_database.get_team_index(cutoff_team)
-    model.Add(total_points[cutoff_team_index] == cutoff_points)
-    model.Add(ranks[cutoff_team_index] == cutoff + 1)
-    model.Add(ranks[team_index] == cutoff)
-
-    for scenario in scenarios:
-        scenario(model, ranks)
-
-    model.Minimize(total_points[team_index])
+    print("DreamLeague Season 29")
+    print_indicators(full_ept.ept_dl_s29.tournament.indicators, solver, team_database)
 
 
 def print_single_match(match: SingleMatch, solver: CpSolver, team_database: TeamDatabase):
@@ -373,6 +190,19 @@ class FullEpt:
         self.ept_dl_s29 = ept_dl_s29
         self.ept_dl_s29_gs = ept_dl_s29_gs
 
+        # Completed events and transfer windows only contribute constants, so fold them into one vector
+        self.ledger: BaselineLedger = BaselineLedger(team_database, [
+            ept_dl_s27,
+            dl_s27_to_dl_s28,
+            ept_dl_s28_gs1,
+            ept_dl_s28_gs2,
+            ept_dl_s28,
+            dl_s28_to_esl_one_bir_2026,
+            ept_esl_one_bir_2026_gs,
+            ept_esl_one_bir_2026,
+            esl_one_bir_2026_to_dl_s29,
+        ])
+
     def get_display_phases(self) -> [HasDisplayPhase]:
         return [
             self.ept_dl_s27,
@@ -385,16 +215,9 @@ class FullEpt:
         ]
 
     def get_total_points(self, team_database: TeamDatabase, teams: [Team]):
+        baseline: [int] = self.ledger.get_baseline()
         return [
-            self.ept_dl_s27.get_obtained_points(t_index) +
-            self.dl_s27_to_dl_s28.get_change(t_index) +
-            self.ept_dl_s28_gs1.get_obtained_points(t_index) +
-            self.ept_dl_s28_gs2.get_obtained_points(t_index) +
-            self.ept_dl_s28.get_obtained_points(t_index) +
-            self.dl_s28_to_esl_one_bir_2026.get_change(t_index) +
-            self.ept_esl_one_bir_2026_gs.get_obtained_points(t_index) +
-            self.ept_esl_one_bir_2026.get_obtained_points(t_index) +
-            self.esl_one_bir_2026_to_dl_s29.get_change(t_index) +
+            baseline[t_index] +
             self.ept_dl_s29_gs.get_obtained_points(t_index) +
             self.ept_dl_s29.get_obtained_points(t_index)
             for t in teams
@@ -402,4 +225,5 @@ class FullEpt:
         ]
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import functools
+import importlib
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from ortools.sat.python.cp_model import CpModel
+
+import optimiser
+import ranking
+import threshold_search
+from ept import EptStage, EptTournament
+from stage import Stage, Tournament
+
+
+class Record:
+    # One instrumented call.  Totals include nested instrumented calls, self_ values do not
+    def __init__(self, owner: str, method: str, name: str, depth: int):
+        self.owner = owner
+        self.method = method
+        self.name = name
+        self.depth = depth
+        self.time: float = 0
+        self.variables: int = 0
+        self.constraints: int = 0
+        self.self_time: float = 0
+        self.self_variables: int = 0
+        self.self_constraints: int = 0
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class Instrumentation:
+    def __init__(self):
+        self.records: [Record] = []
+        self.stack: [Record] = []
+
+    def call(self, function, model: CpModel, owner: str, method: str, name: str, *args, **kwargs):
+        record: Record = Record(owner, method, name, len(self.stack))
+        self.records.append(record)
+        self.stack.append(record)
+        proto = model.Proto()
+        variables, constraints = len(proto.variables), len(proto.constraints)
+        start_time: float = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record.time = time.perf_counter() - start_time
+            record.variables = len(proto.variables) - variables
+            record.constraints = len(proto.constraints) - constraints
+            self.stack.pop()
+            record.self_time += record.time
+            record.self_variables += record.variables
+            record.self_constraints += record.constraints
+            if self.stack:
+                parent: Record = self.stack[-1]
+                parent.self_time -= record.time
+                parent.self_variables -= record.variables
+                parent.self_constraints -= record.constraints
+
+    def get_breakdown(self, key) -> [Tuple[str, int, float, int, int]]:
+        # (key, calls, self time, self variables, self constraints), biggest models first
+        totals: Dict[str, List] = {}
+        for record in self.records:
+            total = totals.setdefault(key(record), [0, 0.0, 0, 0])
+            total[0] += 1
+            total[1] += record.self_time
+            total[2] += record.self_variables
+            total[3] += record.self_constraints
+        return sorted(((name, *total) for name, total in totals.items()), key=lambda row: (-row[3], -row[4]))
+
+    def print_table(self):
+        for title, key in [("Per stage", lambda record: record.name),
+                           ("Per method", lambda record: f"{record.owner}.{record.method}")]:
+            breakdown = self.get_breakdown(key)
+            width: int = max([len(title)] + [len(row[0]) for row in breakdown])
+            print(f"{title.ljust(width)} {'calls':>6} {'time (ms)':>10} {'variables':>10} {'constraints':>12}")
+            for name, calls, self_time, variables, constraints in breakdown:
+                print(f"{name.ljust(width)} {calls:>6} {self_time * 1000:>10.1f} {variables:>10} {constraints:>12}")
+            print()
+
+    def dump(self, path: str):
+        with open(path, "w") as file:
+            json.dump([record.to_dict() for record in self.records], file, indent=2)
+
+
+def get_stage_classes() -> [type]:
+    classes: [type] = [Stage]
+    for stage_class in classes:
+        classes.extend(subclass for subclass in stage_class.__subclasses__() if subclass not in classes)
+    return classes
+
+
+def is_instrumented(method_name: str) -> bool:
+    return method_name in ["build", "add_constraints"] or method_name.startswith("bind_")
+
+
+def wrap_method(instrumentation: Instrumentation, owner: type, method_name: str, get_model, get_name):
+    method = owner.__dict__[method_name]
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return instrumentation.call(method, get_model(self), owner.__name__, method_name, get_name(self), self, *args,
+                                    **kwargs)
+
+    setattr(owner, method_name, wrapper)
+    return owner, method_name, method
+
+
+# ranking, and the modules that imported encode_ranks from it by name
+RANK_MODULES = [ranking, optimiser, threshold_search]
+
+
+def wrap_encode_ranks(instrumentation: Instrumentation):
+    encode_ranks = ranking.encode_ranks
+
+    @functools.wraps(encode_ranks)
+    def wrapper(model: CpModel, *args, **kwargs):
+        return instrumentation.call(encode_ranks, model, "ranking", "encode_ranks", "ranks", model, *args, **kwargs)
+
+    for module in RANK_MODULES:
+        module.encode_ranks = wrapper
+    return encode_ranks
+
+
+@contextmanager
+def instrument():
+    # Opt-in: only models built inside the with block are measured, and the classes are restored afterwards
+    instrumentation: Instrumentation = Instrumentation()
+    wrapped: [Tuple[type, str, object]] = []
+
+    for stage_class in get_stage_classes():
+        for method_name in list(vars(stage_class)):
+            if is_instrumented(method_name) and callable(vars(stage_class)[method_name]):
+                wrapped.append(wrap_method(instrumentation, stage_class, method_name,
+                                           lambda stage: stage.metadata.model, lambda stage: stage.name))
+    wrapped.append(wrap_method(instrumentation, Tournament, "build",
+                               lambda tournament: tournament.metadata.model, lambda tournament: tournament.name))
+    wrapped.append(wrap_method(instrumentation, EptStage, "build",
+                               lambda ept_stage: ept_stage.stage.metadata.model,
+                               lambda ept_stage: f"{ept_stage.stage.name} points"))
+    wrapped.append(wrap_method(instrumentation, EptTournament, "build",
+                               lambda ept_tournament: ept_tournament.metadata.model,
+                               lambda ept_tournament: f"{ept_tournament.tournament.name} points"))
+    encode_ranks = wrap_encode_ranks(instrumentation)
+
+    try:
+        yield instrumentation
+    finally:
+        for owner, method_name, method in wrapped:
+            setattr(owner, method_name, method)
+        for module in RANK_MODULES:
+            module.encode_ranks = encode_ranks
+
+
+def main(arguments: List[str]):
+    # python instrumentation.py ept_s4 [cutoff] [instrumentation.json]
+    season: str = arguments[0] if len(arguments) > 0 else "ept_s4"
+    cutoff: int = int(arguments[1]) if len(arguments) > 1 else 13
+    path: str = arguments[2] if len(arguments) > 2 else "instrumentation.json"
+
+    module = importlib.import_module(season)
+    team_database = module.get_team_database()
+    with instrument() as instrumentation:
+        season_model: optimiser.SeasonModel = optimiser.SeasonModel(module.FullEpt, team_database)
+        team = team_database.get_all_teams()[0]
+        optimiser.maximise_cutoff_plus_one(season_model.new_model([team]), team, team_database,
+                                           team_database.get_all_teams(), season_model.total_points, cutoff,
+                                           [optimiser.no_scenario], points_bounds=season_model.points_bounds)
+
+    instrumentation.print_table()
+    instrumentation.dump(path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,40 @@
+from typing import Tuple
+
+from ept import SolvedEptStage, SolvedEptTournament
+from teams import TeamDatabase
+from transfer_window import TransferWindow
+
+
+class BaselineLedger:
+    # Points every team already has from completed events and transfer windows, folded into one vector.  Totals are
+    # then baseline[i] + the open events.  Recomputed only when one of the sources (or the team list) changes
+    def __init__(self, team_database: TeamDatabase, sources: [SolvedEptTournament | SolvedEptStage | TransferWindow]):
+        self.team_database = team_database
+        self.sources = sources
+        self.baseline: [int] = []
+        self.versions: Tuple[int, ...] | None = None
+
+    def get_versions(self) -> Tuple[int, ...]:
+        return (len(self.team_database.get_all_teams()),) + tuple(source.version for source in self.sources)
+
+    def get_baseline(self) -> [int]:
+        versions: Tuple[int, ...] = self.get_versions()
+        if versions != self.versions:
+            self.baseline = self.calculate_baseline()
+            self.versions = versions
+        return self.baseline
+
+    def get_baseline_points(self, team_index: int) -> int:
+        return self.get_baseline()[team_index]
+
+    def calculate_baseline(self) -> [int]:
+        team_database: TeamDatabase = self.team_database
+        baseline: [int] = [0 for _ in team_database.get_all_teams()]
+        for source in self.sources:
+            if isinstance(source, TransferWindow):
+                for team_index, delta in source.get_changes().items():
+                    baseline[team_index] += delta
+            else:
+                for team, position in source.positions.items():
+                    baseline[team_database.get_team_index(team)] += source.points[position]
+        return baseline
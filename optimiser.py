@@ -0,0 +1,458 @@
+import functools
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Value
+from typing import Dict, List, Tuple
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import CpModel, IntVar
+
+from constants import BUILD_SEASON_MODEL_ONCE, RANK_ENCODING, BREAK_SYMMETRY, ACHIEVABLE_POINTS_DOMAINS
+from display_phases import HasDisplayPhase
+from ept import EptTournamentBase, EptTournament, EptStage, EptStageBase
+from metadata import Metadata
+from ranking import encode_ranks
+from symmetry import find_symmetry_groups, add_symmetry_breaking, get_representatives
+from teams import Team, TeamDatabase, Region
+from transfer_window import TransferWindow
+
+
+def no_scenario(model, ranks):
+    pass
+
+
+def get_teams_to_optimise(team_database: TeamDatabase, representatives: Dict[Team, Team] | None = None) -> [Team]:
+    # Track pseudo-teams.  All of them are basically the same, so optimising for one is the same as the others.  Skip if done
+    regions_with_pseudo_teams_solved: [Region] = []
+    teams_to_optimise: [Team] = []
+    for team in team_database.get_all_teams():
+        if team.is_pseudo:
+            if team.region in regions_with_pseudo_teams_solved:
+                continue
+            else:
+                regions_with_pseudo_teams_solved.append(team.region)
+        # Interchangeable with a team that is solved anyway
+        if representatives is not None and team in representatives:
+            continue
+        teams_to_optimise.append(team)
+    return teams_to_optimise
+
+
+def add_interchangeable_teams(max_objective_value_teams: [Team], representatives: Dict[Team, Team]) -> [Team]:
+    # Teams that were not solved because they are interchangeable with one that has the maximum have it too
+    return max_objective_value_teams + [team for team, representative in representatives.items()
+                                        if representative in max_objective_value_teams]
+
+
+def calculate_theoretical_maximum_for_team(phases, team: Team, team_database: TeamDatabase):
+    # Calculate theoretical maximum.  If this is less than the current maximum, don't bother solving
+    max_possible_points_for_team: int = 0
+    for phase in phases:
+        if isinstance(phase, EptTournamentBase):
+            max_possible_points_for_team += phase.get_maximum_points_for_team(team)
+        elif isinstance(phase, TransferWindow):
+            max_possible_points_for_team += phase.get_change(team_database.get_team_index(team))
+    return max_possible_points_for_team
+
+
+def calculate_guaranteed_minimum_for_team(phases, team: Team, team_database: TeamDatabase):
+    # Points already banked.  Open tournaments can still give nothing, and transfer windows can take points away
+    min_possible_points_for_team: int = 0
+    for phase in phases:
+        if isinstance(phase, EptTournamentBase):
+            if phase.is_complete():
+                min_possible_points_for_team += phase.get_maximum_points_for_team(team)
+        elif isinstance(phase, TransferWindow):
+            min_possible_points_for_team += phase.get_change(team_database.get_team_index(team))
+    return min_possible_points_for_team
+
+
+def calculate_points_bounds(phases, team_database: TeamDatabase) -> [Tuple[int, int]]:
+    # (guaranteed minimum, theoretical maximum) for every team, in team index order
+    return [
+        (calculate_guaranteed_minimum_for_team(phases, team, team_database),
+         calculate_theoretical_maximum_for_team(phases, team, team_database))
+        for team in team_database.get_all_teams()
+    ]
+
+
+def get_zero_variables(model: CpModel) -> set:
+    # Variables the model fixes to 0, by domain or by an unconditional "sum of non-negative terms is at most 0" (how
+    # ineligible teams and known placements rule placements out)
+    proto = model.Proto()
+    zero_variables: set = {index for index, variable in enumerate(proto.variables) if variable.domain[-1] <= 0}
+    for constraint in proto.constraints:
+        if constraint.WhichOneof("constraint") != "linear" or constraint.enforcement_literal:
+            continue
+        linear = constraint.linear
+        if linear.domain[-1] <= 0 and all(
+                coefficient > 0 and variable >= 0 and proto.variables[variable].domain[0] >= 0
+                for variable, coefficient in zip(linear.vars, linear.coeffs)):
+            zero_variables.update(linear.vars)
+    return zero_variables
+
+
+def get_points_values(indicators, points: [int], team_index: int, zero_variables: set) -> {int}:
+    # What one stage can give a team: nothing, or the points of any placement it is not ruled out of
+    values: {int} = {0}
+    row = indicators.rows.get(team_index)
+    if row is None:
+        return values
+    for placement in range(min(len(points), len(row))):
+        if points[placement] != 0 and row[placement].index not in zero_variables:
+            values.add(points[placement])
+    return values
+
+
+def get_tournament_points_values(ept_tournament: EptTournament, team_index: int, zero_variables: set) -> [{int}]:
+    # One set of values per stage, and one for the tournament's own points
+    values: [{int}] = [get_points_values(ept_tournament.tournament.indicators, ept_tournament.points, team_index,
+                                         zero_variables)]
+    ept_stage: EptStageBase = ept_tournament.first_ept_stage
+    while ept_stage is not None:
+        if isinstance(ept_stage, EptStage):
+            values.append(get_points_values(ept_stage.stage.indicators, ept_stage.get_points(), team_index,
+                                            zero_variables))
+        else:
+            values.append({ept_stage.get_obtained_points(team_index)})
+        ept_stage = ept_stage.next_ept_stage
+    return values
+
+
+def calculate_achievable_totals(phases, team_database: TeamDatabase, model: CpModel) -> [[int]]:
+    # Every total each team can end the season on, in order: the points already banked, plus one value from every
+    # stage of every open tournament.  A subset sum with bit p of the bitset set if p points on top are reachable.
+    # Stages are combined as if independent, so a total may be reachable here and still not in the model, never the
+    # other way round
+    zero_variables: set = get_zero_variables(model)
+    achievable_totals: [[int]] = []
+    for team in team_database.get_all_teams():
+        team_index: int = team_database.get_team_index(team)
+        reachable: int = 1
+        for phase in phases:
+            if not isinstance(phase, EptTournament):
+                continue
+            for values in get_tournament_points_values(phase, team_index, zero_variables):
+                reachable = functools.reduce(operator.or_, [reachable << value for value in values])
+
+        baseline: int = calculate_guaranteed_minimum_for_team(phases, team, team_database)
+        achievable_totals.append([baseline + points for points in range(reachable.bit_length())
+                                  if reachable >> points & 1])
+    return achievable_totals
+
+
+def maximise_cutoff_plus_one(model, team, team_database, teams, total_points, cutoff: int, scenarios,
+                             rank_encoding: str = RANK_ENCODING, points_bounds: List[Tuple[int, int]] | None = None,
+                             upper_bound: int | None = None):
+    ranks = encode_ranks(model, total_points, rank_encoding, points_bounds)
+    team_index: int = team_database.get_team_index(team)
+    model.Add(ranks[team_index] > cutoff)
+    # Known from a smaller cutoff in a sweep, so CP-SAT can stop as soon as a solution reaches it
+    if upper_bound is not None:
+        model.Add(total_points[team_index] <= upper_bound)
+
+    for scenario in scenarios:
+        scenario(model, ranks)
+
+    model.Maximize(total_points[team_index])
+
+
+def minimise_cutoff(model, team, team_database, teams, total_points, cutoff: int, cutoff_team: Team,
+                    cutoff_points: int, scenarios, rank_encoding: str = RANK_ENCODING,
+                    points_bounds: List[Tuple[int, int]] | None = None):
+    ranks = encode_ranks(model, total_points, rank_encoding, points_bounds)
+    team_index: int = team_database.get_team_index(team)
+    cutoff_team_index: int = team_database.get_team_index(cutoff_team)
+    model.Add(total_points[cutoff_team_index] == cutoff_points)
+    model.Add(ranks[cutoff_team_index] == cutoff + 1)
+    model.Add(ranks[team_index] == cutoff)
+
+    for scenario in scenarios:
+        scenario(model, ranks)
+
+    model.Minimize(total_points[team_index])
+
+
+class SeasonModel:
+    # Every tournament and transfer window of a season, built into one CpModel.  Per-team models are clones of it, and
+    # a clone keeps the variable indices, so the indicators and points expressions built here are valid in all of them
+    def __init__(self, full_ept_class, team_database: TeamDatabase):
+        self.full_ept_class = full_ept_class
+        self.team_database: TeamDatabase = team_database
+        self.model: CpModel = CpModel()
+        self.metadata: Metadata = Metadata(team_database, self.model)
+        self.full_ept = full_ept_class(self.metadata)
+        self.phases: [HasDisplayPhase] = self.full_ept.get_display_phases()
+        self.total_points = self.full_ept.get_total_points(team_database, team_database.get_all_teams())
+        self.points_bounds: [Tuple[int, int]] = calculate_points_bounds(self.phases, team_database)
+        # Points banked, before the bounds are narrowed to the achievable totals
+        self.baseline: [int] = [points_bounds[0] for points_bounds in self.points_bounds]
+        self.achievable_totals: [[int]] = calculate_achievable_totals(self.phases, team_database, self.model)
+        if ACHIEVABLE_POINTS_DOMAINS:
+            self.points_bounds = [(totals[0], totals[-1]) for totals in self.achievable_totals]
+            for points, totals in zip(self.total_points, self.achievable_totals):
+                if not isinstance(points, int):
+                    self.model.AddLinearExpressionInDomain(points, cp_model.Domain.FromValues(totals))
+        # Variables from here on are added per team, so only the first variable_count line up between models
+        self.variable_count: int = len(self.model.Proto().variables)
+        self.symmetry_groups: [[Team]] = find_symmetry_groups(self.phases, team_database, self.baseline)
+        self.representatives: Dict[Team, Team] = get_representatives(self.symmetry_groups) if BREAK_SYMMETRY else {}
+
+    def new_model(self, excluded_teams: List[Team] | None = None) -> CpModel:
+        # The teams the new model singles out are left out of symmetry breaking.  Without them, there is none
+        model: CpModel = self.model.clone()
+        if BREAK_SYMMETRY and excluded_teams is not None:
+            add_symmetry_breaking(model, self.symmetry_groups, self.phases, self.team_database, excluded_teams)
+        return model
+
+    def get_solution(self, solver: cp_model.CpSolver) -> [int]:
+        # Values of the season's variables, to hint a later model with
+        return list(solver.response_proto.solution[:self.variable_count])
+
+
+class MinimiseCutoffModel:
+    # The second phase for one team, built once.  Each team that can finish just outside the cutoff gets a literal
+    # enforcing its constraints, and solving for it only fixes the literals (and swaps the hint) instead of rebuilding
+    # the model and the ranks
+    def __init__(self, season_model: SeasonModel, team: Team, cutoff: int, cutoff_teams: [Team], cutoff_points: int,
+                 scenarios):
+        team_database: TeamDatabase = season_model.team_database
+        total_points = season_model.total_points
+        self.model: CpModel = season_model.new_model([team] + cutoff_teams)
+        ranks = encode_ranks(self.model, total_points, RANK_ENCODING, season_model.points_bounds)
+        team_index: int = team_database.get_team_index(team)
+        self.model.Add(ranks[team_index] == cutoff)
+
+        for scenario in scenarios:
+            scenario(self.model, ranks)
+
+        self.cutoff_team_literals: Dict[Team, IntVar] = {}
+        for cutoff_team in cutoff_teams:
+            if cutoff_team == team:
+                continue
+            cutoff_team_index: int = team_database.get_team_index(cutoff_team)
+            literal: IntVar = self.model.new_bool_var(f'cutoff_team_{cutoff_team.name}')
+            self.model.Add(total_points[cutoff_team_index] == cutoff_points).only_enforce_if(literal)
+            self.model.Add(ranks[cutoff_team_index] == cutoff + 1).only_enforce_if(literal)
+            self.cutoff_team_literals[cutoff_team] = literal
+
+        self.model.Minimize(total_points[team_index])
+
+    def select(self, cutoff_team: Team, hint: List[int] | None = None) -> CpModel:
+        proto = self.model.Proto()
+        for team, literal in self.cutoff_team_literals.items():
+            value: int = 1 if team == cutoff_team else 0
+            proto.variables[literal.index].domain[:] = [value, value]
+
+        set_solution_hint(self.model, hint)
+        return self.model
+
+
+def set_solution_hint(model: CpModel, hint: List[int] | None):
+    # The hint covers the season's variables, which have the same indices in every clone
+    model.clear_hints()
+    if hint is not None:
+        proto = model.Proto()
+        proto.solution_hint.vars.extend(range(len(hint)))
+        proto.solution_hint.values.extend(hint)
+
+
+class SolutionPool:
+    # A few past solutions, kept apart from each other, to hint the next team's solve with.  Each one keeps the total
+    # points it gave every team, so the one that already has the team furthest outside the cutoff can be picked
+    def __init__(self, size: int):
+        self.size = size
+        self.solutions: [Tuple[List[int], List[int]]] = []
+
+    def add(self, values: [int], totals: [int]):
+        if any(values == existing_values for existing_values, _ in self.solutions):
+            return
+        if len(self.solutions) >= self.size:
+            # Drop the one closest to the new solution, so the pool stays spread out
+            closest: int = min(range(len(self.solutions)),
+                               key=lambda i: sum(a != b for a, b in zip(self.solutions[i][0], values)))
+            del self.solutions[closest]
+        self.solutions.append((values, totals))
+
+    def get_hint(self, team_index: int, cutoff: int) -> List[int] | None:
+        if not self.solutions:
+            return None
+
+        # Ties can go either way, so a team level on points with the cutoff team can still be outside it
+        def worst_rank(totals: [int]) -> int:
+            return 1 + sum(1 for j, points in enumerate(totals) if j != team_index and points >= totals[team_index])
+
+        outside_cutoff = [(values, totals) for values, totals in self.solutions if worst_rank(totals) > cutoff]
+        if not outside_cutoff:
+            return self.solutions[-1][0]
+        return max(outside_cutoff, key=lambda solution: solution[1][team_index])[0]
+
+
+# The last season model built.  Only one is kept, so optimising another season or team database replaces it rather
+# than keeping every model alive
+last_season_model: SeasonModel | None = None
+
+
+def build_season_model(full_ept_class, team_database: TeamDatabase) -> SeasonModel:
+    global last_season_model
+    if not BUILD_SEASON_MODEL_ONCE:
+        return SeasonModel(full_ept_class, team_database)
+
+    if last_season_model is None or last_season_model.full_ept_class is not full_ept_class or \
+            last_season_model.team_database is not team_database:
+        last_season_model = SeasonModel(full_ept_class, team_database)
+    return last_season_model
+
+
+def get_num_workers_per_solve(processes: int, num_workers: int) -> int:
+    # 0 means "split the machine evenly between the processes"
+    if num_workers > 0:
+        return num_workers
+    return max(1, (os.cpu_count() or 1) // processes)
+
+
+# Best cutoff plus one value found by any process so far, and the season every team is solved in.  Set in each worker
+# by the pool initialiser
+shared_incumbent = None
+worker_season_model: SeasonModel | None = None
+
+
+def set_shared_incumbent(incumbent):
+    global shared_incumbent
+    shared_incumbent = incumbent
+
+
+def set_up_worker(incumbent, full_ept_class, team_database: TeamDatabase):
+    # CpModel cannot be pickled, so every worker builds the season once here, and each task only clones it.  Building
+    # it per task would rebuild it for every team, as the team database is pickled again with each one
+    global worker_season_model
+    set_shared_incumbent(incumbent)
+    worker_season_model = build_season_model(full_ept_class, team_database)
+
+
+def publish_incumbent(objective_value: int):
+    with shared_incumbent.get_lock():
+        if objective_value > shared_incumbent.value:
+            shared_incumbent.value = objective_value
+
+
+class SharedIncumbentCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, solver: cp_model.CpSolver):
+        super().__init__()
+        self.solver = solver
+        self.stopped = False
+
+    def on_solution_callback(self):
+        publish_incumbent(round(self.objective_value))
+        self.stop_if_dominated(self.best_objective_bound)
+
+    def stop_if_dominated(self, best_objective_bound: float):
+        # Strictly less, a team equal to the incumbent still has to be reported as tied
+        if best_objective_bound < shared_incumbent.value:
+            self.stopped = True
+            self.solver.stop_search()
+
+
+def solve_maximise_cutoff_plus_one_for_team(team_name: str, cutoff: int, scenarios, num_workers: int,
+                                            upper_bound: int | None = None) -> Tuple[int | None, bool]:
+    # Runs in a worker process, in the season set_up_worker built
+    # Returns the objective value (None if the team cannot finish outside the cutoff) and whether the solve was pruned
+    # by the shared incumbent
+    season_model: SeasonModel = worker_season_model
+    team_database: TeamDatabase = season_model.team_database
+    team: Team = team_database.get_team_by_name(team_name)
+    teams: [Team] = team_database.get_all_teams()
+
+    model: CpModel = season_model.new_model([team])
+
+    incumbent: int = shared_incumbent.value
+    max_possible_points_for_team = calculate_theoretical_maximum_for_team(season_model.phases, team, team_database)
+    if incumbent > max_possible_points_for_team:
+        return None, True
+
+    print(f"Now optimising for {team.name}")
+    total_points = season_model.total_points
+    maximise_cutoff_plus_one(model, team, team_database, teams, total_points, cutoff, scenarios,
+                             points_bounds=season_model.points_bounds, upper_bound=upper_bound)
+
+    # Anything below the incumbent cannot change the result, so only search above it
+    team_index: int = team_database.get_team_index(team)
+    if incumbent >= 0:
+        model.Add(total_points[team_index] >= incumbent)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = num_workers
+    callback: SharedIncumbentCallback = SharedIncumbentCallback(solver)
+    solver.best_bound_callback = callback.stop_if_dominated
+    status = solver.Solve(model, callback)
+    if status == cp_model.OPTIMAL:
+        # I really don't like doing this, but there is a stupid scenario where one is something like 999.999 and one is 1000.0001
+        objective_value: int = round(solver.objective_value)
+        publish_incumbent(objective_value)
+        return objective_value, False
+
+    if callback.stopped or (status == cp_model.INFEASIBLE and incumbent >= 0):
+        return None, True
+
+    return None, False
+
+
+def optimise_maximise_cutoff_plus_one_in_pool(full_ept_class, cutoff: int, max_cutoff_plus_one: int,
+                                              max_objective_value_teams: [Team], team_database: TeamDatabase,
+                                              scenarios, processes: int, num_workers: int,
+                                              upper_bound: int | None = None):
+    season_model: SeasonModel = build_season_model(full_ept_class, team_database)
+    teams_to_optimise: [Team] = get_teams_to_optimise(team_database, season_model.representatives)
+    num_workers_per_solve: int = get_num_workers_per_solve(processes, num_workers)
+
+    # The theoretical maximum only depends on the season, not on the team being optimised, so work it out here
+    phases: [HasDisplayPhase] = season_model.phases
+    max_possible_points: Dict[str, int] = {
+        team.name: calculate_theoretical_maximum_for_team(phases, team, team_database) for team in teams_to_optimise
+    }
+
+    print(f"Optimising {len(teams_to_optimise)} teams in {processes} processes with {num_workers_per_solve} workers each")
+    incumbent = Value('q', max_cutoff_plus_one)
+    results: Dict[str, Tuple[int | None, bool]] = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=set_up_worker,
+                             initargs=(incumbent, full_ept_class, team_database)) as executor:
+        futures = {
+            executor.submit(solve_maximise_cutoff_plus_one_for_team, team.name, cutoff, scenarios,
+                            num_workers_per_solve, upper_bound): team.name
+            for team in teams_to_optimise
+            if max_cutoff_plus_one <= max_possible_points[team.name]
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    # Merge in the same order as the sequential loop, so the maximum and the tied teams come out identical
+    for team in teams_to_optimise:
+        max_possible_points_for_team = max_possible_points[team.name]
+        if max_cutoff_plus_one > max_possible_points_for_team:
+            print(
+                f"Team {team.name}'s maximum points ({max_possible_points_for_team}) is less than objective value ({max_cutoff_plus_one}).  Skipping")
+            continue
+
+        new_objective_value, pruned = results[team.name]
+        if pruned:
+            print(f"Team {team.name} cannot reach the incumbent ({incumbent.value}).  Skipping")
+            continue
+
+        if new_objective_value is None:
+            print(f"Team {team.name} probably cannot finish in position {cutoff}")
+            continue
+
+        if new_objective_value > max_cutoff_plus_one:
+            max_objective_value_teams = [team]
+            max_cutoff_plus_one = new_objective_value
+        elif new_objective_value == max_cutoff_plus_one:
+            max_objective_value_teams.append(team)
+        else:
+            print(
+                f"Maximum objective value for {team.name} ({new_objective_value}) is not greater than current maximum {max_cutoff_plus_one}")
+            continue
+
+        print(f"Maximum objective value: {max_cutoff_plus_one}")
+
+    return max_cutoff_plus_one, add_interchangeable_teams(max_objective_value_teams, season_model.representatives)
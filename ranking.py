@@ -0,0 +1,101 @@
+from typing import Dict, List, Tuple
+
+from ortools.constraint_solver.pywrapcp import BooleanVar
+from ortools.sat.python.cp_model import CpModel, IntVar, LinearExpr
+
+from constants import BIG_M, RANK_ENCODING
+
+
+def is_decided(points_bounds: List[Tuple[int, int]] | None, i: int, j: int) -> bool:
+    # Team j finishes strictly ahead of team i in every scenario, so the pair does not need a boolean
+    if points_bounds is None:
+        return False
+    return points_bounds[j][0] > points_bounds[i][1]
+
+
+class LazyRanks:
+    # Only the ranks that are actually constrained get encoded, so asking for one rank costs O(n) instead of the
+    # O(n^2) of encoding the whole table
+    def __init__(self, model: CpModel, total_points: [LinearExpr], points_bounds: List[Tuple[int, int]] | None = None):
+        self.model = model
+        self.total_points = total_points
+        self.points_bounds = points_bounds
+        self.ranks: Dict[int, LinearExpr] = {}
+
+    def __getitem__(self, team_index: int) -> LinearExpr:
+        if team_index not in self.ranks:
+            self.ranks[team_index] = self.encode_rank(team_index)
+        return self.ranks[team_index]
+
+    def __len__(self) -> int:
+        return len(self.total_points)
+
+    def encode_rank(self, i: int) -> LinearExpr:
+        # 1 + the number of other teams on at least as many points.  Ties are free either way, as with big-M
+        model: CpModel = self.model
+        at_least_as_many_points: [BooleanVar | int] = []
+        for j in range(len(self.total_points)):
+            if i == j:
+                continue
+
+            if is_decided(self.points_bounds, i, j):
+                at_least_as_many_points.append(1)
+                continue
+            if is_decided(self.points_bounds, j, i):
+                continue
+
+            ahead: BooleanVar = model.NewBoolVar(f'ahead_{j}_{i}')
+            model.Add(self.total_points[j] >= self.total_points[i]).only_enforce_if(ahead)
+            model.Add(self.total_points[j] <= self.total_points[i]).only_enforce_if(ahead.Not())
+            at_least_as_many_points.append(ahead)
+        return 1 + sum(at_least_as_many_points)
+
+
+def encode_ranks_big_m(model: CpModel, total_points: [LinearExpr],
+                       points_bounds: List[Tuple[int, int]] | None = None) -> Dict[int, LinearExpr]:
+    team_count_range = range(len(total_points))
+    ranks: [IntVar] = {team: model.NewIntVar(1, len(total_points), f'ranks_{team}') for team in team_count_range}
+    aux: [[BooleanVar | int]] = {}
+    for i in team_count_range:
+        for j in team_count_range:
+            # Pairs whose order is already decided are constants, not booleans
+            if i != j and is_decided(points_bounds, i, j):
+                aux[(i, j)] = 1
+            elif i != j and is_decided(points_bounds, j, i):
+                aux[(i, j)] = 0
+            else:
+                aux[(i, j)] = model.NewBoolVar(f'aux_{i}_{j}')
+
+    for i in team_count_range:
+        for j in team_count_range:
+            if i == j:
+                model.Add(aux[(i, j)] == 1)
+            elif isinstance(aux[(i, j)], int):
+                continue
+            elif points_bounds is None:
+                model.Add(total_points[i] - total_points[j] <= (1 - aux[(i, j)]) * BIG_M)
+                model.Add(total_points[j] - total_points[i] <= aux[(i, j)] * BIG_M)
+            else:
+                # The largest gap either way is one team's maximum minus the other's minimum
+                min_i, max_i = points_bounds[i]
+                min_j, max_j = points_bounds[j]
+                model.Add(total_points[i] - total_points[j] <= (1 - aux[(i, j)]) * (max_i - min_j))
+                model.Add(total_points[j] - total_points[i] <= aux[(i, j)] * (max_j - min_i))
+        ranks[i] = sum(aux[(i, j)] for j in team_count_range)
+    return ranks
+
+
+def encode_ranks_counting(model: CpModel, total_points: [LinearExpr],
+                          points_bounds: List[Tuple[int, int]] | None = None) -> LazyRanks:
+    return LazyRanks(model, total_points, points_bounds)
+
+
+def encode_ranks(model: CpModel, total_points: [LinearExpr], rank_encoding: str = RANK_ENCODING,
+                 points_bounds: List[Tuple[int, int]] | None = None):
+    # points_bounds is each team's (guaranteed minimum, theoretical maximum), indexed like total_points
+    if rank_encoding == "big_m":
+        return encode_ranks_big_m(model, total_points, points_bounds)
+    elif rank_encoding == "counting":
+        return encode_ranks_counting(model, total_points, points_bounds)
+    else:
+        raise ValueError(f"Unknown rank encoding {rank_encoding}")
@@ -0,0 +1,274 @@
+import importlib
+import sys
+import time
+from math import ceil
+from typing import Dict, List, Tuple
+
+import numpy as np
+from ortools.sat.python.cp_model import CpModel
+
+from bracket import Bracket
+from constants import SIMULATION_SAMPLES, SIMULATION_BATCH_SIZE
+from ept import EptTournament, EptStage
+from metadata import Metadata
+from stage import Stage, Root, GroupStage, PairGroupStage, NO_TEAM
+from symmetry import get_stages
+from teams import Team, TeamDatabase
+
+
+class Batch:
+    # Sampled outcomes of one tournament.  A row that contradicts a known result or restriction is invalid
+    def __init__(self, rng: np.random.Generator, sample_count: int, team_database: TeamDatabase):
+        self.rng = rng
+        self.sample_count = sample_count
+        self.team_database = team_database
+        self.rows = np.arange(sample_count)
+        self.invalid = np.zeros(sample_count, dtype=bool)
+
+    def get_team_indices(self, teams: [Team]) -> np.ndarray:
+        # The same teams in every row
+        indices = np.array([self.team_database.get_team_index(team) for team in teams])
+        return np.broadcast_to(indices, (self.sample_count, len(indices)))
+
+    def choose(self, allowed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # A uniformly random allowed column per row, and whether the row had one
+        keys = self.rng.random(allowed.shape, dtype=np.float32)
+        keys[~allowed] = -1
+        return keys.argmax(axis=1), allowed.any(axis=1)
+
+
+def fill_placements(batch: Batch, entrants: np.ndarray, slots: [int], team_constraints: Dict[int, Tuple[int, int]],
+                    placements: np.ndarray):
+    # Puts the entrants into the slots (placements of the stage) in a random order.  Teams restricted to a range of
+    # placements go first, narrowest range first, so this is not exactly uniform over the allowed orders
+    slots = np.array(slots)
+    free = np.ones((batch.sample_count, len(slots)), dtype=bool)
+    placed = np.zeros(entrants.shape, dtype=bool)
+    for team_index, (lower, upper) in sorted(team_constraints.items(), key=lambda item: item[1][1] - item[1][0]):
+        is_entrant = entrants == team_index
+        present = is_entrant.any(axis=1)
+        in_range = (slots >= lower) & (slots <= upper)
+        chosen, has_slot = batch.choose(free & in_range & present[:, None])
+        rows = batch.rows[has_slot]
+        placements[rows, slots[chosen[has_slot]]] = team_index
+        free[rows, chosen[has_slot]] = False
+        placed |= is_entrant & has_slot[:, None]
+
+    # Everyone else gets the free slots in a random order: unplaced entrants first, against free slots first
+    entrant_order = np.argsort(placed, axis=1, kind="stable")
+    unplaced = np.take_along_axis(entrants, entrant_order, axis=1)
+    unplaced_count = (~placed).sum(axis=1)
+    keys = batch.rng.random(free.shape, dtype=np.float32)
+    keys[~free] = 2
+    slot_order = np.argsort(keys, axis=1)
+    free_count = free.sum(axis=1)
+    for j in range(min(entrants.shape[1], len(slots))):
+        take = (j < unplaced_count) & (j < free_count)
+        placements[batch.rows[take], slots[slot_order[take, j]]] = unplaced[take, j]
+
+
+def simulate_group_stage(batch: Batch, stage: GroupStage | PairGroupStage, entrants: np.ndarray) -> np.ndarray:
+    placements = np.full((batch.sample_count, stage.team_count), NO_TEAM)
+    team_constraints: Dict[int, Tuple[int, int]] = stage.get_team_constraint_ranges()
+
+    if isinstance(stage, PairGroupStage) and stage.get_group_placements() is not None:
+        for group, slots in stage.get_group_placements():
+            fill_placements(batch, batch.get_team_indices(group), slots, team_constraints, placements)
+    else:
+        fill_placements(batch, entrants, list(range(stage.team_count)), team_constraints, placements)
+
+    # Restricted teams that did not make it here, or did not fit their range, and anything left unfilled
+    for team_index, (lower, upper) in team_constraints.items():
+        batch.invalid |= ~(placements[:, lower:upper + 1] == team_index).any(axis=1)
+    batch.invalid |= (placements == NO_TEAM).any(axis=1)
+
+    if stage.team_guaranteed_playoff_lb_or_eliminated:
+        restricted = batch.get_team_indices(stage.team_guaranteed_playoff_lb_or_eliminated)
+        in_top_two = (placements[:, 0:2, None] == restricted[:, None, :]).any(axis=2)
+        batch.invalid |= in_top_two.sum(axis=1) > 1
+    return placements
+
+
+def simulate_bracket(batch: Batch, bracket: Bracket, previous_placements: np.ndarray | None, final: np.ndarray):
+    # Every match is a coin flip unless its winner is known.  Teams seeded into the same matches are shuffled
+    team_database: TeamDatabase = batch.team_database
+    spec = bracket.spec
+    match_entrants: Dict[str, List[np.ndarray]] = {match_name: [] for match_name in spec.matches}
+    for match_name, team_indices in spec.fixed_seeds.items():
+        for team in [bracket.teams[i] for i in team_indices]:
+            match_entrants[match_name].append(np.full(batch.sample_count, team_database.get_team_index(team)))
+
+    if len(spec.seeds) > 0 and previous_placements is None:
+        raise ValueError(f"{bracket.name} is seeded from a previous stage, but has none")
+    for seed, open_slots in zip(spec.seeds, spec.get_open_slots()):
+        seeded = previous_placements[:, seed.positions]
+        seeded = np.take_along_axis(seeded, np.argsort(batch.rng.random(seeded.shape), axis=1), axis=1)
+        for j, match_name in enumerate(open_slots):
+            match_entrants[match_name].append(seeded[:, j])
+
+    eliminations: Dict[Tuple[str, int], int] = {
+        (elimination.match, elimination.match_placement): elimination.placement for elimination in spec.eliminations
+    }
+    for match_name in spec.get_match_order():
+        if len(match_entrants[match_name]) != 2:
+            raise ValueError(f"{bracket.name}: {match_name} does not get exactly two teams")
+
+        a, b = match_entrants[match_name]
+        match = bracket.matches[match_name]
+        if match.winner is not None:
+            winner_index: int = team_database.get_team_index(match.winner)
+            batch.invalid |= (a != winner_index) & (b != winner_index)
+            winner = np.full(batch.sample_count, winner_index)
+        else:
+            winner = np.where(batch.rng.random(batch.sample_count) < 0.5, a, b)
+        loser = np.where(winner == a, b, a)
+
+        for team, match_placement, edges in [(winner, 0, spec.winners), (loser, 1, spec.losers)]:
+            if match_name in edges:
+                match_entrants[edges[match_name]].append(team)
+            elif (match_name, match_placement) in eliminations:
+                final[:, eliminations[(match_name, match_placement)]] = team
+            else:
+                raise ValueError(f"{bracket.name}: {match_name} sends teams out of the tournament")
+
+
+def simulate_tournament(batch: Batch, tournament) -> Tuple[np.ndarray, Dict[Stage, np.ndarray]]:
+    # Final placements, and the placements of every group stage, in one pass over the stages
+    final = np.full((batch.sample_count, tournament.starting_stage.team_count), NO_TEAM)
+    stage_placements: Dict[Stage, np.ndarray] = {}
+    entrants: np.ndarray | None = None
+    previous_placements: np.ndarray | None = None
+    for stage in get_stages(tournament):
+        if isinstance(stage, Root):
+            entrants = batch.get_team_indices(stage.teams)
+        elif isinstance(stage, Bracket):
+            if stage.next_stage is not None:
+                raise ValueError(f"{stage.name}: only the last stage can be a bracket")
+            simulate_bracket(batch, stage, previous_placements, final)
+        elif isinstance(stage, (GroupStage, PairGroupStage)):
+            if entrants is None:
+                eligible_teams: List[Team] | None = stage.get_eligible_teams()
+                if eligible_teams is None or len(eligible_teams) != stage.team_count:
+                    raise ValueError(f"{stage.name}: the teams taking part are not known")
+                entrants = batch.get_team_indices(eligible_teams)
+
+            placements: np.ndarray = simulate_group_stage(batch, stage, entrants)
+            stage_placements[stage] = placements
+            advancing_team_count: int = stage.get_advancing_team_count()
+            final[:, advancing_team_count:stage.team_count] = placements[:, advancing_team_count:]
+            entrants = placements[:, :advancing_team_count]
+            previous_placements = placements
+        else:
+            raise ValueError(f"{stage.name}: {type(stage).__name__} cannot be simulated")
+
+    if tournament.zero_point_teams:
+        zero_point_teams = batch.get_team_indices(tournament.zero_point_teams)
+        batch.invalid |= (final[:, :, None] == zero_point_teams[:, None, :]).any(axis=(1, 2))
+    if ((final == NO_TEAM).any(axis=1) & ~batch.invalid).any():
+        raise ValueError(f"{tournament.name}: not every placement can be filled")
+    return final, stage_placements
+
+
+def sample_tournament(rng: np.random.Generator, ept_tournament: EptTournament, team_database: TeamDatabase,
+                      sample_count: int) -> Tuple[np.ndarray, Dict[Stage, np.ndarray]]:
+    # Only outcomes consistent with the tournament's known results, drawn until there are sample_count of them.  Later
+    # draws are sized by how many of the first one were kept
+    finals: [np.ndarray] = []
+    stage_placements: Dict[Stage, List[np.ndarray]] = {}
+    valid_count: int = 0
+    drawn_count: int = 0
+    while valid_count < sample_count:
+        draw_count: int = sample_count if valid_count == 0 else \
+            ceil((sample_count - valid_count) * drawn_count / valid_count * 1.1)
+        batch: Batch = Batch(rng, draw_count, team_database)
+        final, placements = simulate_tournament(batch, ept_tournament.tournament)
+        valid = ~batch.invalid
+        if not valid.any():
+            raise ValueError(f"{ept_tournament.tournament.name}: no sampled outcome fits the known results")
+
+        finals.append(final[valid])
+        for stage, stage_placement in placements.items():
+            stage_placements.setdefault(stage, []).append(stage_placement[valid])
+        valid_count += int(valid.sum())
+        drawn_count += draw_count
+
+    return np.concatenate(finals)[:sample_count], {
+        stage: np.concatenate(arrays)[:sample_count] for stage, arrays in stage_placements.items()
+    }
+
+
+def add_points(points: np.ndarray, placements: np.ndarray, placement_points: [int]):
+    rows = np.arange(points.shape[0])
+    for p, value in enumerate(placement_points[:placements.shape[1]]):
+        if value != 0:
+            points[rows, placements[:, p]] += value
+
+
+def sample_points(rng: np.random.Generator, open_tournaments: [EptTournament], baseline: np.ndarray,
+                  team_database: TeamDatabase, sample_count: int) -> np.ndarray:
+    # Season totals per sampled outcome: completed events and transfer windows, then every open event and its stages
+    points = np.tile(baseline, (sample_count, 1))
+    for ept_tournament in open_tournaments:
+        final, stage_placements = sample_tournament(rng, ept_tournament, team_database, sample_count)
+        add_points(points, final, ept_tournament.points)
+
+        ept_stage: EptStage = ept_tournament.first_ept_stage
+        while ept_stage is not None:
+            add_points(points, stage_placements[ept_stage.stage], ept_stage.get_points())
+            ept_stage = ept_stage.next_ept_stage
+    return points
+
+
+def simulate_season(full_ept_class, team_database: TeamDatabase, cutoffs: [int],
+                    sample_count: int = SIMULATION_SAMPLES, batch_size: int = SIMULATION_BATCH_SIZE,
+                    seed: int | None = None) -> Dict[int, np.ndarray]:
+    # Probability of every team finishing in the top cutoff, per cutoff.  The season's structure is built once, into
+    # a CpModel that is never solved, and ties on points are broken at random
+    rng: np.random.Generator = np.random.default_rng(seed)
+    full_ept = full_ept_class(Metadata(team_database, CpModel()))
+    open_tournaments: [EptTournament] = [phase for phase in full_ept.get_display_phases()
+                                         if isinstance(phase, EptTournament)]
+    baseline = np.array(full_ept.ledger.get_baseline(), dtype=np.int64)
+
+    top_counts: Dict[int, np.ndarray] = {cutoff: np.zeros(len(baseline), dtype=np.int64) for cutoff in cutoffs}
+    remaining: int = sample_count
+    while remaining > 0:
+        count: int = min(batch_size, remaining)
+        points = sample_points(rng, open_tournaments, baseline, team_database, count)
+        ranks = np.argsort(np.argsort(-(points + rng.random(points.shape)), axis=1), axis=1)
+        for cutoff in cutoffs:
+            top_counts[cutoff] += (ranks < cutoff).sum(axis=0)
+        remaining -= count
+
+    return {cutoff: counts / sample_count for cutoff, counts in top_counts.items()}
+
+
+def print_probabilities(probabilities: Dict[int, np.ndarray], team_database: TeamDatabase):
+    cutoffs: [int] = sorted(probabilities)
+    teams: [Team] = sorted(team_database.get_all_teams(),
+                           key=lambda team: [-probabilities[cutoff][team_database.get_team_index(team)]
+                                             for cutoff in cutoffs])
+    width: int = max(len(team.name) for team in teams)
+    print(f"{'Team'.ljust(width)} " + " ".join(f"{f'Top {cutoff}':>9}" for cutoff in cutoffs))
+    for team in teams:
+        team_index: int = team_database.get_team_index(team)
+        print(f"{team.name.ljust(width)} " +
+              " ".join(f"{probabilities[cutoff][team_index]:>9.2%}" for cutoff in cutoffs))
+
+
+def main(arguments: List[str]):
+    # python simulation.py ept_s4 8,13 [samples]
+    season: str = arguments[0] if len(arguments) > 0 else "ept_s4"
+    cutoffs: [int] = [int(cutoff) for cutoff in arguments[1].split(",")] if len(arguments) > 1 else [8, 13]
+    sample_count: int = int(arguments[2]) if len(arguments) > 2 else SIMULATION_SAMPLES
+
+    module = importlib.import_module(season)
+    team_database: TeamDatabase = module.get_team_database()
+    start_time: float = time.time()
+    probabilities: Dict[int, np.ndarray] = simulate_season(module.FullEpt, team_database, cutoffs, sample_count)
+    print_probabilities(probabilities, team_database)
+    print(f"{sample_count} samples in {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
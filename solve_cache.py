@@ -0,0 +1,185 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import Counter
+from array import array
+from typing import Dict, List, Tuple
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import CpModel, CpSolver
+
+from constants import SOLVE_CACHE_PATH, SOLVE_CACHE_MAX_BYTES, INCREMENTAL_SOLVE
+from optimiser import set_solution_hint
+
+
+def get_fingerprint(model: CpModel, solver: CpSolver) -> str:
+    # The hint only steers the search, so two models that differ in it still have the same answer
+    proto = model.Proto().__class__()
+    proto.CopyFrom(model.Proto())
+    proto.ClearField("solution_hint")
+    fingerprint = hashlib.sha256(proto.SerializeToString(deterministic=True))
+    fingerprint.update(solver.parameters.SerializeToString(deterministic=True))
+    return fingerprint.hexdigest()
+
+
+def get_named_solution(model: CpModel, solver: CpSolver) -> Dict[str, int]:
+    # Indices move when a result changes the encoding, so solutions kept between runs are matched up by name
+    names: [str] = [variable.name for variable in model.Proto().variables]
+    name_counts: Counter = Counter(names)
+    solution = solver.response_proto.solution
+    return {name: solution[index] for index, name in enumerate(names) if name and name_counts[name] == 1}
+
+
+def set_named_solution_hint(model: CpModel, named_solution: Dict[str, int]):
+    model.clear_hints()
+    proto = model.Proto()
+    for index, variable in enumerate(proto.variables):
+        if variable.name in named_solution:
+            proto.solution_hint.vars.append(index)
+            proto.solution_hint.values.append(named_solution[variable.name])
+
+
+class SolveCache:
+    # Status, objective and solution of past solves in a SQLite file, keyed by the model's fingerprint.  Once the
+    # solutions take up more than max_bytes, the least recently used ones are evicted.  The last result of every
+    # incremental solve is kept as well, keyed by what was solved rather than by the model
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS solves (
+                fingerprint TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                objective_value REAL NOT NULL,
+                solution BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS previous_solves (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                objective_value REAL NOT NULL,
+                solution TEXT NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, fingerprint: str) -> Tuple[int, float, List[int]] | None:
+        row = self.connection.execute("SELECT status, objective_value, solution FROM solves WHERE fingerprint = ?",
+                                      (fingerprint,)).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute("UPDATE solves SET last_used = ? WHERE fingerprint = ?", (time.time(), fingerprint))
+        self.connection.commit()
+        status, objective_value, solution = row
+        return status, objective_value, array('q', solution).tolist()
+
+    def put(self, fingerprint: str, status: int, objective_value: float, solution: [int]):
+        self.connection.execute("INSERT OR REPLACE INTO solves VALUES (?, ?, ?, ?, ?)",
+                                (fingerprint, status, objective_value, array('q', solution).tobytes(), time.time()))
+        self.evict()
+        self.connection.commit()
+
+    def get_previous(self, key: str) -> Tuple[int, float, Dict[str, int]] | None:
+        row = self.connection.execute("SELECT status, objective_value, solution FROM previous_solves WHERE key = ?",
+                                      (key,)).fetchone()
+        if row is None:
+            return None
+        status, objective_value, solution = row
+        return status, objective_value, json.loads(solution)
+
+    def put_previous(self, key: str, status: int, objective_value: float, named_solution: Dict[str, int]):
+        self.connection.execute("INSERT OR REPLACE INTO previous_solves VALUES (?, ?, ?, ?)",
+                                (key, status, objective_value, json.dumps(named_solution)))
+        self.connection.commit()
+
+    def evict(self):
+        total_bytes: int = self.connection.execute("SELECT COALESCE(SUM(LENGTH(solution)), 0) FROM solves").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        for fingerprint, size in self.connection.execute(
+                "SELECT fingerprint, LENGTH(solution) FROM solves ORDER BY last_used").fetchall():
+            self.connection.execute("DELETE FROM solves WHERE fingerprint = ?", (fingerprint,))
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+
+
+solve_cache: SolveCache | None = None
+
+
+def get_solve_cache() -> SolveCache | None:
+    global solve_cache
+    if SOLVE_CACHE_PATH is None:
+        return None
+    if solve_cache is None:
+        solve_cache = SolveCache(SOLVE_CACHE_PATH, SOLVE_CACHE_MAX_BYTES)
+    return solve_cache
+
+
+def solve_with_cache(solver: CpSolver, model: CpModel):
+    # Solver.Solve, but a model that was solved before is not searched again.  An optimal solution is replayed with
+    # every variable fixed, so the solver can still be asked for values afterwards
+    cache: SolveCache | None = get_solve_cache()
+    if cache is None:
+        return solver.Solve(model)
+
+    fingerprint: str = get_fingerprint(model, solver)
+    cached = cache.get(fingerprint)
+    if cached is not None:
+        status, objective_value, solution = cached
+        if status != cp_model.OPTIMAL:
+            return status
+
+        hint = model.Proto().solution_hint.__class__()
+        hint.CopyFrom(model.Proto().solution_hint)
+        set_solution_hint(model, solution)
+        solver.parameters.fix_variables_to_their_hinted_value = True
+        replayed_status = solver.Solve(model)
+        solver.parameters.ClearField("fix_variables_to_their_hinted_value")
+        model.Proto().solution_hint.CopyFrom(hint)
+        if replayed_status == cp_model.OPTIMAL:
+            return replayed_status
+
+    status = solver.Solve(model)
+    # Anything else was cut short, and solving again could give a different answer
+    if status in (cp_model.OPTIMAL, cp_model.INFEASIBLE):
+        objective_value: float = solver.objective_value if status == cp_model.OPTIMAL else 0
+        cache.put(fingerprint, status, objective_value, list(solver.response_proto.solution))
+    return status
+
+
+def solve_incrementally(solver: CpSolver, model: CpModel, key: str):
+    # For entering results one at a time: every new result only tightens the model, which can neither improve an
+    # optimum nor make an infeasible model feasible.  So if the previous optimum for the same key still fits, with the
+    # same objective, it is still optimal and the search is skipped, and an infeasible result stays infeasible
+    cache: SolveCache | None = get_solve_cache()
+    if not INCREMENTAL_SOLVE or cache is None:
+        return solve_with_cache(solver, model)
+
+    previous = cache.get_previous(key)
+    if previous is not None:
+        previous_status, previous_objective_value, named_solution = previous
+        if previous_status == cp_model.INFEASIBLE:
+            return previous_status
+
+        hint = model.Proto().solution_hint.__class__()
+        hint.CopyFrom(model.Proto().solution_hint)
+        set_named_solution_hint(model, named_solution)
+        solver.parameters.fix_variables_to_their_hinted_value = True
+        status = solver.Solve(model)
+        solver.parameters.ClearField("fix_variables_to_their_hinted_value")
+        model.Proto().solution_hint.CopyFrom(hint)
+        if status == cp_model.OPTIMAL and round(solver.objective_value) == round(previous_objective_value):
+            return status
+
+    status = solve_with_cache(solver, model)
+    if status == cp_model.OPTIMAL:
+        cache.put_previous(key, status, solver.objective_value, get_named_solution(model, solver))
+    elif status == cp_model.INFEASIBLE:
+        cache.put_previous(key, status, 0, {})
+    return status
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
 
 from ortools.constraint_solver.pywrapcp import BooleanVar
 from ortools.sat.python.cp_model import CpModel, IntVar
@@ -6,6 +7,9 @@ from ortools.sat.python.cp_model import CpModel, IntVar
 from metadata import Metadata
 from teams import Team, TeamDatabase
 
+# In placements given as team indices, a placement nobody has been put in
+NO_TEAM = -1
+
 
 class TeamConstraint:
     def __init__(self, team: Team, lower: int, upper: int):
@@ -14,6 +18,46 @@ class TeamConstraint:
         self.upper = upper
 
 
+class Indicators:
+    # One row of placement indicators per team in the database.  Rows are only created when they are first used, and a
+    # team that cannot take part gets the model's constant 0 in every placement instead of its own booleans.  The set of
+    # eligible teams is asked for when a row is created, so it may shrink after construction but never grow
+    def __init__(self, name: str, placement_count: int, metadata: Metadata, get_eligible_teams):
+        self.name = name
+        self.placement_count = placement_count
+        self.metadata = metadata
+        self.get_eligible_teams = get_eligible_teams
+        self.rows: Dict[int, [BooleanVar]] = {}
+
+    def __getitem__(self, team_index: int) -> [BooleanVar]:
+        if team_index not in self.rows:
+            self.rows[team_index] = self.build_row(team_index)
+        return self.rows[team_index]
+
+    def __len__(self) -> int:
+        return len(self.metadata.team_database.get_all_teams())
+
+    def __iter__(self):
+        for team_index in range(len(self)):
+            yield self[team_index]
+
+    def build_row(self, team_index: int) -> [BooleanVar]:
+        model: CpModel = self.metadata.model
+        team: Team = self.metadata.team_database.get_team_by_index(team_index)
+        if not self.is_eligible(team):
+            zero: IntVar = model.new_constant(0)
+            return [zero for _ in range(self.placement_count)]
+
+        return [model.new_bool_var(f'x_{self.name}_{team.name}_{j}') for j in range(self.placement_count)]
+
+    def is_eligible(self, team: Team) -> bool:
+        eligible_teams: List[Team] | None = self.get_eligible_teams()
+        # Fewer known teams than placements means someone else has to fill the rest, so everyone stays eligible
+        if eligible_teams is None or len(eligible_teams) < self.placement_count:
+            return True
+        return team in eligible_teams
+
+
 class Tournament:
     def __init__(self,
                  name: str,
@@ -25,11 +69,9 @@ class Tournament:
         self.is_team_list_complete = False
         self.zero_point_teams = []
 
-        self.indicators: [[BooleanVar]] = [
-            [self.metadata.model.new_bool_var(
-                f'x_{self.name}_{self.metadata.team_database.get_team_by_index(i).name}_{j}') for j in
-                range(self.starting_stage.team_count)]
-            for i in range(len(self.metadata.team_database.get_all_teams()))]
+        # Every team in the tournament enters through the starting stage
+        self.indicators: [[BooleanVar]] = Indicators(self.name, self.starting_stage.team_count, self.metadata,
+                                                     self.starting_stage.get_eligible_teams)
 
     def build(self):
         # One placement per team
@@ -84,12 +126,10 @@ class Stage(ABC):
         self.metadata: Metadata = metadata
         self.participating_teams_if_group_unknown = None
 
-        self.indicators: [[BooleanVar]] = [
-            [self.metadata.model.new_bool_var(
-                f'x_{self.name}_{self.metadata.team_database.get_team_by_index(i).name}_{j}') for j in
-                range(self.team_count)]
-            for i in range(len(self.metadata.team_database.get_all_teams()))]
+        self.indicators: [[BooleanVar]] = Indicators(self.name, self.team_count, self.metadata,
+                                                     self.get_eligible_teams)
 
+        self.previous_stage: Stage | None = None
         self.next_stage: Stage | None = None
         self.team_constraints: [TeamConstraint] = []
         self.team_guaranteed_playoff_lb_or_eliminated: [Team] = []
@@ -123,6 +163,7 @@ class Stage(ABC):
     def bind_forward(self,
                      stage: "Stage"):
         self.next_stage = stage
+        stage.previous_stage = self
         pass
 
     @abstractmethod
@@ -134,6 +175,14 @@ class Stage(ABC):
     def is_team_participating(self, team: Team) -> bool:
         pass
 
+    def get_team_constraint_ranges(self) -> Dict[int, Tuple[int, int]]:
+        # Team index -> (best, worst) placement, 0-based, for the teams restricted with team_can_finish_between
+        team_database: TeamDatabase = self.metadata.team_database
+        return {
+            team_database.get_team_index(team_constraint.team): (team_constraint.lower, team_constraint.upper)
+            for team_constraint in self.team_constraints
+        }
+
     def team_can_finish_between(self, team_name: str, best: int, worst: int):
         team: Team = self.metadata.team_database.get_team_by_name(team_name)
         self.team_constraints.append(TeamConstraint(team, best - 1, worst - 1))
@@ -141,6 +190,20 @@ class Stage(ABC):
     def guaranteed_playoff_lb_or_eliminated(self, *team_names: str):
         self.team_guaranteed_playoff_lb_or_eliminated = self.metadata.team_database.get_teams_by_names(*team_names)
 
+    def get_eligible_teams(self) -> List[Team] | None:
+        # Teams that can possibly place in this stage, or None if any team can
+        if self.participating_teams_if_group_unknown is not None:
+            return self.participating_teams_if_group_unknown
+
+        if self.previous_stage is not None:
+            return self.previous_stage.get_teams_for_next_stage()
+
+        return None
+
+    def get_teams_for_next_stage(self) -> List[Team] | None:
+        # Teams only reach the next stage through this one
+        return self.get_eligible_teams()
+
     def set_participating_teams(self, teams: [Team]):
         if len(teams) != self.team_count:
             raise ValueError(f"Participating team count {len(teams)} must equal team count {self.team_count}")
@@ -172,6 +235,9 @@ class Root(Stage, ABC):
     def is_team_participating(self, team: Team) -> bool:
         return team in self.teams
 
+    def get_eligible_teams(self) -> List[Team] | None:
+        return self.teams
+
 
 class RootUnknownAdvances(Stage, ABC):
     def __init__(self,
@@ -201,6 +267,13 @@ class RootUnknownAdvances(Stage, ABC):
     def is_team_participating(self, team: Team) -> bool:
         return team in self.teams
 
+    def get_eligible_teams(self) -> List[Team] | None:
+        return self.teams
+
+    def get_teams_for_next_stage(self) -> List[Team] | None:
+        # Only some of these teams advance, and the rest of the next stage is made up of other teams
+        return None
+
 
 class GroupStage(Stage, ABC):
     def __init__(self,
@@ -214,6 +287,10 @@ class GroupStage(Stage, ABC):
         super().__init__(name, team_count, metadata)
         self.advancing_team_count = advancing_team_count
 
+    def get_advancing_team_count(self) -> int:
+        # The last stage sends nobody on
+        return self.advancing_team_count if self.next_stage is not None else 0
+
     def add_constraints(self):
         model: CpModel = self.metadata.model
 
@@ -264,27 +341,31 @@ class PairGroupStage(Stage, ABC):
         self.group_a = group_a
         self.group_b = group_b
 
+    def get_advancing_team_count(self) -> int:
+        # Both groups send teams on
+        return self.advancing_team_count_per_group * 2 if self.next_stage is not None else 0
+
+    def get_group_placements(self) -> List[Tuple[List[Team], List[int]]] | None:
+        # (teams, placements they share) per group, if the groups are known.  By convention, assume A is odd, B is
+        # even: A finishes 1st, 3rd, 5th, etc. and B 2nd, 4th, 6th, etc.
+        if self.group_a is None:
+            return None
+        return [(self.group_a, list(range(0, self.team_count, 2))),
+                (self.group_b, list(range(1, self.team_count, 2)))]
+
     def add_constraints(self):
         team_database: TeamDatabase = self.metadata.team_database
         model: CpModel = self.metadata.model
 
-        # By convention, assume A is odd, B is even
-        # A finishes 1st, 3rd, 5th, etc.
-        if self.group_a is not None:
-            for team in self.group_a:
-                team_index = team_database.get_team_index(team)
-                row_sum = 0
-                for placement in range(0, self.team_count, 2):
-                    row_sum += self.indicators[team_index][placement]
-                model.Add(row_sum == 1)
-
-            # B finishes 2nd, 4th, 6th, etc.
-            for team in self.group_b:
-                team_index = team_database.get_team_index(team)
-                row_sum = 0
-                for placement in range(1, self.team_count, 2):
-                    row_sum += self.indicators[team_index][placement]
-                model.Add(row_sum == 1)
+        group_placements: List[Tuple[List[Team], List[int]]] | None = self.get_group_placements()
+        if group_placements is not None:
+            for group, placements in group_placements:
+                for team in group:
+                    team_index = team_database.get_team_index(team)
+                    row_sum = 0
+                    for placement in placements:
+                        row_sum += self.indicators[team_index][placement]
+                    model.Add(row_sum == 1)
 
         # Top N teams make it through to the next Stage
         # They will place *somewhere* in the next Stage
@@ -328,6 +409,12 @@ class PairGroupStage(Stage, ABC):
 
         return True
 
+    def get_eligible_teams(self) -> List[Team] | None:
+        if self.group_a is not None:
+            return self.group_a + self.group_b
+
+        return super().get_eligible_teams()
+
 
 class SingleMatch(Stage, ABC):
     def __init__(self, name: str, metadata: Metadata, teams: [Team] = None):
@@ -337,6 +424,15 @@ class SingleMatch(Stage, ABC):
         self.team_a = None
         self.team_b = None
 
+        # Where the winner and loser go.  Constraints are only added on build, when it is known who can get here
+        self.winner_matches: [SingleMatch] = []
+        self.loser_matches: [SingleMatch] = []
+        self.qualification_stages: [Stage] = []
+        self.feeder_matches: [SingleMatch] = []
+        # A known result needs the match itself in the model
+        self.has_known_winner = False
+        self.winner: Team | None = None
+
         if teams is not None:
             if len(teams) != 2:
                 raise ValueError(f"Only two teams (not {len(teams)}) expected")
@@ -348,96 +444,39 @@ class SingleMatch(Stage, ABC):
         self.team_b = team
 
     def add_constraints(self):
+        database: TeamDatabase = self.metadata.team_database
+        model: CpModel = self.metadata.model
         if self.team_a is not None:
-            database: TeamDatabase = self.metadata.team_database
-            model: CpModel = self.metadata.model
             model.Add(sum(self.indicators[database.get_team_index(self.team_a)]) == 1)
             model.Add(sum(self.indicators[database.get_team_index(self.team_b)]) == 1)
 
-    def bind_winner(self, next_match: "SingleMatch"):
-        for team in self.metadata.team_database.get_all_teams():
-            model: CpModel = self.metadata.model
-            team_index: int = self.metadata.team_database.get_team_index(team)
+        # Winning or losing puts the team in the next match directly, teams that can never get here are skipped
+        eligible_teams: List[Team] | None = self.get_eligible_teams()
+        for team in database.get_all_teams() if eligible_teams is None else eligible_teams:
+            team_index: int = database.get_team_index(team)
+            winner: BooleanVar = self.indicators[team_index][0]
+            loser: BooleanVar = self.indicators[team_index][1]
 
-            is_in_this_match: [BooleanVar] = model.new_bool_var(f"{self.name}_{team.name}_is_in_this_match")
-            winner: [BooleanVar] = model.new_bool_var(f"{self.name}_{team.name}_winner")
+            for next_match in self.winner_matches:
+                model.Add(sum(next_match.indicators[team_index]) == 1).only_enforce_if(winner)
 
-            model.Add(sum(self.indicators[team_index]) == 1).only_enforce_if(is_in_this_match)
-            model.Add(sum(self.indicators[team_index]) == 0).only_enforce_if(is_in_this_match.Not())
+            for next_match in self.loser_matches:
+                model.Add(sum(next_match.indicators[team_index]) == 1).only_enforce_if(loser)
 
-            model.Add(self.indicators[team_index][0] == 1).only_enforce_if(winner)
-            model.Add(self.indicators[team_index][0] == 0).only_enforce_if(winner.Not())
+            for first_stage in self.qualification_stages:
+                model.Add(sum(first_stage.indicators[team_index]) == 1).only_enforce_if(winner)
+                model.Add(sum(first_stage.indicators[team_index]) == 0).only_enforce_if(loser)
 
-            is_in_this_match_and_advancing: [BooleanVar] = model.new_bool_var(
-                f"{self.name}_{team.name}_is_in_this_match_and_advancing")
-            model.AddBoolAnd([is_in_this_match, winner]).only_enforce_if(is_in_this_match_and_advancing)
-            model.AddBoolOr([is_in_this_match.Not(), winner.Not()]).only_enforce_if(
-                is_in_this_match_and_advancing.Not())
-
-            is_in_this_match_and_eliminated: [BooleanVar] = model.new_bool_var(
-                f"{self.name}_{team.name}_is_in_this_match_and_eliminated")
-            model.AddBoolAnd([is_in_this_match, winner.Not()]).only_enforce_if(is_in_this_match_and_eliminated)
-            model.AddBoolOr([is_in_this_match.Not(), winner]).only_enforce_if(
-                is_in_this_match_and_eliminated.Not())
-
-            model.Add(sum(next_match.indicators[team_index]) == 1).only_enforce_if(is_in_this_match_and_advancing)
+    def bind_winner(self, next_match: "SingleMatch"):
+        self.winner_matches.append(next_match)
+        next_match.feeder_matches.append(self)
 
     def bind_loser(self, next_match: "SingleMatch"):
-        for team in self.metadata.team_database.get_all_teams():
-            model: CpModel = self.metadata.model
-            team_index: int = self.metadata.team_database.get_team_index(team)
-
-            is_in_this_match: [BooleanVar] = model.new_bool_var(f"{self.name}_{team.name}_is_in_this_match")
-            loser: [BooleanVar] = model.new_bool_var(f"{self.name}_{team.name}_loser")
-
-            model.Add(sum(self.indicators[team_index]) == 1).only_enforce_if(is_in_this_match)
-            model.Add(sum(self.indicators[team_index]) == 0).only_enforce_if(is_in_this_match.Not())
-
-            model.Add(self.indicators[team_index][1] == 1).only_enforce_if(loser)
-            model.Add(self.indicators[team_index][1] == 0).only_enforce_if(loser.Not())
-
-            is_in_this_match_and_advancing: [BooleanVar] = model.new_bool_var(
-                f"{self.name}_{team.name}_is_in_this_match_and_advancing")
-            model.AddBoolAnd([is_in_this_match, loser]).only_enforce_if(is_in_this_match_and_advancing)
-            model.AddBoolOr([is_in_this_match.Not(), loser.Not()]).only_enforce_if(
-                is_in_this_match_and_advancing.Not())
-
-            is_in_this_match_and_eliminated: [BooleanVar] = model.new_bool_var(
-                f"{self.name}_{team.name}_is_in_this_match_and_eliminated")
-            model.AddBoolAnd([is_in_this_match, loser.Not()]).only_enforce_if(is_in_this_match_and_eliminated)
-            model.AddBoolOr([is_in_this_match.Not(), loser]).only_enforce_if(
-                is_in_this_match_and_eliminated.Not())
-
-            model.Add(sum(next_match.indicators[team_index]) == 1).only_enforce_if(is_in_this_match_and_advancing)
+        self.loser_matches.append(next_match)
+        next_match.feeder_matches.append(self)
 
     def bind_qualification(self, first_stage: Stage):
-        for team in self.metadata.team_database.get_all_teams():
-            model: CpModel = self.metadata.model
-            team_index: int = self.metadata.team_database.get_team_index(team)
-
-            is_in_this_match: [BooleanVar] = model.new_bool_var(f"{self.name}_{team.name}_is_in_this_match")
-            winner: [BooleanVar] = model.new_bool_var(f"{self.name}_{team.name}_winner")
-
-            model.Add(sum(self.indicators[team_index]) == 1).only_enforce_if(is_in_this_match)
-            model.Add(sum(self.indicators[team_index]) == 0).only_enforce_if(is_in_this_match.Not())
-
-            model.Add(self.indicators[team_index][0] == 1).only_enforce_if(winner)
-            model.Add(self.indicators[team_index][0] == 0).only_enforce_if(winner.Not())
-
-            is_in_this_match_and_advancing: [BooleanVar] = model.new_bool_var(
-                f"{self.name}_{team.name}_is_in_this_match_and_advancing")
-            model.AddBoolAnd([is_in_this_match, winner]).only_enforce_if(is_in_this_match_and_advancing)
-            model.AddBoolOr([is_in_this_match.Not(), winner.Not()]).only_enforce_if(
-                is_in_this_match_and_advancing.Not())
-
-            is_in_this_match_and_eliminated: [BooleanVar] = model.new_bool_var(
-                f"{self.name}_{team.name}_is_in_this_match_and_eliminated")
-            model.AddBoolAnd([is_in_this_match, winner.Not()]).only_enforce_if(is_in_this_match_and_eliminated)
-            model.AddBoolOr([is_in_this_match.Not(), winner]).only_enforce_if(
-                is_in_this_match_and_eliminated.Not())
-
-            model.Add(sum(first_stage.indicators[team_index]) == 1).only_enforce_if(is_in_this_match_and_advancing)
-            model.Add(sum(first_stage.indicators[team_index]) == 0).only_enforce_if(is_in_this_match_and_eliminated)
+        self.qualification_stages.append(first_stage)
 
     def bind_elimination(self, tournament: Tournament):
         pass
@@ -445,466 +484,29 @@ class SingleMatch(Stage, ABC):
     def is_team_participating(self, team: Team) -> bool:
         return team == self.team_a or team == self.team_b
 
+    def get_eligible_teams(self) -> List[Team] | None:
+        if self.team_a is not None and self.team_b is not None:
+            return [self.team_a, self.team_b]
+
+        # Otherwise anyone who can come out of an earlier match, or out of the stage before the bracket
+        sources: [Stage] = list(self.feeder_matches)
+        if self.previous_stage is not None:
+            sources.append(self.previous_stage)
+        if len(sources) == 0:
+            return None
+
+        eligible_teams: [Team] = []
+        for source in sources:
+            source_teams: List[Team] | None = source.get_teams_for_next_stage()
+            if source_teams is None:
+                return None
+            for team in source_teams:
+                if team not in eligible_teams:
+                    eligible_teams.append(team)
+        return eligible_teams
+
     def set_winner(self, team_name: str):
+        self.has_known_winner = True
         metadata = self.metadata
+        self.winner = metadata.team_database.get_team_by_name(team_name)
         metadata.model.Add(self.indicators[metadata.team_database.get_team_index_by_team_name(team_name)][0] == 1)
-
-
-# noinspection PyPep8Naming
-class DoubleElimination_8U1Q(Stage, ABC):
-    def __init__(self, name: str, teams: [Team], metadata: Metadata):
-        super().__init__(name, 8, metadata)
-
-        self.teams = teams
-
-        # Bracket
-        self.ubqf_1: SingleMatch = SingleMatch(f"{name}_ubqf_1", metadata, teams[0:2])
-        self.ubqf_2: SingleMatch = SingleMatch(f"{name}_ubqf_2", metadata, teams[2:4])
-        self.ubqf_3: SingleMatch = SingleMatch(f"{name}_ubqf_3", metadata, teams[4:6])
-        self.ubqf_4: SingleMatch = SingleMatch(f"{name}_ubqf_4", metadata, teams[6:8])
-
-        self.ubsf_1: SingleMatch = SingleMatch(f"{name}_ubsf_1", metadata)
-        self.ubsf_2: SingleMatch = SingleMatch(f"{name}_ubsf_2", metadata)
-
-        self.ubf: SingleMatch = SingleMatch(f"{name}_ubf", metadata)
-
-        self.lbr1_1: SingleMatch = SingleMatch(f"{name}_lbr1_1", metadata)
-        self.lbr1_2: SingleMatch = SingleMatch(f"{name}_lbr1_2", metadata)
-
-        self.lbr2_1: SingleMatch = SingleMatch(f"{name}_lbr2_1", metadata)
-        self.lbr2_2: SingleMatch = SingleMatch(f"{name}_lbr2_2", metadata)
-
-        self.lbsf: SingleMatch = SingleMatch(f"{name}_lbsf", metadata)
-
-        self.lbf: SingleMatch = SingleMatch(f"{name}_lbf", metadata)
-
-        self.gf: SingleMatch = SingleMatch(f"{name}_gf", metadata)
-
-        self.ubqf_1.bind_winner(self.ubsf_1)
-        self.ubqf_1.bind_loser(self.lbr1_1)
-        self.ubqf_2.bind_winner(self.ubsf_1)
-        self.ubqf_2.bind_loser(self.lbr1_1)
-        self.ubqf_3.bind_winner(self.ubsf_2)
-        self.ubqf_3.bind_loser(self.lbr1_2)
-        self.ubqf_4.bind_winner(self.ubsf_2)
-        self.ubqf_4.bind_loser(self.lbr1_2)
-
-        self.ubsf_1.bind_winner(self.ubf)
-        self.ubsf_1.bind_loser(self.lbr2_2)
-        self.ubsf_2.bind_winner(self.ubf)
-        self.ubsf_2.bind_loser(self.lbr2_1)
-
-        self.ubf.bind_winner(self.gf)
-        self.ubf.bind_loser(self.lbf)
-
-        self.lbr1_1.bind_winner(self.lbr2_1)
-        self.lbr1_2.bind_winner(self.lbr2_2)
-
-        self.lbr2_1.bind_winner(self.lbsf)
-        self.lbr2_2.bind_winner(self.lbsf)
-
-        self.lbsf.bind_winner(self.lbf)
-
-        self.lbf.bind_winner(self.gf)
-
-        self.ubqf_1.build()
-        self.ubqf_2.build()
-        self.ubqf_3.build()
-        self.ubqf_4.build()
-
-        self.ubsf_1.build()
-        self.ubsf_2.build()
-
-        self.ubf.build()
-
-        self.lbr1_1.build()
-        self.lbr1_2.build()
-
-        self.lbr2_1.build()
-        self.lbr2_2.build()
-
-        self.lbsf.build()
-
-        self.lbf.build()
-
-        self.gf.build()
-
-    def is_team_participating(self, team: Team) -> bool:
-        return team in self.teams
-
-
-# noinspection PyPep8Naming
-class DoubleElimination_2U2L1D(Stage, ABC):
-    def __init__(self, name: str, metadata: Metadata):
-        super().__init__(name, 4, metadata)
-
-        # Bracket
-        self.ubf: SingleMatch = SingleMatch(f"{name}_ubf", metadata)
-        self.lbsf: SingleMatch = SingleMatch(f"{name}_lbsf", metadata)
-        self.lbf: SingleMatch = SingleMatch(f"{name}_lbf", metadata)
-        self.gf: SingleMatch = SingleMatch(f"{name}_gf", metadata)
-
-        self.ubf.bind_winner(self.gf)
-        self.ubf.bind_loser(self.lbf)
-
-        self.lbsf.bind_winner(self.lbf)
-
-        self.lbf.bind_winner(self.gf)
-
-        self.ubf.build()
-        self.lbsf.build()
-        self.lbf.build()
-        self.gf.build()
-
-    def add_constraints(self):
-        pass
-
-    def bind_backward(self, previous_stage: "Stage"):
-        team_database = self.metadata.team_database
-        model = self.metadata.model
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-
-            model.Add(sum(previous_stage.indicators[team_index][0:2]) == sum(self.ubf.indicators[team_index][0:2]))
-            model.Add(sum(previous_stage.indicators[team_index][2:4]) == sum(self.lbsf.indicators[team_index][0:2]))
-
-    def bind_elimination(self, tournament: Tournament):
-        model: CpModel = self.metadata.model
-        team_database: TeamDatabase = self.metadata.team_database
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-            model.Add(self.gf.indicators[team_index][0] == tournament.indicators[team_index][0])
-            model.Add(self.gf.indicators[team_index][1] == tournament.indicators[team_index][1])
-            model.Add(self.lbf.indicators[team_index][1] == tournament.indicators[team_index][2])
-            model.Add(self.lbsf.indicators[team_index][1] == tournament.indicators[team_index][3])
-
-    def is_team_participating(self, team: Team) -> bool:
-        # TODO: Is not used as root, so teams are unknown
-        return True
-
-
-# ESL One playoffs
-# noinspection PyPep8Naming
-class DoubleElimination_4U4L2DSL1D(Stage, ABC):
-    def __init__(self, name: str, metadata: Metadata, previous_stage_lbr1_1_positions=None):
-        super().__init__(name, 8, metadata)
-
-        # For some reason, this is not A3 vs. B4 and B3 vs. A4, but can be A4 vs. B4 (ESL One Bangkok 2024)
-        # This field defines what LBR1 series 1 (in Liquipedia terms) positions should be.
-        # A3=4, B3=5, A4=6, B4=7
-        if previous_stage_lbr1_1_positions is None:
-            previous_stage_lbr1_1_positions = [4, 7]
-        self.previous_stage_lbr1_1_positions = previous_stage_lbr1_1_positions
-
-        # Bracket
-        self.ubsf_1: SingleMatch = SingleMatch(f"{name}_ubsf_1", metadata)
-        self.ubsf_2: SingleMatch = SingleMatch(f"{name}_ubsf_2", metadata)
-        self.ubf: SingleMatch = SingleMatch(f"{name}_ubf", metadata)
-        self.gf: SingleMatch = SingleMatch(f"{name}_gf", metadata)
-
-        self.lbr1_1: SingleMatch = SingleMatch(f"{name}_lbr1_1", metadata)
-        self.lbr1_2: SingleMatch = SingleMatch(f"{name}_lbr1_2", metadata)
-        self.lbqf_1: SingleMatch = SingleMatch(f"{name}_lbqf_1", metadata)
-        self.lbqf_2: SingleMatch = SingleMatch(f"{name}_lbqf_2", metadata)
-        self.lbsf: SingleMatch = SingleMatch(f"{name}_lbsf", metadata)
-        self.lbf: SingleMatch = SingleMatch(f"{name}_lbf", metadata)
-
-        self.ubsf_1.bind_winner(self.ubf)
-        self.ubsf_1.bind_loser(self.lbqf_1)
-        self.ubsf_2.bind_winner(self.ubf)
-        self.ubsf_2.bind_loser(self.lbqf_2)
-
-        self.ubf.bind_winner(self.gf)
-        self.ubf.bind_loser(self.lbf)
-
-        self.lbr1_1.bind_winner(self.lbqf_1)
-        self.lbr1_2.bind_winner(self.lbqf_2)
-
-        self.lbqf_1.bind_winner(self.lbsf)
-        self.lbqf_2.bind_winner(self.lbsf)
-
-        self.lbsf.bind_winner(self.lbf)
-
-        self.lbf.bind_winner(self.gf)
-
-        self.ubsf_1.build()
-        self.ubsf_2.build()
-        self.ubf.build()
-        self.lbr1_1.build()
-        self.lbr1_2.build()
-        self.lbqf_1.build()
-        self.lbqf_2.build()
-        self.lbsf.build()
-        self.lbf.build()
-        self.gf.build()
-
-    def add_constraints(self):
-        pass
-
-    def bind_backward(self, previous_stage: "Stage"):
-        team_database = self.metadata.team_database
-        model = self.metadata.model
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-
-            model.Add(previous_stage.indicators[team_index][0] + previous_stage.indicators[team_index][3] == sum(
-                self.ubsf_1.indicators[team_index][0:2]))
-            model.Add(previous_stage.indicators[team_index][1] + previous_stage.indicators[team_index][2] == sum(
-                self.ubsf_2.indicators[team_index][0:2]))
-
-            lbr1_2_matchups = list({4, 5, 6, 7} - set(self.previous_stage_lbr1_1_positions))
-            lbr1_1_sum = 0
-            for lbr1_1_prev in self.previous_stage_lbr1_1_positions:
-                lbr1_1_sum = lbr1_1_sum + previous_stage.indicators[team_index][lbr1_1_prev]
-            model.Add(lbr1_1_sum == sum(self.lbr1_1.indicators[team_index][0:2]))
-
-            lbr1_2_sum = 0
-            for lbr1_2_prev in lbr1_2_matchups:
-                lbr1_2_sum = lbr1_2_sum + previous_stage.indicators[team_index][lbr1_2_prev]
-            model.Add(lbr1_2_sum == sum(self.lbr1_2.indicators[team_index][0:2]))
-
-    def bind_elimination(self, tournament: Tournament):
-        model: CpModel = self.metadata.model
-        team_database: TeamDatabase = self.metadata.team_database
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-            model.Add(self.gf.indicators[team_index][0] == tournament.indicators[team_index][0])
-            model.Add(self.gf.indicators[team_index][1] == tournament.indicators[team_index][1])
-            model.Add(self.lbf.indicators[team_index][1] == tournament.indicators[team_index][2])
-            model.Add(self.lbsf.indicators[team_index][1] == tournament.indicators[team_index][3])
-            model.Add(self.lbqf_1.indicators[team_index][1] == tournament.indicators[team_index][4])
-            model.Add(self.lbqf_2.indicators[team_index][1] == tournament.indicators[team_index][5])
-            model.Add(self.lbr1_1.indicators[team_index][1] == tournament.indicators[team_index][6])
-            model.Add(self.lbr1_2.indicators[team_index][1] == tournament.indicators[team_index][7])
-
-    def is_team_participating(self, team: Team) -> bool:
-        # TODO: is not used as root, so teams are unknown
-        return True
-
-
-# WEU - 8 teams, 3 qualify
-# noinspection PyPep8Naming
-class DoubleElimination_8_2Q_U_4L2DS_1Q(Stage, ABC):
-    def __init__(self, name: str, teams: [Team], metadata: Metadata):
-        super().__init__(name, 8, metadata)
-
-        self.teams = teams
-
-        # Bracket
-        self.ubr1_1: SingleMatch = SingleMatch(f"{name}_ubr1_1", metadata, teams[0:2])
-        self.ubr1_2: SingleMatch = SingleMatch(f"{name}_ubr1_2", metadata, teams[2:4])
-        self.ubr1_3: SingleMatch = SingleMatch(f"{name}_ubr1_3", metadata, teams[4:6])
-        self.ubr1_4: SingleMatch = SingleMatch(f"{name}_ubr1_4", metadata, teams[6:8])
-
-        self.ubr2_1: SingleMatch = SingleMatch(f"{name}_ubr2_1", metadata)
-        self.ubr2_2: SingleMatch = SingleMatch(f"{name}_ubr2_2", metadata)
-
-        self.lbr1_1: SingleMatch = SingleMatch(f"{name}_lbr1_1", metadata)
-        self.lbr1_2: SingleMatch = SingleMatch(f"{name}_lbr1_2", metadata)
-
-        self.lbr2_1: SingleMatch = SingleMatch(f"{name}_lbr2_1", metadata)
-        self.lbr2_2: SingleMatch = SingleMatch(f"{name}_lbr2_2", metadata)
-
-        self.lbr2: SingleMatch = SingleMatch(f"{name}_lbr2", metadata)
-
-        self.lbr3: SingleMatch = SingleMatch(f"{name}_lbr3", metadata)
-
-        self.ubr1_1.bind_winner(self.ubr2_1)
-        self.ubr1_1.bind_loser(self.lbr1_1)
-        self.ubr1_2.bind_winner(self.ubr2_1)
-        self.ubr1_2.bind_loser(self.lbr1_1)
-        self.ubr1_3.bind_winner(self.ubr2_2)
-        self.ubr1_3.bind_loser(self.lbr1_2)
-        self.ubr1_4.bind_winner(self.ubr2_2)
-        self.ubr1_4.bind_loser(self.lbr1_2)
-
-        self.ubr2_1.bind_loser(self.lbr2_2)
-        self.ubr2_2.bind_loser(self.lbr2_1)
-
-        self.lbr1_1.bind_winner(self.lbr2_1)
-        self.lbr1_2.bind_winner(self.lbr2_2)
-
-        self.lbr2_1.bind_winner(self.lbr2)
-        self.lbr2_2.bind_winner(self.lbr2)
-
-        self.ubr1_1.build()
-        self.ubr1_2.build()
-        self.ubr1_3.build()
-        self.ubr1_4.build()
-
-        self.ubr2_1.build()
-        self.ubr2_2.build()
-
-        self.lbr1_1.build()
-        self.lbr1_2.build()
-
-        self.lbr2_1.build()
-        self.lbr2_2.build()
-
-        self.lbr2.build()
-
-    def is_team_participating(self, team: Team) -> bool:
-        return team in self.teams
-
-    def add_constraints(self):
-        pass
-
-    def bind_elimination(self, tournament: Tournament):
-        model: CpModel = self.metadata.model
-        team_database: TeamDatabase = self.metadata.team_database
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-            model.Add(self.ubr2_1.indicators[team_index][0] == tournament.indicators[team_index][0])
-            model.Add(self.ubr2_2.indicators[team_index][0] == tournament.indicators[team_index][1])
-            model.Add(self.lbr3.indicators[team_index][0] == tournament.indicators[team_index][2])
-
-
-# DL S29
-# noinspection PyPep8Naming
-class DoubleElimination_8U8L2DSL1D(Stage, ABC):
-    def __init__(self, name: str, metadata: Metadata):
-        super().__init__(name, 12, metadata)
-
-        # Bracket
-        self.ubqf_1: SingleMatch = SingleMatch(f"{name}_ubqf_1", metadata)
-        self.ubqf_2: SingleMatch = SingleMatch(f"{name}_ubqf_2", metadata)
-        self.ubqf_3: SingleMatch = SingleMatch(f"{name}_ubqf_3", metadata)
-        self.ubqf_4: SingleMatch = SingleMatch(f"{name}_ubqf_4", metadata)
-
-        self.ubsf_1: SingleMatch = SingleMatch(f"{name}_ubsf_1", metadata)
-        self.ubsf_2: SingleMatch = SingleMatch(f"{name}_ubsf_2", metadata)
-
-        self.ubf: SingleMatch = SingleMatch(f"{name}_ubf", metadata)
-
-        self.gf: SingleMatch = SingleMatch(f"{name}_gf", metadata)
-
-        self.lbr1_1: SingleMatch = SingleMatch(f"{name}_lbr1_1", metadata)
-        self.lbr1_2: SingleMatch = SingleMatch(f"{name}_lbr1_2", metadata)
-        self.lbr1_3: SingleMatch = SingleMatch(f"{name}_lbr1_3", metadata)
-        self.lbr1_4: SingleMatch = SingleMatch(f"{name}_lbr1_4", metadata)
-
-        self.lbr2_1: SingleMatch = SingleMatch(f"{name}_lbr2_1", metadata)
-        self.lbr2_2: SingleMatch = SingleMatch(f"{name}_lbr2_2", metadata)
-
-        self.lbqf_1: SingleMatch = SingleMatch(f"{name}_lbqf_1", metadata)
-        self.lbqf_2: SingleMatch = SingleMatch(f"{name}_lbqf_2", metadata)
-
-        self.lbsf: SingleMatch = SingleMatch(f"{name}_lbsf", metadata)
-
-        self.lbf: SingleMatch = SingleMatch(f"{name}_lbf", metadata)
-
-        self.ubqf_1.bind_winner(self.ubsf_1)
-        self.ubqf_1.bind_loser(self.lbr1_1)
-        self.ubqf_2.bind_winner(self.ubsf_1)
-        self.ubqf_2.bind_loser(self.lbr1_2)
-        self.ubqf_3.bind_winner(self.ubsf_2)
-        self.ubqf_3.bind_loser(self.lbr1_3)
-        self.ubqf_4.bind_winner(self.ubsf_2)
-        self.ubqf_4.bind_loser(self.lbr1_4)
-
-        self.ubsf_1.bind_winner(self.ubf)
-        self.ubsf_1.bind_loser(self.lbqf_2)
-        self.ubsf_2.bind_winner(self.ubf)
-        self.ubsf_2.bind_loser(self.lbqf_1)
-
-        self.ubf.bind_winner(self.gf)
-        self.ubf.bind_loser(self.lbf)
-
-        self.lbr1_1.bind_winner(self.lbr2_1)
-        self.lbr1_2.bind_winner(self.lbr2_1)
-        self.lbr1_3.bind_winner(self.lbr2_2)
-        self.lbr1_4.bind_winner(self.lbr2_2)
-
-        self.lbr2_1.bind_winner(self.lbqf_1)
-        self.lbr2_2.bind_winner(self.lbqf_2)
-
-        self.lbqf_1.bind_winner(self.lbsf)
-        self.lbqf_2.bind_winner(self.lbsf)
-
-        self.lbsf.bind_winner(self.lbf)
-
-        self.lbf.bind_winner(self.gf)
-
-        self.ubqf_1.build()
-        self.ubqf_2.build()
-        self.ubqf_3.build()
-        self.ubqf_4.build()
-
-        self.ubsf_1.build()
-        self.ubsf_2.build()
-
-        self.ubf.build()
-
-        self.lbr1_1.build()
-        self.lbr1_2.build()
-        self.lbr1_3.build()
-        self.lbr1_4.build()
-
-        self.lbr2_1.build()
-        self.lbr2_2.build()
-
-        self.lbqf_1.build()
-        self.lbqf_2.build()
-
-        self.lbsf.build()
-
-        self.lbf.build()
-
-        self.gf.build()
-
-    def is_team_participating(self, team: Team) -> bool:
-        # TODO: Is not used as root, so teams are unknown
-        return True
-
-    def add_constraints(self):
-        pass
-
-    def bind_backward(self, previous_stage: "Stage"):
-        team_database = self.metadata.team_database
-        model = self.metadata.model
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-
-            model.Add(sum(previous_stage.indicators[team_index][0:8]) ==
-                      sum(self.ubqf_1.indicators[team_index]) +
-                      sum(self.ubqf_2.indicators[team_index]) +
-                      sum(self.ubqf_3.indicators[team_index]) +
-                      sum(self.ubqf_4.indicators[team_index]))
-
-            start_in_lb: IntVar = model.new_bool_var(f"{self.name}_{team.name}_start_in_lb")
-            model.Add(sum(previous_stage.indicators[team_index][8:12]) == 1).only_enforce_if(start_in_lb)
-            model.Add(sum(previous_stage.indicators[team_index][8:12]) == 0).only_enforce_if(start_in_lb.Not())
-
-            in_lb = (sum(self.lbr1_1.indicators[team_index]) +
-                     sum(self.lbr1_2.indicators[team_index]) +
-                     sum(self.lbr1_3.indicators[team_index]) +
-                     sum(self.lbr1_4.indicators[team_index]))
-            model.Add(in_lb == 1).only_enforce_if(start_in_lb)
-            #model.Add(in_lb == 0).only_enforce_if(start_in_lb.Not())
-
-            #model.Add(sum(previous_stage.indicators[team_index][8:12]) == in_lb)
-
-    def bind_elimination(self, tournament: Tournament):
-        model: CpModel = self.metadata.model
-        team_database: TeamDatabase = self.metadata.team_database
-
-        for team in team_database.get_all_teams():
-            team_index: int = team_database.get_team_index(team)
-            model.Add(self.gf.indicators[team_index][0] == tournament.indicators[team_index][0])
-            model.Add(self.gf.indicators[team_index][1] == tournament.indicators[team_index][1])
-            model.Add(self.lbf.indicators[team_index][1] == tournament.indicators[team_index][2])
-            model.Add(self.lbsf.indicators[team_index][1] == tournament.indicators[team_index][3])
-            model.Add(self.lbqf_1.indicators[team_index][1] == tournament.indicators[team_index][4])
-            model.Add(self.lbqf_2.indicators[team_index][1] == tournament.indicators[team_index][5])
-            model.Add(self.lbr2_1.indicators[team_index][1] == tournament.indicators[team_index][6])
-            model.Add(self.lbr2_2.indicators[team_index][1] == tournament.indicators[team_index][7])
-            model.Add(self.lbr1_1.indicators[team_index][1] == tournament.indicators[team_index][8])
-            model.Add(self.lbr1_2.indicators[team_index][1] == tournament.indicators[team_index][9])
-            model.Add(self.lbr1_3.indicators[team_index][1] == tournament.indicators[team_index][10])
-            model.Add(self.lbr1_4.indicators[team_index][1] == tournament.indicators[team_index][11])
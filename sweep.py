@@ -0,0 +1,276 @@
+import sys
+import time
+from typing import Dict, List, TextIO, Tuple
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import CpModel
+
+from constants import TEAM_SOLVE_PROCESSES, CP_SAT_NUM_WORKERS, INTEGRATED_MINIMISE_CUTOFF, SOLUTION_POOL_SIZE, \
+    THRESHOLD_SEARCH
+from display import Display
+from display_phases import HasDisplayPhase
+from enumeration import Enumeration, get_enumeration
+from optimiser import no_scenario, calculate_theoretical_maximum_for_team, maximise_cutoff_plus_one, \
+    minimise_cutoff, optimise_maximise_cutoff_plus_one_in_pool, SeasonModel, build_season_model, MinimiseCutoffModel, \
+    SolutionPool, set_solution_hint, add_interchangeable_teams
+from solve_cache import solve_incrementally
+from symmetry import print_interchangeable_teams
+from teams import Team, Region, TeamDatabase
+from threshold_search import search_max_cutoff_plus_one
+
+
+class SweepCutoff:
+    # One scenario file of a sweep
+    def __init__(self, cutoff: int, header: str, path: str, scenarios=None):
+        self.cutoff = cutoff
+        self.header = header
+        self.path = path
+        self.scenarios = scenarios if scenarios is not None else [no_scenario]
+
+
+def get_sweep_order(sweep_cutoffs: [SweepCutoff]) -> [SweepCutoff]:
+    # Smallest and largest cutoff first, then the one in the middle of every two solved ones, so every cutoff after the
+    # first two is bounded from both sides
+    ordered: [SweepCutoff] = sorted(sweep_cutoffs, key=lambda sweep_cutoff: sweep_cutoff.cutoff)
+    if len(ordered) <= 2:
+        return ordered
+
+    order: [SweepCutoff] = [ordered[0], ordered[-1]]
+    intervals: [Tuple[int, int]] = [(0, len(ordered) - 1)]
+    for low, high in intervals:
+        if high - low < 2:
+            continue
+        middle: int = (low + high) // 2
+        order.append(ordered[middle])
+        intervals.extend([(low, middle), (middle, high)])
+    return order
+
+
+def get_max_cutoff_plus_one_bounds(sweep_cutoff: SweepCutoff,
+                                   solved: Dict[SweepCutoff, int]) -> Tuple[int, int | None]:
+    # A team finishing outside a larger cutoff finishes outside this one too, and one finishing outside this one
+    # finishes outside any smaller one, so the maximum lies between the results of the nearest larger and smaller
+    # cutoffs.  Scenarios constrain the outcomes differently, so only cutoffs with the same ones are compared
+    lower_bounds: List[int] = [-1]
+    upper_bounds: List[int] = []
+    for other, max_cutoff_plus_one in solved.items():
+        if other.scenarios != sweep_cutoff.scenarios:
+            continue
+        if other.cutoff >= sweep_cutoff.cutoff:
+            lower_bounds.append(max_cutoff_plus_one)
+        if other.cutoff <= sweep_cutoff.cutoff:
+            upper_bounds.append(max_cutoff_plus_one)
+    return max(lower_bounds), min(upper_bounds) if upper_bounds else None
+
+
+def optimise_and_write_sweep(full_ept_class, season: str, sweep_cutoffs: [SweepCutoff], team_database: TeamDatabase,
+                             print_debug=None):
+    # Every file in one run: the season model and baseline are built once, and each cutoff's result bounds the others'
+    solved: Dict[SweepCutoff, int] = {}
+    for sweep_cutoff in get_sweep_order(sweep_cutoffs):
+        bounds: Tuple[int, int | None] = get_max_cutoff_plus_one_bounds(sweep_cutoff, solved)
+        if bounds[1] is not None:
+            print(f"{sweep_cutoff.header}: maximum cutoff plus one is between {bounds[0]} and {bounds[1]}")
+        with open(sweep_cutoff.path, "w") as file:
+            solved[sweep_cutoff] = optimise_and_write(full_ept_class, season, sweep_cutoff.cutoff, sweep_cutoff.header,
+                                                      file, team_database, sweep_cutoff.scenarios, bounds, print_debug)
+
+
+def optimise_and_write(full_ept_class, season: str, cutoff: int, header: str, file: TextIO, team_database: TeamDatabase,
+                       scenarios=None, max_cutoff_plus_one_bounds: Tuple[int, int | None] = (-1, None),
+                       print_debug=None) -> int:
+    if scenarios is None:
+        scenarios = [no_scenario]
+    teams: [Team] = team_database.get_all_teams()
+    start_time = get_epoch_time_seconds()
+    min_cutoff_teams: [Team] = []
+    max_objective_value_teams: [Team] = []
+    min_cutoff = sys.maxsize
+    max_cutoff_plus_one, upper_bound = max_cutoff_plus_one_bounds
+    season_model: SeasonModel = build_season_model(full_ept_class, team_database)
+    print_interchangeable_teams(season_model.phases, team_database, season_model.baseline)
+    enumeration: Enumeration | None = get_enumeration(season_model, scenarios)
+    phase_one_solutions: Dict[Team, [int]] = {}
+    max_cutoff_plus_one, max_objective_value_teams = optimise_maximise_cutoff_plus_one(full_ept_class,
+                                                                                       season,
+                                                                                       cutoff,
+                                                                                       max_cutoff_plus_one,
+                                                                                       max_objective_value_teams,
+                                                                                       team_database,
+                                                                                       team_database.get_all_teams(),
+                                                                                       scenarios,
+                                                                                       header,
+                                                                                       phase_one_solutions,
+                                                                                       enumeration,
+                                                                                       upper_bound,
+                                                                                       print_debug)
+
+    print(
+        f"Found maximum cutoff plus one value as {max_cutoff_plus_one} for teams {[team.name for team in max_objective_value_teams]}.  Now minimising cutoff")
+    # Track pseudo-teams.  All of them are basically the same, so optimising for one is the same as the others.  Skip if done
+    regions_with_pseudo_teams_solved: [Region] = []
+    for team in team_database.get_all_teams():
+        if team.is_pseudo:
+            if team.region in regions_with_pseudo_teams_solved:
+                continue
+            else:
+                regions_with_pseudo_teams_solved.append(team.region)
+
+        cutoff_model: MinimiseCutoffModel | None = None
+        for max_objective_value_team in max_objective_value_teams:
+            if team == max_objective_value_team:
+                continue
+
+            season_model: SeasonModel = build_season_model(full_ept_class, team_database)
+            phases: [HasDisplayPhase] = season_model.phases
+
+            print(f"Now optimising for {team.name}")
+            max_possible_points_for_team = calculate_theoretical_maximum_for_team(phases, team, team_database)
+            if max_cutoff_plus_one > max_possible_points_for_team:
+                print(
+                    f"Team {team.name}'s maximum points ({max_possible_points_for_team}) is less than objective value ({max_cutoff_plus_one}).  Skipping")
+                continue
+
+            # Optimise
+            total_points = season_model.total_points
+            if enumeration is not None:
+                model: CpModel | None = enumeration.minimise_cutoff_model(team, cutoff, max_objective_value_team,
+                                                                          max_cutoff_plus_one)
+                if model is None:
+                    print(f"Team {team.name} probably cannot finish in position {cutoff}")
+                    continue
+            elif INTEGRATED_MINIMISE_CUTOFF:
+                if cutoff_model is None:
+                    cutoff_model = MinimiseCutoffModel(season_model, team, cutoff, max_objective_value_teams,
+                                                       max_cutoff_plus_one, scenarios)
+                model: CpModel = cutoff_model.select(max_objective_value_team,
+                                                     phase_one_solutions.get(max_objective_value_team))
+            else:
+                model: CpModel = season_model.new_model([team, max_objective_value_team])
+                minimise_cutoff(model, team, team_database, teams, total_points, cutoff, max_objective_value_team,
+                                max_cutoff_plus_one, scenarios, points_bounds=season_model.points_bounds)
+
+            solver = cp_model.CpSolver()
+            if CP_SAT_NUM_WORKERS > 0:
+                solver.parameters.num_workers = CP_SAT_NUM_WORKERS
+            status = solve_incrementally(solver, model,
+                                         f"{season}:{header}:min:{team.name}:{max_objective_value_team.name}:{max_cutoff_plus_one}")
+            if status != cp_model.OPTIMAL:
+                print(f"Team {team.name} probably cannot finish in position {cutoff}")
+                continue
+
+            # I really don't like doing this, but there is a stupid scenario where one is something like 999.999 and one is 1000.0001
+            new_objective_value = round(solver.objective_value)
+            if new_objective_value < min_cutoff:
+                min_cutoff = solver.objective_value
+                min_cutoff_teams = [team]
+            elif new_objective_value == min_cutoff:
+                min_cutoff_teams.append(team)
+            else:
+                print(
+                    f"Minimum objective value for {team.name} ({solver.objective_value}) is not less than current minimum {min_cutoff}")
+                continue
+
+            display: Display = Display(phases, season_model.metadata)
+            file.write(display.print(header, team, cutoff, min_cutoff, solver))
+            print(f"Objective value: {min_cutoff}")
+    print(
+        f"Got cutoff value as {min_cutoff} for team {[team.name for team in min_cutoff_teams]} with corresponding teams {[team.name for team in max_objective_value_teams]} missing out with {max_cutoff_plus_one}")
+    end_time = get_epoch_time_seconds()
+    print(f"Completed in {end_time - start_time}s")
+    return max_cutoff_plus_one
+
+
+def get_epoch_time_seconds():
+    return round(time.time())
+
+
+def optimise_maximise_cutoff_plus_one(full_ept_class, season: str, cutoff, max_cutoff_plus_one,
+                                      max_objective_value_teams, team_database, teams, scenarios, header: str,
+                                      solutions: Dict[Team, List[int]] | None = None,
+                                      enumeration: Enumeration | None = None, upper_bound: int | None = None,
+                                      print_debug=None):
+    # One model for every team, so there is nothing to spread over processes
+    if THRESHOLD_SEARCH and enumeration is None:
+        return search_max_cutoff_plus_one(build_season_model(full_ept_class, team_database), cutoff, scenarios,
+                                          max_cutoff_plus_one, upper_bound, solutions)
+
+    if TEAM_SOLVE_PROCESSES > 1 and enumeration is None:
+        return optimise_maximise_cutoff_plus_one_in_pool(full_ept_class, cutoff, max_cutoff_plus_one,
+                                                         max_objective_value_teams, team_database, scenarios,
+                                                         TEAM_SOLVE_PROCESSES, CP_SAT_NUM_WORKERS, upper_bound)
+
+    solution_pool: SolutionPool | None = SolutionPool(SOLUTION_POOL_SIZE) if SOLUTION_POOL_SIZE > 0 else None
+    representatives: Dict[Team, Team] = build_season_model(full_ept_class, team_database).representatives
+
+    # Track pseudo-teams.  All of them are basically the same, so optimising for one is the same as the others.  Skip if done
+    regions_with_pseudo_teams_solved: [Region] = []
+    for team in team_database.get_all_teams():
+        if team.is_pseudo:
+            if team.region in regions_with_pseudo_teams_solved:
+                continue
+            else:
+                regions_with_pseudo_teams_solved.append(team.region)
+
+        if team in representatives:
+            print(f"Team {team.name} is interchangeable with {representatives[team].name}.  Skipping")
+            continue
+
+        season_model: SeasonModel = build_season_model(full_ept_class, team_database)
+        full_ept = season_model.full_ept
+        phases: [HasDisplayPhase] = season_model.phases
+
+        print(f"Now optimising for {team.name}")
+        max_possible_points_for_team = calculate_theoretical_maximum_for_team(phases, team, team_database)
+        if max_cutoff_plus_one > max_possible_points_for_team:
+            print(
+                f"Team {team.name}'s maximum points ({max_possible_points_for_team}) is less than objective value ({max_cutoff_plus_one}).  Skipping")
+            continue
+
+        # Optimise
+        total_points = season_model.total_points
+        if enumeration is not None:
+            # Already solved, the model only replays the outcome
+            model: CpModel | None = enumeration.maximise_cutoff_plus_one_model(team, cutoff)
+            if model is None:
+                print(f"Team {team.name} probably cannot finish in position {cutoff}")
+                continue
+        else:
+            model: CpModel = season_model.new_model([team])
+            maximise_cutoff_plus_one(model, team, team_database, teams, total_points, cutoff, scenarios,
+                                     points_bounds=season_model.points_bounds, upper_bound=upper_bound)
+            if solution_pool is not None:
+                set_solution_hint(model, solution_pool.get_hint(team_database.get_team_index(team), cutoff))
+
+        solver = cp_model.CpSolver()
+        if CP_SAT_NUM_WORKERS > 0:
+            solver.parameters.num_workers = CP_SAT_NUM_WORKERS
+        status = solve_incrementally(solver, model, f"{season}:{header}:max:{team.name}")
+        if status != cp_model.OPTIMAL:
+            print(f"Team {team.name} probably cannot finish in position {cutoff}")
+            continue
+
+        if solution_pool is not None:
+            solution_pool.add(season_model.get_solution(solver), [solver.value(points) for points in total_points])
+
+        # I really don't like doing this, but there is a stupid scenario where one is something like 999.999 and one is 1000.0001
+        new_objective_value = round(solver.objective_value)
+        if new_objective_value > max_cutoff_plus_one:
+            max_objective_value_teams = [team]
+            max_cutoff_plus_one = new_objective_value
+        elif new_objective_value == max_cutoff_plus_one:
+            max_objective_value_teams.append(team)
+        else:
+            print(
+                f"Maximum objective value for {team.name} ({solver.objective_value}) is not greater than current maximum {max_cutoff_plus_one}")
+            continue
+
+        print(f"Maximum objective value: {max_cutoff_plus_one}")
+        if solutions is not None:
+            solutions[team] = season_model.get_solution(solver)
+
+        # The season's own output, to check a solution by hand
+        if print_debug is not None:
+            print_debug(full_ept, solver, team_database)
+
+    return max_cutoff_plus_one, add_interchangeable_teams(max_objective_value_teams, representatives)
@@ -0,0 +1,139 @@
+from typing import Dict, List, Tuple
+
+from ortools.sat.python.cp_model import CpModel, IntVar
+
+from display_phases import HasDisplayPhase
+from ept import EptTournament
+from stage import Stage, Tournament, TeamConstraint
+from teams import Team, TeamDatabase
+
+
+def get_stages(tournament: Tournament) -> [Stage]:
+    # Everything from the root, which is bound in front of the starting stage, to the last stage
+    stage: Stage = tournament.starting_stage
+    while stage.previous_stage is not None:
+        stage = stage.previous_stage
+
+    stages: [Stage] = []
+    while stage is not None:
+        stages.append(stage)
+        stage = stage.next_stage
+    return stages
+
+
+def get_stage_signature(stage: Stage, team: Team) -> Tuple:
+    # Every way the stage refers to the team: as a fixed team, in a list of teams or in a placement range.  Brackets
+    # also refer to teams through their matches
+    signature: [Tuple] = []
+    for name, value in vars(stage).items():
+        if isinstance(value, Team):
+            if value == team:
+                signature.append((name,))
+        elif isinstance(value, list):
+            if team in value:
+                signature.append((name, "in"))
+            for item in value:
+                if isinstance(item, TeamConstraint) and item.team == team:
+                    signature.append((name, item.lower, item.upper))
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, Stage):
+                    signature.append((name, key, get_stage_signature(item, team)))
+    return tuple(signature)
+
+
+def get_remaining_signature(team: Team, phases: [HasDisplayPhase]) -> Tuple:
+    # What the team can still do: its region, for scenarios, and how every open tournament refers to it
+    signature: [object] = [team.region, team.is_pseudo]
+    for phase in phases:
+        if isinstance(phase, EptTournament):
+            signature.append(team in phase.tournament.zero_point_teams)
+            for stage in get_stages(phase.tournament):
+                signature.append(get_stage_signature(stage, team))
+    return tuple(signature)
+
+
+def group_by_remaining_signature(phases: [HasDisplayPhase], team_database: TeamDatabase) -> [[Team]]:
+    groups: Dict[Tuple, List[Team]] = {}
+    for team in team_database.get_all_teams():
+        groups.setdefault(get_remaining_signature(team, phases), []).append(team)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_symmetry_groups(phases: [HasDisplayPhase], team_database: TeamDatabase, baseline: [int]) -> [[Team]]:
+    # Teams with the same points so far and the same remaining events can swap places in every solution, so only one
+    # ordering of them is needed.  Completed events only matter through the baseline
+    groups: [[Team]] = []
+    for group in group_by_remaining_signature(phases, team_database):
+        by_baseline: Dict[int, List[Team]] = {}
+        for team in group:
+            by_baseline.setdefault(baseline[team_database.get_team_index(team)], []).append(team)
+        groups.extend(teams for teams in by_baseline.values() if len(teams) > 1)
+    return groups
+
+
+def get_representatives(symmetry_groups: [[Team]]) -> Dict[Team, Team]:
+    # Every real team that is interchangeable with an earlier one, mapped to the first team of its group.  It gets the
+    # same optimum, so it does not need its own solve.  Pseudo-teams are already skipped per region
+    representatives: Dict[Team, Team] = {}
+    for group in symmetry_groups:
+        real_teams: [Team] = [team for team in group if not team.is_pseudo]
+        for team in real_teams[1:]:
+            representatives[team] = real_teams[0]
+    return representatives
+
+
+def print_interchangeable_teams(phases: [HasDisplayPhase], team_database: TeamDatabase, baseline: [int]):
+    for group in group_by_remaining_signature(phases, team_database):
+        points: [Tuple[Team, int]] = sorted(((team, baseline[team_database.get_team_index(team)]) for team in group),
+                                            key=lambda team_points: -team_points[1])
+        print(f"Interchangeable for the remaining events: "
+              f"{', '.join(f'{team.name} ({team_points})' for team, team_points in points)}")
+
+
+def get_placement_indicators(phases: [HasDisplayPhase], team_index: int) -> [IntVar]:
+    # The team's indicators in every open stage and tournament, always in the same order
+    indicators: [IntVar] = []
+    for phase in phases:
+        if isinstance(phase, EptTournament):
+            indicators.extend(phase.tournament.indicators[team_index])
+            for stage in get_stages(phase.tournament):
+                indicators.extend(stage.indicators[team_index])
+    return indicators
+
+
+def add_lexicographic_order(model: CpModel, name: str, larger: [IntVar], smaller: [IntVar]):
+    # larger >= smaller, lexicographically.  prefix_equal is true exactly while every earlier pair is equal
+    prefix_equal: IntVar | None = None
+    for k, (x, y) in enumerate(zip(larger, smaller)):
+        if x.index == y.index:
+            continue
+
+        if prefix_equal is None:
+            model.Add(x >= y)
+        else:
+            model.Add(x >= y).only_enforce_if(prefix_equal)
+
+        equal: IntVar = model.new_bool_var(f'{name}_equal_{k}')
+        model.Add(x == y).only_enforce_if(equal)
+        if prefix_equal is None:
+            model.AddBoolOr([x.Not(), y.Not(), equal])
+            model.AddBoolOr([x, y, equal])
+        else:
+            model.AddImplication(equal, prefix_equal)
+            model.AddBoolOr([prefix_equal.Not(), x.Not(), y.Not(), equal])
+            model.AddBoolOr([prefix_equal.Not(), x, y, equal])
+        prefix_equal = equal
+
+
+def add_symmetry_breaking(model: CpModel, symmetry_groups: [[Team]], phases: [HasDisplayPhase],
+                          team_database: TeamDatabase, excluded_teams: [Team]):
+    # Teams the model singles out (the one being optimised, the cutoff team) are no longer interchangeable
+    for group in symmetry_groups:
+        teams: [Team] = [team for team in group if team not in excluded_teams]
+        for larger, smaller in zip(teams, teams[1:]):
+            larger_index: int = team_database.get_team_index(larger)
+            smaller_index: int = team_database.get_team_index(smaller)
+            add_lexicographic_order(model, f'symmetry_{larger.name}_{smaller.name}',
+                                    get_placement_indicators(phases, larger_index),
+                                    get_placement_indicators(phases, smaller_index))
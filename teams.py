@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Dict
 
 
 class Region(Enum):
@@ -27,9 +28,23 @@ class Team:
 
 class TeamDatabase:
     def __init__(self):
-        self.teams = {}
+        # Teams are stored densely in insertion order, with the indices looked up by name or by team
+        self.teams: Dict[str, Team] = {}
+        self.team_list: [Team] = []
+        self.team_indices_by_name: Dict[str, int] = {}
+        self.team_indices: Dict[Team, int] = {}
 
     def add_team(self, team: Team):
+        if team.name in self.team_indices_by_name:
+            # Same name replaces the team but keeps its index
+            index: int = self.team_indices_by_name[team.name]
+            del self.team_indices[self.team_list[index]]
+            self.team_list[index] = team
+        else:
+            index: int = len(self.team_list)
+            self.team_list.append(team)
+            self.team_indices_by_name[team.name] = index
+        self.team_indices[team] = index
         self.teams[team.name] = team
 
     def get_team_by_name(self, team_name: str) -> Team:
@@ -42,16 +57,22 @@ class TeamDatabase:
         return list(map(self.get_team_by_name, team_names))
 
     def get_team_index(self, team: Team) -> int:
-        return list(self.teams.keys()).index(team.name)
+        index: int | None = self.team_indices.get(team)
+        if index is None:
+            return self.get_team_index_by_team_name(team.name)
+        return index
 
     def get_team_index_by_team_name(self, team_name: str) -> int:
-        return list(self.teams.keys()).index(team_name)
+        if team_name not in self.team_indices_by_name:
+            raise ValueError(f"No such team {team_name}")
+        return self.team_indices_by_name[team_name]
 
     def get_all_teams(self) -> [Team]:
-        return self.teams.values()
+        # In index order.  Do not modify
+        return self.team_list
 
     def get_team_by_index(self, index: int) -> Team:
-        return list(self.teams.values())[index]
+        return self.team_list[index]
 
     def get_teams_by_region(self, region: Region) -> [Team]:
-        return list(team for team in self.teams.values() if team.region == region)
+        return list(team for team in self.team_list if team.region == region)
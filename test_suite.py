@@ -1,12 +1,29 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Value
+from typing import Dict, List, Tuple
+
 from ortools.constraint_solver.pywrapcp import BooleanVar
 from ortools.sat.python import cp_model
 from ortools.sat.python.cp_model import CpModel, IntVar, CpSolver
 
+import numpy as np
+
+import bracket
+import optimiser
 import utilities
-from ept import EptGroupStage, EptTournament, EptPairGroupStage
+import simulation
+from enumeration import Enumeration
+from bracket import DoubleElimination_8U1Q, DoubleElimination_2U2L1D
+from ept import EptGroupStage, EptTournament, EptPairGroupStage, EptStage, SolvedEptTournament
+from instrumentation import RANK_MODULES, get_stage_classes, instrument
 from metadata import Metadata
-from stage import Root, GroupStage, Tournament, PairGroupStage, SingleMatch, DoubleElimination_8U1Q
+from optimiser import SeasonModel, maximise_cutoff_plus_one, minimise_cutoff, no_scenario, set_up_worker, \
+    solve_maximise_cutoff_plus_one_for_team, MinimiseCutoffModel, get_teams_to_optimise, add_interchangeable_teams
+from stage import Root, GroupStage, Tournament, PairGroupStage, SingleMatch
+from ranking import is_decided
+from sweep import SweepCutoff, get_sweep_order, get_max_cutoff_plus_one_bounds
 from teams import Team, TeamDatabase, Region
+from threshold_search import ThresholdModel, search_max_cutoff_plus_one
 from tournaments.esl_one_bangkok_2024 import EslOneBangkok2024
 
 
@@ -19,6 +36,21 @@ def main():
     # esl_one_bkk_2024()
     # bracket_4U4L2DSL1D()
     bracket_8U8L2DSL1D()
+    # ept_points_variable_count()
+    # simulated_outcomes_respect_results()
+    # enumeration_matches_cp_sat()
+    # sweep_bounds_hold()
+    # threshold_search_matches_maximisation()
+    # achievable_totals_cover_outcomes()
+    # achievable_points_domains_keep_objectives()
+    # instrumentation_counts_match_models()
+    # pool_worker_reuses_season_model()
+    # counting_ranks_match_big_m()
+    # per_pair_big_m_keeps_objectives()
+    # placement_sets_match_match_encoding()
+    # integrated_minimise_cutoff_matches_per_pair()
+    # symmetry_breaking_keeps_objectives()
+    # skipping_interchangeable_teams_keeps_results()
 
 
 def basic_two_group_stage():
@@ -763,6 +795,561 @@ def bracket_8U8L2DSL1D():
         print(f"Maximum objective value: {max_objective_value}")
 
 
+def ept_points_variable_count():
+    teams: [Team] = [
+        Team("A", Region.WEU),
+        Team("B", Region.WEU),
+        Team("C", Region.WEU),
+        Team("D", Region.WEU),
+        Team("E", Region.WEU),
+        Team("F", Region.WEU),
+        Team("G", Region.WEU),
+        Team("H", Region.WEU)
+    ]
+    team_database: TeamDatabase = TeamDatabase()
+    for team in teams:
+        team_database.add_team(team)
+
+    model: CpModel = CpModel()
+    metadata = Metadata(team_database, model)
+
+    root: Root = Root("root", len(teams), metadata, teams=teams)
+    group_stage_1: PairGroupStage = PairGroupStage("group_stage_1",
+                                                   4,
+                                                   2,
+                                                   metadata,
+                                                   group_a=team_database.get_teams_by_names("A", "B", "C", "D"),
+                                                   group_b=team_database.get_teams_by_names("E", "F", "G", "H")
+                                                   )
+    group_stage_2: GroupStage = GroupStage("group_stage_2", 4, 0, metadata)
+    tournament: Tournament = Tournament("tournament", group_stage_1, metadata)
+
+    root.bind_forward(group_stage_1)
+    group_stage_1.bind_forward(group_stage_2)
+
+    root.build()
+    group_stage_1.build()
+    group_stage_2.build()
+    tournament.build()
+
+    ept_group_stage_1: EptPairGroupStage = EptPairGroupStage(group_stage_1, [100, 50])
+    ept_group_stage_2: EptGroupStage = EptGroupStage(group_stage_2, [100])
+    ept_tournament: EptTournament = EptTournament(tournament, ept_group_stage_1,
+                                                  [1000, 500, 250, 100, 50, 50, 25, 25],
+                                                  "Tournament", "Tournament", "", "", metadata)
+
+    # Every indicator row exists already, so the points expressions must not add any variables, however often they are
+    # built
+    for indicators in [group_stage_1.indicators, group_stage_2.indicators, tournament.indicators]:
+        for _ in indicators:
+            pass
+    variable_count: int = len(model.Proto().variables)
+
+    for _ in range(2):
+        ept_group_stage_1.build()
+        ept_group_stage_2.build()
+        ept_tournament.build()
+
+    assert len(model.Proto().variables) == variable_count, \
+        f"Expected {variable_count} variables, got {len(model.Proto().variables)}"
+    print(f"Variable count unchanged: {variable_count}")
+
+
+def simulated_outcomes_respect_results():
+    teams: [Team] = [
+        Team("A", Region.WEU),
+        Team("B", Region.WEU),
+        Team("C", Region.WEU),
+        Team("D", Region.WEU),
+        Team("E", Region.WEU),
+        Team("F", Region.WEU),
+        Team("G", Region.WEU),
+        Team("H", Region.WEU)
+    ]
+    team_database: TeamDatabase = TeamDatabase()
+    for team in teams:
+        team_database.add_team(team)
+
+    metadata = Metadata(team_database, CpModel())
+    group_stage: PairGroupStage = PairGroupStage("group_stage", 4, 2, metadata,
+                                                 group_a=team_database.get_teams_by_names("A", "B", "C", "D"),
+                                                 group_b=team_database.get_teams_by_names("E", "F", "G", "H"))
+    playoff: DoubleElimination_2U2L1D = DoubleElimination_2U2L1D("playoff", metadata)
+    tournament: Tournament = Tournament("tournament", group_stage, metadata)
+    playoff.bind_backward(group_stage)
+    group_stage.bind_forward(playoff)
+    ept_group_stage: EptPairGroupStage = EptPairGroupStage(group_stage, [100, 50])
+    ept_tournament: EptTournament = EptTournament(tournament, ept_group_stage, [1000, 500, 250, 100, 50, 50, 25, 25],
+                                                  "Tournament", "Tournament", "", "", metadata)
+
+    group_stage.team_can_finish_between("A", 1, 1)
+    group_stage.team_can_finish_between("E", 3, 4)
+    playoff.ubf.set_winner("A")
+
+    final, stage_placements = simulation.sample_tournament(np.random.default_rng(0), ept_tournament, team_database,
+                                                           10000)
+    a: int = team_database.get_team_index_by_team_name("A")
+    e: int = team_database.get_team_index_by_team_name("E")
+    assert (np.sort(final, axis=1) == np.arange(len(teams))).all(), "Every team must finish exactly once"
+    assert (stage_placements[group_stage][:, 0] == a).all(), "A must win its group"
+    assert (stage_placements[group_stage][:, 3] == e).all(), "E must finish second in its group"
+    assert np.isin(final[:, 0:2], [a]).any(axis=1).all(), "A won the upper bracket final, so plays the grand final"
+    print(f"A wins the tournament in {(final[:, 0] == a).mean():.1%} of outcomes")
+
+
+class SmallSeason:
+    # One open tournament: two groups of four into a 2U2L1D playoff
+    playoff_winner: str | None = "A"
+    # Finishing positions in an earlier, completed tournament
+    completed_positions: [str] = []
+
+    def __init__(self, metadata: Metadata):
+        team_database: TeamDatabase = metadata.team_database
+        group_stage: PairGroupStage = PairGroupStage("group_stage", 4, 2, metadata,
+                                                     group_a=team_database.get_teams_by_names("A", "B", "C", "D"),
+                                                     group_b=team_database.get_teams_by_names("E", "F", "G", "H"))
+        playoff: DoubleElimination_2U2L1D = DoubleElimination_2U2L1D("playoff", metadata)
+        tournament: Tournament = Tournament("tournament", group_stage, metadata)
+        playoff.bind_backward(group_stage)
+        group_stage.bind_forward(playoff)
+        group_stage.team_can_finish_between("A", 1, 2)
+        if self.playoff_winner is not None:
+            playoff.ubf.set_winner(self.playoff_winner)
+
+        group_stage.build()
+        playoff.build()
+        tournament.build()
+        self.ept_group_stage: EptPairGroupStage = EptPairGroupStage(group_stage, [100, 50])
+        self.ept_tournament: EptTournament = EptTournament(tournament, self.ept_group_stage,
+                                                           [1000, 500, 250, 100, 50, 50, 25, 25],
+                                                           "Tournament", "Tournament", "", "", metadata)
+
+        self.completed_tournaments: [SolvedEptTournament] = []
+        if self.completed_positions:
+            completed: SolvedEptTournament = SolvedEptTournament("completed", None, [2000, 1000, 500, 250], "Completed",
+                                                                 "Completed", "", "", metadata)
+            for position, team_name in enumerate(self.completed_positions, 1):
+                completed.set_position(team_name, position)
+            self.completed_tournaments.append(completed)
+
+    def get_display_phases(self):
+        return self.completed_tournaments + [self.ept_tournament]
+
+    def get_total_points(self, team_database: TeamDatabase, teams: [Team]):
+        return [
+            self.ept_group_stage.get_obtained_points(t_index) + self.ept_tournament.get_obtained_points(t_index) +
+            sum(completed.get_obtained_points(t_index) for completed in self.completed_tournaments)
+            for t in teams
+            if (t_index := team_database.get_team_index(t)) is not None
+        ]
+
+
+class UndecidedSmallSeason(SmallSeason):
+    # Nothing decided in the playoff, so every placement of it is open
+    playoff_winner = None
+
+
+class SettledSmallSeason(UndecidedSmallSeason):
+    # A won a completed tournament, far enough ahead that only B can still catch it
+    completed_positions = ["A", "B"]
+
+
+def build_small_season(full_ept_class=SmallSeason,
+                       pseudo_team_names: Tuple[str, ...] = ()) -> Tuple[List[Team], TeamDatabase, SeasonModel]:
+    teams: [Team] = [Team(name, Region.WEU, name in pseudo_team_names)
+                     for name in ["A", "B", "C", "D", "E", "F", "G", "H"]]
+    team_database: TeamDatabase = TeamDatabase()
+    for team in teams:
+        team_database.add_team(team)
+    return teams, team_database, SeasonModel(full_ept_class, team_database)
+
+
+def solve_objective(model: CpModel) -> int | None:
+    # None if the model has no optimal solution
+    solver: CpSolver = cp_model.CpSolver()
+    return round(solver.objective_value) if solver.Solve(model) == cp_model.OPTIMAL else None
+
+
+def get_max_cutoff_plus_one_objectives(season_model: SeasonModel, cutoffs: [int], break_symmetry: bool = False,
+                                       **kwargs) -> Dict[Tuple[int, str], int | None]:
+    # The first phase for every team at every cutoff, with or without symmetry breaking between the other teams.
+    # kwargs go to maximise_cutoff_plus_one
+    team_database: TeamDatabase = season_model.team_database
+    teams: [Team] = team_database.get_all_teams()
+    objective_values: Dict[Tuple[int, str], int | None] = {}
+    for cutoff in cutoffs:
+        for team in teams:
+            model: CpModel = season_model.new_model([team] if break_symmetry else None)
+            maximise_cutoff_plus_one(model, team, team_database, teams, season_model.total_points, cutoff,
+                                     [no_scenario], **kwargs)
+            objective_values[(cutoff, team.name)] = solve_objective(model)
+    return objective_values
+
+
+def get_cutoff_teams(objective_values: Dict[Tuple[int, str], int | None], cutoff: int,
+                     teams: [Team]) -> Tuple[int, List[Team]]:
+    # The maximum cutoff plus one value, and the teams reaching it
+    cutoff_points: int = max(objective_value for (other_cutoff, _), objective_value in objective_values.items()
+                             if other_cutoff == cutoff and objective_value is not None)
+    return cutoff_points, [team for team in teams if objective_values[(cutoff, team.name)] == cutoff_points]
+
+
+def get_min_cutoff_objectives(season_model: SeasonModel, cutoff: int, cutoff_points: int, cutoff_teams: [Team],
+                              break_symmetry: bool = False, **kwargs) -> Dict[Tuple[str, str], int | None]:
+    # The second phase for every team against every cutoff team, with or without symmetry breaking between the other
+    # teams.  kwargs go to minimise_cutoff
+    team_database: TeamDatabase = season_model.team_database
+    teams: [Team] = team_database.get_all_teams()
+    objective_values: Dict[Tuple[str, str], int | None] = {}
+    for team in teams:
+        for cutoff_team in cutoff_teams:
+            if cutoff_team == team:
+                continue
+            model: CpModel = season_model.new_model([team, cutoff_team] if break_symmetry else None)
+            minimise_cutoff(model, team, team_database, teams, season_model.total_points, cutoff, cutoff_team,
+                            cutoff_points, [no_scenario], **kwargs)
+            objective_values[(team.name, cutoff_team.name)] = solve_objective(model)
+    return objective_values
+
+
+def enumeration_matches_cp_sat():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        cutoff: int = 2
+        enumeration: Enumeration = Enumeration(season_model)
+        for team in teams:
+            model: CpModel = season_model.new_model()
+            maximise_cutoff_plus_one(model, team, team_database, teams, season_model.total_points, cutoff,
+                                     [no_scenario])
+            solver: CpSolver = cp_model.CpSolver()
+            status = solver.Solve(model)
+            result = enumeration.maximise_cutoff_plus_one(team, cutoff)
+            expected = round(solver.objective_value) if status == cp_model.OPTIMAL else None
+            assert (result[0] if result is not None else None) == expected, \
+                f"{team.name}: enumeration gave {result}, CP-SAT {expected}"
+
+            # The replayed outcome has to be feasible in the CpModel, with the same objective
+            replay: CpModel | None = enumeration.maximise_cutoff_plus_one_model(team, cutoff)
+            if replay is not None:
+                assert solver.Solve(replay) == cp_model.OPTIMAL and round(solver.objective_value) == expected
+
+            for cutoff_team in teams:
+                if cutoff_team == team or expected is None:
+                    continue
+                model = season_model.new_model()
+                minimise_cutoff(model, team, team_database, teams, season_model.total_points, cutoff, cutoff_team,
+                                expected, [no_scenario])
+                status = solver.Solve(model)
+                result = enumeration.minimise_cutoff(team, cutoff, cutoff_team, expected)
+                minimum = round(solver.objective_value) if status == cp_model.OPTIMAL else None
+                assert (result[0] if result is not None else None) == minimum, \
+                    f"{team.name} over {cutoff_team.name}: enumeration gave {result}, CP-SAT {minimum}"
+        print(f"{full_ept_class.__name__}: enumeration matches CP-SAT over {enumeration.get_outcome_count()} outcomes")
+
+
+def sweep_bounds_hold():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        enumeration: Enumeration = Enumeration(season_model)
+        sweep_cutoffs: [SweepCutoff] = [SweepCutoff(cutoff, f"Top {cutoff}", "") for cutoff in range(1, 7)]
+        solved: Dict[SweepCutoff, int] = {}
+        for sweep_cutoff in get_sweep_order(sweep_cutoffs):
+            lower_bound, upper_bound = get_max_cutoff_plus_one_bounds(sweep_cutoff, solved)
+            results = [enumeration.maximise_cutoff_plus_one(team, sweep_cutoff.cutoff) for team in teams]
+            max_cutoff_plus_one: int = max(result[0] for result in results if result is not None)
+            assert lower_bound <= max_cutoff_plus_one and (upper_bound is None or max_cutoff_plus_one <= upper_bound), \
+                f"Top {sweep_cutoff.cutoff}: {max_cutoff_plus_one} is not between {lower_bound} and {upper_bound}"
+
+            # The upper bound must not cut off the maximum
+            team: Team = next(team for team, result in zip(teams, results)
+                              if result is not None and result[0] == max_cutoff_plus_one)
+            model: CpModel = season_model.new_model()
+            maximise_cutoff_plus_one(model, team, team_database, teams, season_model.total_points, sweep_cutoff.cutoff,
+                                     sweep_cutoff.scenarios, upper_bound=upper_bound)
+            solver: CpSolver = cp_model.CpSolver()
+            assert solver.Solve(model) == cp_model.OPTIMAL and round(solver.objective_value) == max_cutoff_plus_one
+            solved[sweep_cutoff] = max_cutoff_plus_one
+        print(f"{full_ept_class.__name__}: sweep bounds hold: "
+              f"{[solved[sweep_cutoff] for sweep_cutoff in sweep_cutoffs]}")
+
+
+def threshold_search_matches_maximisation():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        for cutoff in range(1, 8):
+            objective_values: Dict[Team, int] = {}
+            for team in teams:
+                model: CpModel = season_model.new_model()
+                maximise_cutoff_plus_one(model, team, team_database, teams, season_model.total_points, cutoff,
+                                         [no_scenario])
+                solver: CpSolver = cp_model.CpSolver()
+                if solver.Solve(model) == cp_model.OPTIMAL:
+                    objective_values[team] = round(solver.objective_value)
+            expected: int = max(objective_values.values())
+            expected_teams: [Team] = [team for team in teams if objective_values.get(team) == expected]
+
+            max_cutoff_plus_one, max_objective_value_teams = search_max_cutoff_plus_one(season_model, cutoff,
+                                                                                        [no_scenario])
+            assert max_cutoff_plus_one == expected, \
+                f"Top {cutoff}: threshold search gave {max_cutoff_plus_one}, not {expected}"
+            assert sorted(max_objective_value_teams, key=team_database.get_team_index) == expected_teams, \
+                f"Top {cutoff}: threshold search gave {[team.name for team in max_objective_value_teams]}"
+        print(f"{full_ept_class.__name__}: threshold search matches maximisation")
+
+
+def achievable_totals_cover_outcomes():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        enumeration: Enumeration = Enumeration(season_model)
+        for team in teams:
+            team_index: int = team_database.get_team_index(team)
+            totals: {int} = {season_model.baseline[team_index]}
+            for points in enumeration.points:
+                totals = {total + value for total in totals for value in set(points[:, team_index].tolist())}
+            achievable_totals: [int] = season_model.achievable_totals[team_index]
+            assert totals <= set(achievable_totals), f"{team.name}: {sorted(totals)} not in {achievable_totals}"
+            assert achievable_totals == sorted(achievable_totals)
+            assert achievable_totals[-1] == season_model.points_bounds[team_index][1]
+        print(f"{full_ept_class.__name__}: achievable totals cover every outcome: {season_model.achievable_totals}")
+
+
+def achievable_points_domains_keep_objectives():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        expected: Dict[Tuple[int, str], int | None] = {}
+        for cutoff in range(1, 8):
+            for team in teams:
+                model: CpModel = season_model.new_model()
+                maximise_cutoff_plus_one(model, team, team_database, teams, season_model.total_points, cutoff,
+                                         [no_scenario], points_bounds=season_model.points_bounds)
+                solver: CpSolver = cp_model.CpSolver()
+                expected[(cutoff, team.name)] = round(solver.objective_value) \
+                    if solver.Solve(model) == cp_model.OPTIMAL else None
+
+        achievable_points_domains: bool = optimiser.ACHIEVABLE_POINTS_DOMAINS
+        optimiser.ACHIEVABLE_POINTS_DOMAINS = True
+        try:
+            teams, team_database, season_model = build_small_season(full_ept_class)
+        finally:
+            optimiser.ACHIEVABLE_POINTS_DOMAINS = achievable_points_domains
+        assert season_model.baseline == [points_bounds[0] for points_bounds in
+                                         optimiser.calculate_points_bounds(season_model.phases, team_database)]
+        for (cutoff, team_name), objective_value in expected.items():
+            team: Team = team_database.get_team_by_name(team_name)
+            model: CpModel = season_model.new_model()
+            maximise_cutoff_plus_one(model, team, team_database, teams, season_model.total_points, cutoff,
+                                     [no_scenario], points_bounds=season_model.points_bounds)
+            solver: CpSolver = cp_model.CpSolver()
+            result = round(solver.objective_value) if solver.Solve(model) == cp_model.OPTIMAL else None
+            assert result == objective_value, \
+                f"Top {cutoff}, {team_name}: {result} with domains, {objective_value} without"
+        print(f"{full_ept_class.__name__}: achievable points domains keep every objective")
+
+
+def get_instrumented_methods() -> Dict[Tuple[type, str], object]:
+    return {(owner, name): method
+            for owner in get_stage_classes() + [EptStage, EptTournament]
+            for name, method in vars(owner).items() if callable(method)}
+
+
+def instrumentation_counts_match_models():
+    methods: Dict[Tuple[type, str], object] = get_instrumented_methods()
+    encode_ranks = {module: module.encode_ranks for module in RANK_MODULES}
+    with instrument() as instrumentation:
+        teams, team_database, season_model = build_small_season(UndecidedSmallSeason)
+        record_count: int = len(instrumentation.records)
+        threshold_model: ThresholdModel = ThresholdModel(season_model, teams, 2, [no_scenario])
+
+    # threshold_search imported encode_ranks by name, so its ranks are only counted if that name is patched too.  The
+    # model adds the threshold and one literal per team itself
+    rank_records = [record for record in instrumentation.records[record_count:]
+                    if record.method == "encode_ranks"]
+    variable_count: int = len(threshold_model.model.Proto().variables) - len(season_model.model.Proto().variables)
+    assert len(rank_records) == 1, f"Expected one encode_ranks record, got {len(rank_records)}"
+    assert rank_records[0].variables == variable_count - 1 - len(teams), \
+        f"encode_ranks counted {rank_records[0].variables} variables, the model has {variable_count - 1 - len(teams)}"
+
+    assert get_instrumented_methods() == methods, "Instrumented methods were not restored"
+    for module, function in encode_ranks.items():
+        assert module.encode_ranks is function, f"{module.__name__}.encode_ranks was not restored"
+    print(f"encode_ranks added {rank_records[0].variables} variables to the threshold model")
+
+
+# Season models built in this process, counted by CountedSeasonModel
+season_models_built: int = 0
+
+
+class CountedSeasonModel(SeasonModel):
+    def __init__(self, full_ept_class, team_database: TeamDatabase):
+        global season_models_built
+        season_models_built += 1
+        super().__init__(full_ept_class, team_database)
+
+
+def set_up_counting_worker(incumbent, full_ept_class, team_database: TeamDatabase):
+    optimiser.SeasonModel = CountedSeasonModel
+    set_up_worker(incumbent, full_ept_class, team_database)
+
+
+def get_season_models_built() -> int:
+    return season_models_built
+
+
+def pool_worker_reuses_season_model():
+    teams, team_database, _ = build_small_season(UndecidedSmallSeason)
+    with ProcessPoolExecutor(max_workers=1, initializer=set_up_counting_worker,
+                             initargs=(Value('q', -1), UndecidedSmallSeason, team_database)) as executor:
+        # One worker, so every task runs in the process the initialiser set up
+        for team in teams[:2]:
+            executor.submit(solve_maximise_cutoff_plus_one_for_team, team.name, 2, [no_scenario], 1).result()
+        built: int = executor.submit(get_season_models_built).result()
+    assert built == 1, f"The worker built {built} season models for two tasks"
+    print("The pool worker builds the season model once")
+
+
+def counting_ranks_match_big_m():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        big_m = get_max_cutoff_plus_one_objectives(season_model, range(1, 8), rank_encoding="big_m")
+        counting = get_max_cutoff_plus_one_objectives(season_model, range(1, 8), rank_encoding="counting")
+        assert counting == big_m, f"Counting gave {counting}, big-M {big_m}"
+
+        for cutoff in [2, 5]:
+            cutoff_points, cutoff_teams = get_cutoff_teams(big_m, cutoff, teams)
+            big_m_cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams,
+                                                      rank_encoding="big_m")
+            counting_cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams,
+                                                         rank_encoding="counting")
+            assert counting_cutoffs == big_m_cutoffs, \
+                f"Top {cutoff}: counting gave {counting_cutoffs}, big-M {big_m_cutoffs}"
+        print(f"{full_ept_class.__name__}: counting ranks match big-M")
+
+
+def per_pair_big_m_keeps_objectives():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason, SettledSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        points_bounds: [Tuple[int, int]] = season_model.points_bounds
+        decided_pairs: int = sum(1 for i in range(len(teams)) for j in range(len(teams))
+                                 if i != j and is_decided(points_bounds, i, j))
+        for rank_encoding in ["big_m", "counting"]:
+            expected = get_max_cutoff_plus_one_objectives(season_model, range(1, 8), rank_encoding=rank_encoding)
+            result = get_max_cutoff_plus_one_objectives(season_model, range(1, 8), rank_encoding=rank_encoding,
+                                                        points_bounds=points_bounds)
+            assert result == expected, f"{rank_encoding}: {result} with points bounds, {expected} without"
+
+            for cutoff in [2, 5]:
+                cutoff_points, cutoff_teams = get_cutoff_teams(expected, cutoff, teams)
+                expected_cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams,
+                                                             rank_encoding=rank_encoding)
+                cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams,
+                                                    rank_encoding=rank_encoding, points_bounds=points_bounds)
+                assert cutoffs == expected_cutoffs, \
+                    f"{rank_encoding}, top {cutoff}: {cutoffs} with points bounds, {expected_cutoffs} without"
+        print(f"{full_ept_class.__name__}: per-pair big-M keeps every objective, {decided_pairs} pairs decided")
+    assert decided_pairs > 0, "SettledSmallSeason should decide the order of some pairs"
+
+
+def placement_sets_match_match_encoding():
+    for full_ept_class in [UndecidedSmallSeason, SettledSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        bracket_encoding: str = bracket.BRACKET_ENCODING
+        bracket.BRACKET_ENCODING = "match"
+        try:
+            match_teams, _, match_season_model = build_small_season(full_ept_class)
+        finally:
+            bracket.BRACKET_ENCODING = bracket_encoding
+        assert season_model.full_ept.ept_group_stage.stage.next_stage.uses_placement_sets
+        assert not match_season_model.full_ept.ept_group_stage.stage.next_stage.uses_placement_sets
+
+        expected = get_max_cutoff_plus_one_objectives(match_season_model, range(1, 8))
+        result = get_max_cutoff_plus_one_objectives(season_model, range(1, 8))
+        assert result == expected, f"{result} with placement sets, {expected} with matches"
+
+        for cutoff in [2, 5]:
+            cutoff_points, cutoff_teams = get_cutoff_teams(expected, cutoff, match_teams)
+            expected_cutoffs = get_min_cutoff_objectives(match_season_model, cutoff, cutoff_points, cutoff_teams)
+            cutoff_points, cutoff_teams = get_cutoff_teams(result, cutoff, teams)
+            cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams)
+            assert cutoffs == expected_cutoffs, \
+                f"Top {cutoff}: {cutoffs} with placement sets, {expected_cutoffs} with matches"
+        print(f"{full_ept_class.__name__}: placement sets match the match encoding with "
+              f"{len(season_model.model.Proto().variables)} variables instead of "
+              f"{len(match_season_model.model.Proto().variables)}")
+
+
+def integrated_minimise_cutoff_matches_per_pair():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason, SettledSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        points_bounds: [Tuple[int, int]] = season_model.points_bounds
+        max_objective_values = get_max_cutoff_plus_one_objectives(season_model, [2, 3, 5],
+                                                                  points_bounds=points_bounds)
+        for cutoff in [2, 3, 5]:
+            cutoff_points, cutoff_teams = get_cutoff_teams(max_objective_values, cutoff, teams)
+            expected = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams,
+                                                 points_bounds=points_bounds)
+            for team in teams:
+                # One model per team, switched between the cutoff teams in turn
+                cutoff_model: MinimiseCutoffModel = MinimiseCutoffModel(season_model, team, cutoff, cutoff_teams,
+                                                                        cutoff_points, [no_scenario])
+                for cutoff_team in cutoff_teams:
+                    if cutoff_team == team:
+                        continue
+                    result: int | None = solve_objective(cutoff_model.select(cutoff_team))
+                    assert result == expected[(team.name, cutoff_team.name)], \
+                        f"Top {cutoff}, {team.name} over {cutoff_team.name}: {result} integrated, " \
+                        f"{expected[(team.name, cutoff_team.name)]} per pair"
+        print(f"{full_ept_class.__name__}: the integrated model matches the per-pair models")
+
+
+def symmetry_breaking_keeps_objectives():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason, SettledSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class, ("F", "G", "H"))
+        assert any(team.is_pseudo for group in season_model.symmetry_groups for team in group), \
+            "The pseudo-teams should be interchangeable"
+        expected = get_max_cutoff_plus_one_objectives(season_model, range(1, 8))
+        result = get_max_cutoff_plus_one_objectives(season_model, range(1, 8), break_symmetry=True)
+        assert result == expected, f"{result} with symmetry breaking, {expected} without"
+
+        for cutoff in [2, 5]:
+            cutoff_points, cutoff_teams = get_cutoff_teams(expected, cutoff, teams)
+            expected_cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams)
+            cutoffs = get_min_cutoff_objectives(season_model, cutoff, cutoff_points, cutoff_teams,
+                                                break_symmetry=True)
+            assert cutoffs == expected_cutoffs, \
+                f"Top {cutoff}: {cutoffs} with symmetry breaking, {expected_cutoffs} without"
+        print(f"{full_ept_class.__name__}: symmetry breaking keeps every objective, groups "
+              f"{[[team.name for team in group] for group in season_model.symmetry_groups]}")
+
+
+def skipping_interchangeable_teams_keeps_results():
+    for full_ept_class in [SmallSeason, UndecidedSmallSeason, SettledSmallSeason]:
+        teams, team_database, season_model = build_small_season(full_ept_class)
+        representatives: Dict[Team, Team] = season_model.representatives
+        assert representatives, "Some teams should be interchangeable"
+        expected = get_max_cutoff_plus_one_objectives(season_model, range(1, 8))
+        for cutoff in range(1, 8):
+            for team, representative in representatives.items():
+                assert expected[(cutoff, team.name)] == expected[(cutoff, representative.name)], \
+                    f"Top {cutoff}: {team.name} and {representative.name} have different maximums"
+
+        # As the first phase runs it: only the representatives are solved, with symmetry breaking, and the teams
+        # interchangeable with one that has the maximum are added afterwards
+        teams_to_optimise: [Team] = get_teams_to_optimise(team_database, representatives)
+        solved = get_max_cutoff_plus_one_objectives(season_model, range(1, 8), break_symmetry=True)
+        for cutoff in range(1, 8):
+            cutoff_points, cutoff_teams = get_cutoff_teams(expected, cutoff, teams)
+            objective_values: [int] = [solved[(cutoff, team.name)] for team in teams_to_optimise
+                                       if solved[(cutoff, team.name)] is not None]
+            max_objective_value_teams: [Team] = [team for team in teams_to_optimise
+                                                 if solved[(cutoff, team.name)] == max(objective_values)]
+            result_teams: [Team] = sorted(add_interchangeable_teams(max_objective_value_teams, representatives),
+                                          key=team_database.get_team_index)
+            assert max(objective_values) == cutoff_points and result_teams == cutoff_teams, \
+                f"Top {cutoff}: {max(objective_values)} for {[team.name for team in result_teams]}, " \
+                f"{cutoff_points} for {[team.name for team in cutoff_teams]} solving every team"
+        print(f"{full_ept_class.__name__}: skipping {[team.name for team in representatives]} keeps every result")
+
+
 def add_optimisation_constraints(model, team, team_database, teams, total_points, cutoff: int):
     team_count_range = range(len(teams))
     ranks: [IntVar] = {team: model.NewIntVar(1, len(teams), f'ranks_{team}') for team in team_count_range}
@@ -782,4 +1369,5 @@ def add_optimisation_constraints(model, team, team_database, teams, total_points
     model.Maximize(total_points[team_index])
 
 
-main()
+if __name__ == "__main__":
+    main()
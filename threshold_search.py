@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import CpModel, CpSolver, IntVar
+
+from constants import BIG_M, CP_SAT_NUM_WORKERS, RANK_ENCODING
+from optimiser import SeasonModel, set_solution_hint, get_teams_to_optimise, add_interchangeable_teams
+from ranking import encode_ranks
+from solve_cache import solve_with_cache
+from teams import Team, TeamDatabase
+
+
+class ThresholdModel:
+    # "Can a team outside the cutoff reach the threshold?" for every team in one model.  Each team gets a literal
+    # putting it outside the cutoff with at least the threshold, and one of them has to hold.  A probe only changes the
+    # threshold's domain (and which literals are allowed), so the model and the ranks are built once
+    def __init__(self, season_model: SeasonModel, teams: [Team], cutoff: int, scenarios):
+        self.season_model = season_model
+        team_database: TeamDatabase = season_model.team_database
+        total_points = season_model.total_points
+        self.model: CpModel = season_model.new_model()
+        ranks = encode_ranks(self.model, total_points, RANK_ENCODING, season_model.points_bounds)
+
+        for scenario in scenarios:
+            scenario(self.model, ranks)
+
+        self.threshold: IntVar = self.model.new_int_var(0, BIG_M, "threshold")
+        self.outside_literals: Dict[Team, IntVar] = {}
+        for team in teams:
+            team_index: int = team_database.get_team_index(team)
+            literal: IntVar = self.model.new_bool_var(f'outside_{team.name}')
+            self.model.Add(ranks[team_index] > cutoff).only_enforce_if(literal)
+            self.model.Add(total_points[team_index] >= self.threshold).only_enforce_if(literal)
+            self.outside_literals[team] = literal
+        self.model.AddBoolOr(list(self.outside_literals.values()))
+
+    def probe(self, threshold: int, teams: [Team], hint: List[int] | None = None) -> CpSolver | None:
+        # The solver if one of the teams can finish outside the cutoff with at least the threshold
+        proto = self.model.Proto()
+        proto.variables[self.threshold.index].domain[:] = [threshold, threshold]
+        for team, literal in self.outside_literals.items():
+            proto.variables[literal.index].domain[:] = [0, 1] if team in teams else [0, 0]
+        set_solution_hint(self.model, hint)
+
+        solver: CpSolver = cp_model.CpSolver()
+        if CP_SAT_NUM_WORKERS > 0:
+            solver.parameters.num_workers = CP_SAT_NUM_WORKERS
+        if solve_with_cache(solver, self.model) != cp_model.OPTIMAL:
+            return None
+        return solver
+
+    def get_outside_team(self, solver: CpSolver) -> Tuple[Team, int]:
+        # The team the solution puts outside the cutoff with the most points, and its points
+        team_database: TeamDatabase = self.season_model.team_database
+        total_points = self.season_model.total_points
+        return max(((team, solver.value(total_points[team_database.get_team_index(team)]))
+                    for team, literal in self.outside_literals.items() if solver.boolean_value(literal)),
+                   key=lambda team_points: team_points[1])
+
+
+def get_candidate_totals(season_model: SeasonModel, teams: [Team]) -> [int]:
+    # Every total the teams could end the season on, in order
+    team_database: TeamDatabase = season_model.team_database
+    return sorted({points for team in teams
+                   for points in season_model.achievable_totals[team_database.get_team_index(team)]})
+
+
+def search_max_cutoff_plus_one(season_model: SeasonModel, cutoff: int, scenarios, lower_bound: int = -1,
+                               upper_bound: int | None = None,
+                               solutions: Dict[Team, List[int]] | None = None) -> Tuple[int, List[Team]]:
+    # The first phase as a binary search over feasibility checks instead of one maximisation per team.  A feasible
+    # probe moves the search past the points the solution actually gave, so it usually takes fewer probes than the
+    # number of candidates suggests.  The teams with the maximum are then found one at a time, each probe leaving out
+    # the ones already found
+    team_database: TeamDatabase = season_model.team_database
+    teams: [Team] = get_teams_to_optimise(team_database, season_model.representatives)
+    threshold_model: ThresholdModel = ThresholdModel(season_model, teams, cutoff, scenarios)
+    candidates: [int] = [points for points in get_candidate_totals(season_model, teams)
+                         if points >= lower_bound and (upper_bound is None or points <= upper_bound)]
+
+    # candidates[low] is known to be reachable, candidates[high] is known not to be
+    low, high = -1, len(candidates)
+    hint: List[int] | None = None
+    while high - low > 1:
+        middle: int = (low + high) // 2
+        solver: CpSolver | None = threshold_model.probe(candidates[middle], teams, hint)
+        if solver is None:
+            print(f"No team outside position {cutoff} can reach {candidates[middle]}")
+            high = middle
+            continue
+
+        team, points = threshold_model.get_outside_team(solver)
+        print(f"{team.name} can finish outside position {cutoff} with {points}")
+        low = bisect_right(candidates, points) - 1
+        hint = season_model.get_solution(solver)
+
+    if low < 0:
+        print(f"No team can finish outside position {cutoff}")
+        return -1, []
+    max_cutoff_plus_one: int = candidates[low]
+
+    max_objective_value_teams: [Team] = []
+    remaining_teams: [Team] = list(teams)
+    while remaining_teams:
+        solver: CpSolver | None = threshold_model.probe(max_cutoff_plus_one, remaining_teams, hint)
+        if solver is None:
+            break
+        team, _ = threshold_model.get_outside_team(solver)
+        print(f"Maximum objective value for {team.name}: {max_cutoff_plus_one}")
+        max_objective_value_teams.append(team)
+        remaining_teams.remove(team)
+        if solutions is not None:
+            solutions[team] = season_model.get_solution(solver)
+
+    # In the order the per-team loop finds them in
+    max_objective_value_teams.sort(key=team_database.get_team_index)
+    return max_cutoff_plus_one, add_interchangeable_teams(max_objective_value_teams, season_model.representatives)
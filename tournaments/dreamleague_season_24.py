@@ -1,9 +1,10 @@
 from typing import Tuple
 
+from bracket import DoubleElimination_2U2L1D
 from ept import EptPairGroupStage, EptGroupStage, EptTournament, SolvedEptStage, SolvedEptTournament, EptStageBase, \
     EptTournamentBase
 from metadata import Metadata
-from stage import PairGroupStage, GroupStage, DoubleElimination_2U2L1D, Tournament
+from stage import PairGroupStage, GroupStage, Tournament
 from teams import TeamDatabase
 
 
@@ -1,8 +1,9 @@
 from typing import Tuple
 
+from bracket import DoubleElimination_2U2L1D
 from ept import EptPairGroupStage, EptGroupStage, EptTournament, EptTournamentBase, EptStageBase
 from metadata import Metadata
-from stage import PairGroupStage, GroupStage, DoubleElimination_2U2L1D, Tournament
+from stage import PairGroupStage, GroupStage, Tournament
 from teams import TeamDatabase
 
 
@@ -1,8 +1,9 @@
 from typing import Tuple
 
+from bracket import DoubleElimination_8U8L2DSL1D
 from ept import EptPairGroupStage, EptTournament, EptTournamentBase, EptStageBase
 from metadata import Metadata
-from stage import PairGroupStage, Tournament, DoubleElimination_8U8L2DSL1D, GroupStage
+from stage import PairGroupStage, Tournament, GroupStage
 from teams import TeamDatabase
 
 
@@ -1,8 +1,9 @@
 from typing import Tuple
 
+from bracket import DoubleElimination_4U4L2DSL1D
 from ept import EptPairGroupStage, EptTournament, SolvedEptStage, SolvedEptTournament, EptStageBase, EptTournamentBase
 from metadata import Metadata
-from stage import PairGroupStage, DoubleElimination_4U4L2DSL1D, Tournament, Root
+from stage import PairGroupStage, Tournament, Root
 from teams import TeamDatabase, Team
 
 
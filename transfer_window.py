@@ -12,9 +12,12 @@ class TransferWindow(HasDisplayPhase, ABC):
         self.name = name
         self.team_database = team_database
         self.changes = {}
+        # Bumped on every change, so anything derived from the changes knows to recalculate
+        self.version: int = 0
 
     def add_change(self, team_name: str, delta: int):
         self.changes[self.team_database.get_team_index_by_team_name(team_name)] = delta
+        self.version += 1
 
     def get_changes(self):
         return self.changes